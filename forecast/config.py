@@ -1,4 +1,5 @@
 # config.py
+import os
 from typing import Dict, List
 
 # Пути и параметры по умолчанию
@@ -19,4 +20,31 @@ CONDITIONAL_SEASONALITIES = {
     'is_work_hours': {'period': 1, 'fourier_order': 5},
     'is_night': {'period': 1, 'fourier_order': 3},
     'is_weekend': {'period': 1, 'fourier_order': 3},
-}
\ No newline at end of file
+}
+
+# Параллельный подбор гиперпараметров: процессов в пуле оценки кандидатов
+TUNING_MAX_WORKERS = int(os.getenv('TUNING_MAX_WORKERS', str(os.cpu_count() or 1)))
+
+# Кросс-валидация кандидатов
+CV_INITIAL = '3 days'
+CV_PERIOD = '1 day'
+CV_HORIZON = '1 day'
+
+# Ранняя остановка: после EARLY_STOP_MIN_FOLDS фолдов кандидат отбрасывается,
+# если его частичная оценка хуже лучшей более чем на EARLY_STOP_TOLERANCE (доля)
+EARLY_STOP_MIN_FOLDS = 2
+EARLY_STOP_TOLERANCE = 0.2
+
+# Стратегия подбора: random, tpe, successive_halving, hyperband
+TUNING_STRATEGY = os.getenv('TUNING_STRATEGY', 'successive_halving')
+
+# Многоуровневая оценка (successive halving / hyperband): на первом уровне - последние
+# LOW_FIDELITY_DAYS дней и LOW_FIDELITY_FOLDS фолдов, на каждом следующем - в HALVING_ETA
+# раз больше, на последнем - все данные; на следующий уровень проходит 1/HALVING_ETA кандидатов
+LOW_FIDELITY_DAYS = 7
+LOW_FIDELITY_FOLDS = 2
+HALVING_ETA = 3
+FIDELITY_RUNGS = 3
+
+# TPE: число оценок полной точности
+TPE_TRIALS = 12
@@ -1,5 +1,6 @@
 import os
 import logging
+import pandas as pd
 from typing import Optional, Dict, Any, List, Tuple
 from datetime import timedelta
 from prophet import Prophet
@@ -16,25 +17,37 @@ logger = logging.getLogger(__name__)
 
 
 class ProphetForecaster:
-    def __init__(self, model_storage_path: str = MODEL_STORAGE_PATH, enable_optimization: bool = True):
+    def __init__(
+        self, model_storage_path: str = MODEL_STORAGE_PATH, enable_optimization: bool = True,
+        incremental_refit: bool = True
+    ):
         self.model_storage_path = model_storage_path
         self.enable_optimization = enable_optimization
+        self.incremental_refit = incremental_refit
         os.makedirs(model_storage_path, exist_ok=True)
 
     def train_or_load_model(
         self, db: Session, crud, vm: str, metric: str,
-        retrain: bool = False, optimize: Optional[bool] = None
+        retrain: bool = False, optimize: Optional[bool] = None,
+        incremental: Optional[bool] = None
     ) -> Tuple[Optional[Prophet], Optional[Dict]]:
         if optimize is None:
             optimize = self.enable_optimization
+        if incremental is None:
+            incremental = self.incremental_refit
 
+        # Инкрементальный режим: без новых фактов - сохранённая модель,
+        # с новыми - дообучение с инициализацией её параметрами
+        warm_start = None
         if not retrain:
-            model_path = find_latest_model(self.model_storage_path, vm, metric)
+            model_path = find_latest_model(db, vm, metric)
             if model_path:
                 model, meta = load_model_with_metadata(model_path)
                 if model:
-                    logger.info(f"Loaded model for {vm} - {metric}")
-                    return model, meta
+                    if not incremental or not self._has_new_data(crud, vm, metric, meta):
+                        logger.info(f"Loaded model for {vm} - {metric}")
+                        return model, meta
+                    warm_start = meta
 
         # Обучение
         end_date = now_utc()
@@ -49,15 +62,32 @@ class ProphetForecaster:
         df = prepare_data(data_dicts)
 
         best_params = None
-        if optimize and len(df) >= 100:
+        if optimize and len(df) >= 100 and not warm_start:
             best_params = tune_hyperparameters(df)
 
         model, metrics, model_path, model_meta = train_model(
-            df, vm, metric, self.model_storage_path, best_params
+            df, vm, metric, self.model_storage_path, best_params, warm_start=warm_start, db=db
         )
         logger.info(f"Trained model: MAPE={metrics.get('mape', 0):.2f}%")
         return model, model_meta
 
+    @staticmethod
+    def _has_new_data(crud, vm: str, metric: str, meta: Dict) -> bool:
+        data_end = meta.get('data_end') or meta.get('trained_at')
+        last_timestamp = crud.get_data_time_range(vm, metric).get('last_timestamp')
+        if last_timestamp is None:
+            return False
+        if data_end is None:
+            return True
+        # Метки обучающих данных - UTC без пояса (prepare_data)
+        last_timestamp = pd.Timestamp(last_timestamp)
+        if last_timestamp.tzinfo:
+            last_timestamp = last_timestamp.tz_convert('UTC').tz_localize(None)
+        data_end = pd.Timestamp(data_end)
+        if data_end.tzinfo:
+            data_end = data_end.tz_convert('UTC').tz_localize(None)
+        return last_timestamp > data_end
+
     def generate_forecast(
         self, db: Session, crud, vm: str, metric: str,
         periods: int = 48, freq: str = '30min',
@@ -94,9 +124,9 @@ class ProphetForecaster:
             logger.error(f"Forecast failed: {e}")
             return {'success': False, 'error': str(e)}
 
-    def cleanup_old_models(self, days_to_keep: int = 30) -> Dict[str, Any]:
+    def cleanup_old_models(self, db: Session, days_to_keep: int = 30) -> Dict[str, Any]:
         try:
-            deleted = cleanup_old_models(self.model_storage_path, days_to_keep)
+            deleted = cleanup_old_models(db, days_to_keep)
             return {'success': True, 'deleted_models': deleted}
         except Exception as e:
             return {'success': False, 'error': str(e)}
\ No newline at end of file
@@ -1,21 +1,57 @@
-import pickle
+import logging
+import numpy as np
 import pandas as pd
-import json
-import os
-from datetime import timedelta
 from prophet import Prophet
+from sqlalchemy.orm import Session
 from config import CONDITIONAL_SEASONALITIES
 from evaluation import calculate_simple_metrics
+from storage import save_model_with_metadata
 from utils import now_utc
 
 
+logger = logging.getLogger(__name__)
+
+
+def warm_start_params(model: Prophet) -> dict:
+    # k, m, sigma_obs - скаляры, delta, beta - векторы (среднее по выборкам при MCMC)
+    params = {name: float(np.mean(model.params[name])) for name in ('k', 'm', 'sigma_obs')}
+    params.update({name: np.mean(model.params[name], axis=0) for name in ('delta', 'beta')})
+    return params
+
+
+def build_model(model_params: dict, added_seasonalities: list) -> Prophet:
+    model = Prophet(**model_params)
+
+    # Добавляем сезонности ТОЛЬКО если они указаны в added_seasonalities
+    for col in added_seasonalities:
+        if col in CONDITIONAL_SEASONALITIES:
+            spec = CONDITIONAL_SEASONALITIES[col]
+            model.add_seasonality(
+                name=col,
+                period=spec['period'],
+                fourier_order=spec['fourier_order'],
+                condition_name=col
+            )
+    return model
+
+
 def train_model(
     df: pd.DataFrame,
     vm: str,
     metric: str,
     model_storage_path: str,
-    best_params: dict = None
+    best_params: dict = None,
+    warm_start: dict = None,
+    db: Session = None
 ):
+    # warm_start - метаданные сохранённой модели: её настройки и параметры как начальное
+    # приближение Stan, оценка без кросс-валидации.
+    # Модель сохраняется новой версией ряда и регистрируется в реестре моделей (db)
+    from model_registry import ModelRegistryCRUD, model_file_path
+
+    if warm_start:
+        best_params = warm_start.get('optimized_params')
+
     model_params = {
         'growth': 'linear',
         'yearly_seasonality': False,
@@ -39,23 +75,28 @@ def train_model(
         })
         added_seasonalities = best_params.get('added_seasonalities', [])
 
-    model = Prophet(**model_params)
+    if warm_start:
+        model_params = warm_start.get('config') or model_params
+        added_seasonalities = warm_start.get('added_seasonalities', added_seasonalities)
 
-    # Добавляем сезонности ТОЛЬКО если они указаны в added_seasonalities
-    for col in added_seasonalities:
-        if col in CONDITIONAL_SEASONALITIES:
-            spec = CONDITIONAL_SEASONALITIES[col]
-            model.add_seasonality(
-                name=col,
-                period=spec['period'],
-                fourier_order=spec['fourier_order'],
-                condition_name=col
-            )
+    model = None
+    if warm_start:
+        try:
+            model = build_model(model_params, added_seasonalities)
+            model.fit(df, init=warm_start_params(warm_start['model']))
+        except Exception as e:
+            logger.warning(f"Warm start failed for {vm} - {metric}, training from scratch: {e}")
+            model = None
 
-    model.fit(df)
+    if model is None:
+        warm_start = None
+        model = build_model(model_params, added_seasonalities)
+        model.fit(df)
 
     # Оценка
-    if len(df) >= 100:
+    if warm_start:
+        metrics = calculate_simple_metrics(model, df)
+    elif len(df) >= 100:
         from prophet.diagnostics import cross_validation, performance_metrics
         try:
             df_cv = cross_validation(model, initial='3 days', period='1 day', horizon='1 day')
@@ -68,13 +109,15 @@ def train_model(
         metrics = calculate_simple_metrics(model, df)
 
     # Сохраняем
-    timestamp = now_utc().strftime('%Y%m%d_%H%M%S')
-    model_filename = f"{vm}_{metric}_prophet_{timestamp}.pkl"
-    model_path = os.path.join(model_storage_path, model_filename)
+    registry = ModelRegistryCRUD(db)
+    version = registry.next_version(vm, metric)
+    model_path = model_file_path(model_storage_path, vm, metric, version)
+    trained_at = now_utc()
 
     model_data = {
         'model': model,
-        'trained_at': now_utc(),
+        'trained_at': trained_at,
+        'version': version,
         'metrics': metrics,
         'data_points': len(df),
         'vm': vm,
@@ -82,13 +125,18 @@ def train_model(
         'config': model_params,
         'optimized': best_params is not None,
         'optimized_params': best_params,
-        'added_seasonalities': added_seasonalities
+        'added_seasonalities': added_seasonalities,
+        # Последняя метка обучающих данных: новые факты - после неё
+        'data_end': df['ds'].max(),
+        'warm_started': warm_start is not None
     }
 
-    with open(model_path, 'wb') as f:
-        pickle.dump(model_data, f)
-
-    with open(model_path.replace('.pkl', '_metrics.json'), 'w') as f:
-        json.dump(metrics, f, indent=2, default=str)
+    save_model_with_metadata(model_path, model_data)
+    registry.register(
+        vm, metric, version, model_path, trained_at,
+        metrics=metrics, data_points=len(df),
+        params={'config': model_params, 'optimized_params': best_params,
+                'added_seasonalities': added_seasonalities}
+    )
 
-    return model, metrics, model_path, model_data
\ No newline at end of file
+    return model, metrics, model_path, model_data
@@ -0,0 +1,305 @@
+"""
+Параллельная оценка кандидатов подбора гиперпараметров.
+
+Кандидаты оцениваются в одном пуле процессов на всё время подбора. Подготовленный
+DataFrame передаётся процессам один раз через разделяемую память (а не сериализуется
+в каждую задачу). Кросс-валидация выполняется по фолдам внутри процесса, без отдельного
+пула на каждого кандидата: после EARLY_STOP_MIN_FOLDS фолдов кандидат, чья частичная
+оценка заметно хуже текущей лучшей, отбрасывается без оставшихся фолдов.
+
+Кандидата можно оценить с пониженной точностью (Fidelity): на последних днях данных
+и/или по нескольким последним фолдам. Оценки разной точности несравнимы, поэтому лучшая
+оценка для ранней остановки ведётся отдельно для каждой точности. Исполнитель считает
+обучения моделей (fits) и записывает, как лучшая оценка полной точности меняется с их числом.
+"""
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.diagnostics import generate_cutoffs, performance_metrics
+from config import (
+    CONDITIONAL_SEASONALITIES, CV_HORIZON, CV_INITIAL, CV_PERIOD,
+    EARLY_STOP_MIN_FOLDS, EARLY_STOP_TOLERANCE, TUNING_MAX_WORKERS
+)
+from evaluation import calculate_simple_metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Библиотеки линейной алгебры в процессе пула работают в один поток. Процесс (spawn)
+# загружает numpy и prophet ещё при импорте этого модуля, до initializer, поэтому
+# переменные задаются в окружении родителя, пока пул запускает процессы
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# Состояние процесса пула: DataFrame и общая лучшая оценка
+_state: Dict[str, Any] = {}
+
+
+class Fidelity(NamedTuple):
+    """Точность оценки: последние days дней данных и не больше max_folds последних фолдов (None - все)"""
+    days: Optional[int] = None
+    max_folds: Optional[int] = None
+
+
+FULL_FIDELITY = Fidelity()
+
+
+class SharedFrame:
+    """Столбцы ds (int64, нс) и числовые столбцы (float64) DataFrame в разделяемой памяти"""
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        rows = len(df)
+        self.shm = SharedMemory(create=True, size=max(1, rows * 8 * (len(columns) + 1)))
+        ds = np.ndarray((rows,), dtype=np.int64, buffer=self.shm.buf)
+        ds[:] = df['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=self.shm.buf, offset=rows * 8)
+        values[:] = df[columns].to_numpy(dtype=np.float64)
+        del ds, values
+        self.spec = {'name': self.shm.name, 'rows': rows, 'columns': list(columns)}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_frame(spec: Dict[str, Any]) -> pd.DataFrame:
+    shm = SharedMemory(name=spec['name'])
+    try:
+        rows, columns = spec['rows'], spec['columns']
+        ds = np.ndarray((rows,), dtype=np.int64, buffer=shm.buf)
+        values = np.ndarray((rows, len(columns)), dtype=np.float64, buffer=shm.buf, offset=rows * 8)
+        # Копия в памяти процесса: блок можно закрыть сразу
+        df = pd.DataFrame(values.copy(), columns=columns)
+        df.insert(0, 'ds', pd.to_datetime(ds.copy()))
+        del ds, values
+        return df
+    finally:
+        shm.close()
+
+
+def build_model(params: Dict[str, Any], seasonalities: List[str]) -> Prophet:
+    model = Prophet(
+        growth='linear',
+        yearly_seasonality=False,
+        mcmc_samples=0,
+        interval_width=0.95,
+        seasonality_mode=params.get('seasonality_mode', 'multiplicative'),
+        daily_seasonality=params.get('daily_seasonality', True),
+        weekly_seasonality=params.get('weekly_seasonality', True),
+        changepoint_prior_scale=params.get('changepoint_prior_scale', 0.05),
+        seasonality_prior_scale=params.get('seasonality_prior_scale', 10.0),
+        changepoint_range=params.get('changepoint_range', 0.8),
+    )
+    for col in seasonalities:
+        spec = CONDITIONAL_SEASONALITIES[col]
+        model.add_seasonality(
+            name=col,
+            period=spec['period'],
+            fourier_order=spec['fourier_order'],
+            condition_name=col
+        )
+    return model
+
+
+def cv_score(df_cv: pd.DataFrame, y_std: float) -> Dict[str, float]:
+    df_p = performance_metrics(df_cv)
+    mape = float(df_p['mape'].mean())
+    rmse = float(df_p['rmse'].mean())
+    coverage = float(df_p['coverage'].mean())
+    score = mape * 0.5 + (rmse / (y_std + 1e-8)) * 0.3 + (1 - coverage / 100) * 0.2
+    return {'mape': mape, 'rmse': rmse, 'coverage': coverage, 'score': score}
+
+
+def evaluate_candidate(
+    df: pd.DataFrame,
+    params: Dict[str, Any],
+    best_score: Callable[[], float],
+    min_folds: int = EARLY_STOP_MIN_FOLDS,
+    tolerance: float = EARLY_STOP_TOLERANCE,
+    fidelity: Fidelity = FULL_FIDELITY
+) -> Optional[Dict[str, Any]]:
+    """Оценка кандидата по фолдам с ранней остановкой; None - оценка не удалась"""
+    seasonalities = [col for col in CONDITIONAL_SEASONALITIES if col in df.columns]
+    result = {
+        'params': params, 'added_seasonalities': seasonalities, 'fidelity': fidelity,
+        'folds': 0, 'fits': 0, 'pruned': False
+    }
+
+    try:
+        if fidelity.days:
+            df = df[df['ds'] > df['ds'].max() - pd.Timedelta(days=fidelity.days)].reset_index(drop=True)
+
+        if len(df) < 100:
+            model = build_model(params, seasonalities)
+            model.fit(df)
+            metrics = calculate_simple_metrics(model, df)
+            result.update({k: metrics[k] for k in ('mape', 'rmse', 'coverage')}, score=metrics['mape'], fits=1)
+            return result
+
+        horizon = pd.Timedelta(CV_HORIZON)
+        cutoffs = generate_cutoffs(df, horizon, pd.Timedelta(CV_INITIAL), pd.Timedelta(CV_PERIOD))
+        if fidelity.max_folds:
+            cutoffs = cutoffs[-fidelity.max_folds:]
+        y_std = float(df['y'].std())
+        folds = []
+        # Фолды от ранних к поздним: ранние обучаются на меньшей истории и дешевле,
+        # поэтому отброшенный кандидат стоит меньше всего
+        for cutoff in cutoffs:
+            test = df[(df['ds'] > cutoff) & (df['ds'] <= cutoff + horizon)]
+            model = build_model(params, seasonalities)
+            model.fit(df[df['ds'] <= cutoff])
+            forecast = model.predict(test[['ds'] + seasonalities])
+            folds.append(pd.DataFrame({
+                'ds': test['ds'].values,
+                'yhat': forecast['yhat'].values,
+                'yhat_lower': forecast['yhat_lower'].values,
+                'yhat_upper': forecast['yhat_upper'].values,
+                'y': test['y'].values,
+                'cutoff': cutoff,
+            }))
+            result['folds'] = result['fits'] = len(folds)
+
+            if min_folds <= len(folds) < len(cutoffs):
+                partial = cv_score(pd.concat(folds, ignore_index=True), y_std)
+                if partial['score'] > best_score() * (1 + tolerance):
+                    result.update(partial, pruned=True)
+                    return result
+
+        if not folds:
+            return None
+        result.update(cv_score(pd.concat(folds, ignore_index=True), y_std))
+        return result
+    except Exception as e:
+        logger.debug(f"Failed with params {params}: {e}")
+        return None
+
+
+def _limit_threads() -> Dict[str, Optional[str]]:
+    """Один поток линейной алгебры для запускаемых процессов; возвращает прежние значения"""
+    saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: '1' for name in THREAD_ENV_VARS})
+    return saved
+
+
+def _restore_env(saved: Dict[str, Optional[str]]) -> None:
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def _init_worker(spec: Dict[str, Any], best) -> None:
+    _state['df'] = attach_frame(spec)
+    _state['best'] = best
+
+
+def _evaluate(params: Dict[str, Any], min_folds: int, tolerance: float,
+              fidelity: Fidelity) -> Optional[Dict[str, Any]]:
+    return evaluate_candidate(_state['df'], params, lambda: _state['best'].value, min_folds, tolerance, fidelity)
+
+
+class SearchExecutor:
+    """
+    Пул оценки кандидатов на время подбора (контекстный менеджер).
+    max_workers <= 1 - оценка в текущем процессе.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        max_workers: int = TUNING_MAX_WORKERS,
+        min_folds: int = EARLY_STOP_MIN_FOLDS,
+        tolerance: float = EARLY_STOP_TOLERANCE
+    ):
+        self.df = df
+        self.max_workers = max_workers
+        self.min_folds = min_folds
+        self.tolerance = tolerance
+        self._context = multiprocessing.get_context('spawn')
+        self._best = self._context.Value('d', math.inf)
+        self._frame: Optional[SharedFrame] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._saved_env: Optional[Dict[str, Optional[str]]] = None
+        self._best_by_fidelity: Dict[Fidelity, float] = {}
+        # Все оценки, число обучений и ход лучшей оценки полной точности
+        self.results: List[Dict[str, Any]] = []
+        self.fits = 0
+        self.trace: List[Dict[str, Any]] = []
+        self.best: Optional[Dict[str, Any]] = None
+
+    @property
+    def best_score(self) -> float:
+        return self.best['score'] if self.best else math.inf
+
+    def __enter__(self) -> 'SearchExecutor':
+        if self.max_workers > 1:
+            columns = ['y'] + [col for col in CONDITIONAL_SEASONALITIES if col in self.df.columns]
+            self._frame = SharedFrame(self.df, columns)
+            # Процессы запускаются по мере отправки задач - окружение держится до закрытия пула
+            self._saved_env = _limit_threads()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self._frame.spec, self._best)
+            )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._saved_env is not None:
+            _restore_env(self._saved_env)
+            self._saved_env = None
+        if self._frame is not None:
+            self._frame.close()
+            self._frame = None
+
+    def evaluate(self, candidates: List[Dict[str, Any]],
+                 fidelity: Fidelity = FULL_FIDELITY) -> List[Dict[str, Any]]:
+        """Оценка кандидатов; результаты в порядке завершения, неудачные оценки пропускаются"""
+        self._best.value = self._best_by_fidelity.get(fidelity, math.inf)
+        results = []
+        if self._pool is None:
+            for params in candidates:
+                self._collect(results, evaluate_candidate(
+                    self.df, params, lambda: self._best.value, self.min_folds, self.tolerance, fidelity
+                ), len(candidates))
+            return results
+
+        futures = [
+            self._pool.submit(_evaluate, params, self.min_folds, self.tolerance, fidelity)
+            for params in candidates
+        ]
+        for future in as_completed(futures):
+            self._collect(results, future.result(), len(candidates))
+        return results
+
+    def _collect(self, results: List[Dict[str, Any]], result: Optional[Dict[str, Any]], total: int) -> None:
+        if result is None:
+            return
+        results.append(result)
+        self.results.append(result)
+        self.fits += result['fits']
+        fidelity = result['fidelity']
+        if not result['pruned']:
+            with self._best.get_lock():
+                self._best.value = min(self._best.value, result['score'])
+            self._best_by_fidelity[fidelity] = min(self._best_by_fidelity.get(fidelity, math.inf), result['score'])
+            if fidelity == FULL_FIDELITY:
+                if self.best is None or result['score'] < self.best['score']:
+                    self.best = result
+                self.trace.append({'fits': self.fits, 'score': result['score'], 'best_score': self.best['score']})
+        if len(results) % 10 == 0:
+            pruned = sum(r['pruned'] for r in results)
+            logger.info(f"Tested {len(results)}/{total} at {fidelity} ({pruned} stopped early), "
+                        f"{self.fits} fits. Best score: {self._best.value:.4f}")
@@ -0,0 +1,205 @@
+"""
+Стратегии подбора гиперпараметров.
+
+Стратегия решает, каких кандидатов и с какой точностью оценить; оценку выполняет
+SearchExecutor, он же хранит результаты, число обучений и лучший результат полной точности.
+Новая стратегия - подкласс SearchStrategy с методом search, зарегистрированный в STRATEGIES.
+
+- random - случайная выборка сетки, все кандидаты с полной точностью (прежнее поведение);
+- tpe - Tree-structured Parzen Estimator: после случайного старта кандидаты выбираются
+  по отношению l(x)/g(x) частот значений среди лучших и остальных оценок;
+- successive_halving - все кандидаты оцениваются на последних днях и нескольких фолдах,
+  на следующий уровень точности проходит лучшая 1/eta часть, на последнем - все данные;
+- hyperband - несколько запусков successive halving с разным числом кандидатов
+  и разной начальной точностью.
+"""
+import math
+import random
+from itertools import product
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config import (
+    FIDELITY_RUNGS, HALVING_ETA, LOW_FIDELITY_DAYS, LOW_FIDELITY_FOLDS, TPE_TRIALS
+)
+from search_executor import FULL_FIDELITY, Fidelity, SearchExecutor
+
+
+def fidelity_ladder(rungs: int = FIDELITY_RUNGS, eta: int = HALVING_ETA) -> List[Fidelity]:
+    """Уровни точности от низшего к полному"""
+    low = [Fidelity(LOW_FIDELITY_DAYS * eta ** r, LOW_FIDELITY_FOLDS * eta ** r) for r in range(rungs - 1)]
+    return low + [FULL_FIDELITY]
+
+
+class GridSpace:
+    """Дискретное пространство параметров из сетки"""
+
+    def __init__(self, param_grid: Dict[str, list]):
+        self.keys = list(param_grid)
+        self.values = [list(param_grid[key]) for key in self.keys]
+        self.size = math.prod(len(values) for values in self.values)
+
+    def key(self, params: Dict[str, Any]) -> Tuple:
+        return tuple(params[key] for key in self.keys)
+
+    def to_params(self, combo) -> Dict[str, Any]:
+        return dict(zip(self.keys, combo))
+
+    def sample(self, rng: random.Random, n: int, exclude: Set[Tuple]) -> List[Dict[str, Any]]:
+        """n случайных комбинаций без повторов, кроме exclude"""
+        combos = [combo for combo in product(*self.values) if combo not in exclude]
+        return [self.to_params(combo) for combo in rng.sample(combos, min(n, len(combos)))]
+
+
+class SearchStrategy:
+    """Базовая стратегия: max_candidates - наибольшее число разных кандидатов"""
+    name: str = None
+
+    def __init__(self, max_candidates: int = 50, seed: Optional[int] = None):
+        if max_candidates <= 0:
+            raise ValueError("max_candidates must be positive")
+        self.max_candidates = max_candidates
+        self.rng = random.Random(seed)
+
+    def search(self, executor: SearchExecutor, param_grid: Dict[str, list]) -> None:
+        raise NotImplementedError
+
+
+class RandomSearch(SearchStrategy):
+    name = 'random'
+
+    def search(self, executor: SearchExecutor, param_grid: Dict[str, list]) -> None:
+        executor.evaluate(GridSpace(param_grid).sample(self.rng, self.max_candidates, set()))
+
+
+class TPESearch(SearchStrategy):
+    name = 'tpe'
+
+    def __init__(
+        self,
+        max_candidates: int = TPE_TRIALS,
+        seed: Optional[int] = None,
+        n_startup: int = 6,
+        gamma: float = 0.25,
+        n_ei_candidates: int = 24,
+        batch_size: Optional[int] = None
+    ):
+        super().__init__(max_candidates, seed)
+        self.n_startup = n_startup
+        self.gamma = gamma
+        self.n_ei_candidates = n_ei_candidates
+        self.batch_size = batch_size
+
+    def search(self, executor: SearchExecutor, param_grid: Dict[str, list]) -> None:
+        space = GridSpace(param_grid)
+        trials = min(self.max_candidates, space.size)
+        # Партия - по кандидату на процесс пула
+        batch_size = self.batch_size or max(1, executor.max_workers)
+        tried: Set[Tuple] = set()
+        observations: List[Tuple[Dict[str, Any], float]] = []
+
+        while len(tried) < trials:
+            size = min(batch_size, trials - len(tried))
+            if len(observations) < self.n_startup:
+                candidates = space.sample(self.rng, size, tried)
+            else:
+                candidates = self._suggest(space, observations, tried, size)
+            if not candidates:
+                break
+            tried.update(space.key(params) for params in candidates)
+            # Частичная оценка отброшенного кандидата выше порога - он попадает в "плохие"
+            observations += [(result['params'], result['score']) for result in executor.evaluate(candidates)]
+
+    def _suggest(self, space: GridSpace, observations: List[Tuple[Dict[str, Any], float]],
+                 tried: Set[Tuple], size: int) -> List[Dict[str, Any]]:
+        ranked = sorted(observations, key=lambda item: item[1])
+        n_good = max(1, math.ceil(self.gamma * len(ranked)))
+        good = [params for params, _ in ranked[:n_good]]
+        bad = [params for params, _ in ranked[n_good:]]
+        good_weights = [self._weights(good, key, values) for key, values in zip(space.keys, space.values)]
+        bad_weights = [self._weights(bad, key, values) for key, values in zip(space.keys, space.values)]
+
+        scored = {}
+        for _ in range(self.n_ei_candidates * size):
+            indexes = [self.rng.choices(range(len(w)), weights=w)[0] for w in good_weights]
+            combo = tuple(values[i] for values, i in zip(space.values, indexes))
+            if combo in tried or combo in scored:
+                continue
+            scored[combo] = math.prod(l[i] / g[i] for l, g, i in zip(good_weights, bad_weights, indexes))
+
+        best = sorted(scored, key=scored.get, reverse=True)[:size]
+        candidates = [space.to_params(combo) for combo in best]
+        if len(candidates) < size:
+            candidates += space.sample(self.rng, size - len(candidates), tried | set(best))
+        return candidates
+
+    @staticmethod
+    def _weights(group: List[Dict[str, Any]], key: str, values: list) -> List[float]:
+        # Частоты значений со сглаживанием: непроверенные значения сохраняют ненулевой вес
+        counts = [sum(params[key] == value for params in group) + 1.0 for value in values]
+        total = sum(counts)
+        return [count / total for count in counts]
+
+
+class SuccessiveHalvingSearch(SearchStrategy):
+    name = 'successive_halving'
+
+    def __init__(
+        self,
+        max_candidates: int = 50,
+        seed: Optional[int] = None,
+        eta: int = HALVING_ETA,
+        rungs: int = FIDELITY_RUNGS
+    ):
+        super().__init__(max_candidates, seed)
+        self.eta = eta
+        self.ladder = fidelity_ladder(rungs, eta)
+
+    def search(self, executor: SearchExecutor, param_grid: Dict[str, list]) -> None:
+        space = GridSpace(param_grid)
+        self.halve(executor, space.sample(self.rng, self.max_candidates, set()), start_rung=0)
+
+    def halve(self, executor: SearchExecutor, candidates: List[Dict[str, Any]], start_rung: int) -> None:
+        """Оценка кандидатов с уровня start_rung; на каждый следующий уровень проходит 1/eta лучших"""
+        for rung in range(start_rung, len(self.ladder)):
+            results = executor.evaluate(candidates, self.ladder[rung])
+            if rung == len(self.ladder) - 1 or not results:
+                return
+            # Отброшенные досрочно кандидаты - после оценённых полностью
+            results.sort(key=lambda result: (result['pruned'], result['score']))
+            candidates = [result['params'] for result in results[:max(1, len(results) // self.eta)]]
+
+
+class HyperbandSearch(SuccessiveHalvingSearch):
+    name = 'hyperband'
+
+    def search(self, executor: SearchExecutor, param_grid: Dict[str, list]) -> None:
+        space = GridSpace(param_grid)
+        tried: Set[Tuple] = set()
+        rungs = len(self.ladder)
+        # Запуск s начинается с уровня rungs - 1 - s: чем ниже начальная точность, тем больше кандидатов
+        for s in reversed(range(rungs)):
+            n = min(self.max_candidates, math.ceil(rungs / (s + 1) * self.eta ** s))
+            candidates = space.sample(self.rng, n, tried)
+            if not candidates:
+                return
+            tried.update(space.key(params) for params in candidates)
+            self.halve(executor, candidates, start_rung=rungs - 1 - s)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (RandomSearch, TPESearch, SuccessiveHalvingSearch, HyperbandSearch)
+}
+
+
+def make_strategy(name: str, max_candidates: Optional[int] = None, seed: Optional[int] = None) -> SearchStrategy:
+    """
+    Стратегия по имени; max_candidates=None - значение по умолчанию стратегии
+
+    Raises:
+        ValueError: Неизвестная стратегия
+    """
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {name}. Available: {', '.join(STRATEGIES)}")
+    if max_candidates is None:
+        return STRATEGIES[name](seed=seed)
+    return STRATEGIES[name](max_candidates, seed=seed)
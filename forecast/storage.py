@@ -1,8 +1,9 @@
 import os
 import pickle
 import json
-from datetime import datetime, timedelta, timezone
+from typing import Optional
 import logging
+from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
@@ -17,29 +18,31 @@ def load_model_with_metadata(model_path: str):
         return None, None
 
 
-def find_latest_model(model_storage_path: str, vm: str, metric: str):
+def save_model_with_metadata(model_path: str, model_data: dict):
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    with open(model_path, 'wb') as f:
+        pickle.dump(model_data, f)
+
+    with open(model_path.replace('.pkl', '_metrics.json'), 'w') as f:
+        json.dump(model_data['metrics'], f, indent=2, default=str)
+
+
+def find_latest_model(db: Session, vm: str, metric: str, version: Optional[int] = None):
+    # Закреплённая или последняя версия из реестра моделей (без просмотра каталога)
+    from model_registry import ModelRegistryCRUD
+
     try:
-        files = [f for f in os.listdir(model_storage_path) if f.startswith(f"{vm}_{metric}_prophet") and f.endswith('.pkl')]
-        if not files:
-            return None
-        files.sort(reverse=True)
-        return os.path.join(model_storage_path, files[0])
+        entry = ModelRegistryCRUD(db).get_model(vm, metric, version)
+        return entry.path if entry else None
     except Exception as e:
         logger.warning(f"Failed to find latest model: {e}")
         return None
 
 
-def cleanup_old_models(model_storage_path: str, days_to_keep: int = 30):
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
-    deleted = 0
-    for f in os.listdir(model_storage_path):
-        if f.endswith('.pkl'):
-            path = os.path.join(model_storage_path, f)
-            mtime = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
-            if mtime < cutoff:
-                os.remove(path)
-                json_path = path.replace('.pkl', '_metrics.json')
-                if os.path.exists(json_path):
-                    os.remove(json_path)
-                deleted += 1
-    return deleted
+def cleanup_old_models(db: Session, days_to_keep: int = 30, keep_versions: Optional[int] = None):
+    # Политика хранения реестра: последние keep_versions версий ряда и закреплённая версия остаются
+    from model_registry import MODEL_RETENTION_VERSIONS, ModelRegistryCRUD
+
+    if keep_versions is None:
+        keep_versions = MODEL_RETENTION_VERSIONS
+    return ModelRegistryCRUD(db).apply_retention(keep_versions, days_to_keep)['deleted']
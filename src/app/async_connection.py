@@ -0,0 +1,64 @@
+"""
+Асинхронный доступ к БД для эндпоинтов FastAPI (драйвер asyncpg).
+
+Синхронные engine/SessionLocal/get_db из connection.py остаются для скриптов,
+UI и загрузки через COPY (psycopg2).
+"""
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from connection import DATABASE_URL, DB_PGBOUNCER, DB_REPLICA_URLS, DB_STATEMENT_TIMEOUT_MS, pool_options
+from pool_metrics import MeteredAsyncQueuePool
+from routing import AsyncReplicaSet, RoutingSession
+
+
+def to_async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+
+def asyncpg_connect_args() -> dict:
+    if DB_PGBOUNCER:
+        # asyncpg кэширует подготовленные выражения на соединении; за PgBouncer
+        # следующая транзакция может попасть на другое серверное соединение
+        return {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+    if DB_STATEMENT_TIMEOUT_MS:
+        return {'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT_MS)}}
+    return {}
+
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=MeteredAsyncQueuePool,
+    connect_args=asyncpg_connect_args(),
+    echo=False,
+    **pool_options()
+)
+
+async_replicas = AsyncReplicaSet([
+    create_async_engine(
+        to_async_url(url),
+        poolclass=MeteredAsyncQueuePool,
+        connect_args=asyncpg_connect_args(),
+        echo=False,
+        **pool_options()
+    )
+    for url in DB_REPLICA_URLS
+])
+
+# expire_on_commit=False: после commit атрибуты объектов читаются без повторного запроса
+# (ленивая загрузка вне run_sync в асинхронной сессии невозможна)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    replicas=async_replicas
+)
+
+
+async def get_async_db():
+    """Dependency для получения асинхронной сессии БД"""
+    async with AsyncSessionLocal() as db:
+        yield db
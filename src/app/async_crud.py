@@ -0,0 +1,100 @@
+"""
+Асинхронные варианты DBCRUD, FactsCRUD, PredsCRUD и RollupCRUD для AsyncSession.
+
+Методы выполняют код синхронных классов через AsyncSession.run_sync: запросы идут
+через асинхронный драйвер (asyncpg), и на время ожидания БД цикл событий свободен
+для других запросов. Логика запросов остаётся в одном месте - в синхронных классах.
+
+Загрузка через COPY (begin_facts_staging / copy_facts_to_staging / merge_facts_staging)
+требует psycopg2 и состояния между вызовами, поэтому здесь не представлена.
+"""
+import functools
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+
+from dbcrud import DBCRUD
+from facts_crud import FactsCRUD
+from preds_crud import PredsCRUD
+from rollup_crud import RollupCRUD
+from pagination import STREAM_YIELD_PER
+
+
+def run_sync_method(method: Callable) -> Callable:
+    """Асинхронная обёртка метода синхронного CRUD-класса"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self.db.run_sync(lambda session: method(self.sync_crud(session), *args, **kwargs))
+    return wrapper
+
+
+class AsyncCRUD:
+    # Синхронный класс, методы которого выполняются в run_sync
+    sync_crud = None
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+
+class AsyncDBCRUD(AsyncCRUD):
+    sync_crud = DBCRUD
+
+    get_all_vms = run_sync_method(DBCRUD.get_all_vms)
+    get_metrics_for_vm = run_sync_method(DBCRUD.get_metrics_for_vm)
+    get_data_time_range = run_sync_method(DBCRUD.get_data_time_range)
+    get_data_time_ranges = run_sync_method(DBCRUD.get_data_time_ranges)
+    cleanup_old_data = run_sync_method(DBCRUD.cleanup_old_data)
+    get_database_stats = run_sync_method(DBCRUD.get_database_stats)
+    detect_missing_data = run_sync_method(DBCRUD.detect_missing_data)
+    detect_missing_data_all = run_sync_method(DBCRUD.detect_missing_data_all)
+    calculate_data_completeness = run_sync_method(DBCRUD.calculate_data_completeness)
+    get_completeness_report = run_sync_method(DBCRUD.get_completeness_report)
+    get_historical_metrics = run_sync_method(DBCRUD.get_historical_metrics)
+    get_metrics_by_date_range = run_sync_method(DBCRUD.get_metrics_by_date_range)
+    get_latest_metrics = run_sync_method(DBCRUD.get_latest_metrics)
+
+
+class AsyncFactsCRUD(AsyncCRUD):
+    sync_crud = FactsCRUD
+
+    create_metric_fact = run_sync_method(FactsCRUD.create_metric_fact)
+    create_metrics_fact_batch = run_sync_method(FactsCRUD.create_metrics_fact_batch)
+    upsert_metrics_fact_batch = run_sync_method(FactsCRUD.upsert_metrics_fact_batch)
+    get_metrics_fact = run_sync_method(FactsCRUD.get_metrics_fact)
+    get_metrics_fact_downsampled = run_sync_method(FactsCRUD.get_metrics_fact_downsampled)
+    get_metrics_frame = run_sync_method(FactsCRUD.get_metrics_frame)
+    get_metrics_fact_columns = run_sync_method(FactsCRUD.get_metrics_fact_columns)
+    get_latest_metrics = run_sync_method(FactsCRUD.get_latest_metrics)
+    get_metrics_as_dataframe = run_sync_method(FactsCRUD.get_metrics_as_dataframe)
+    get_metrics_fact_statistics = run_sync_method(FactsCRUD.get_metrics_fact_statistics)
+
+    async def stream_metrics_fact(self, *args, **kwargs) -> AsyncResult:
+        """Чтение ряда серверным курсором частями по STREAM_YIELD_PER (аргументы metrics_fact_select)"""
+        stmt = FactsCRUD(self.db.sync_session).metrics_fact_select(*args, **kwargs)
+        return await self.db.stream(stmt.execution_options(yield_per=STREAM_YIELD_PER))
+
+
+class AsyncPredsCRUD(AsyncCRUD):
+    sync_crud = PredsCRUD
+
+    save_prediction = run_sync_method(PredsCRUD.save_prediction)
+    save_predictions_batch = run_sync_method(PredsCRUD.save_predictions_batch)
+    get_predictions = run_sync_method(PredsCRUD.get_predictions)
+    get_predictions_columns = run_sync_method(PredsCRUD.get_predictions_columns)
+    get_future_predictions = run_sync_method(PredsCRUD.get_future_predictions)
+    get_actual_vs_predicted = run_sync_method(PredsCRUD.get_actual_vs_predicted)
+
+    async def stream_predictions(self, *args, **kwargs) -> AsyncResult:
+        """Чтение предсказаний серверным курсором частями по STREAM_YIELD_PER (аргументы predictions_select)"""
+        stmt = PredsCRUD(self.db.sync_session).predictions_select(*args, **kwargs)
+        return await self.db.stream(stmt.execution_options(yield_per=STREAM_YIELD_PER))
+
+
+class AsyncRollupCRUD(AsyncCRUD):
+    sync_crud = RollupCRUD
+
+    refresh_keys = run_sync_method(RollupCRUD.refresh_keys)
+    refresh_range = run_sync_method(RollupCRUD.refresh_range)
+    get_statistics = run_sync_method(RollupCRUD.get_statistics)
+    get_series = run_sync_method(RollupCRUD.get_series)
+    get_hour_of_day_profile = run_sync_method(RollupCRUD.get_hour_of_day_profile)
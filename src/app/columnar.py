@@ -0,0 +1,92 @@
+"""
+Колоночный формат ответов для рядов метрик.
+
+Вместо списка объектов (одна pydantic-модель на строку) ряд отдаётся параллельными
+массивами: JSON {"timestamp": [...], "value": [...]} или Arrow IPC stream.
+pyarrow - необязательная зависимость, без неё Arrow-ответ недоступен (406).
+"""
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - зависит от окружения
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+FORMAT_ROWS = 'rows'
+FORMAT_COLUMNAR = 'columnar'
+FORMAT_ARROW = 'arrow'
+
+# Значения параметра format
+REQUESTED_FORMATS = {
+    'json': FORMAT_ROWS,
+    FORMAT_COLUMNAR: FORMAT_COLUMNAR,
+    FORMAT_ARROW: FORMAT_ARROW,
+}
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    Выбор формата ответа
+
+    Args:
+        accept: Заголовок Accept
+        requested: Параметр format (json, columnar или arrow)
+
+    Returns:
+        FORMAT_ROWS, FORMAT_COLUMNAR, FORMAT_ARROW или None, если format не распознан
+    """
+    wants_arrow = ARROW_STREAM_MEDIA_TYPE in (accept or '').lower()
+    if requested:
+        output_format = REQUESTED_FORMATS.get(requested.lower())
+        # format=columnar с Accept Arrow - тот же колоночный ответ, но в Arrow
+        if output_format == FORMAT_COLUMNAR and wants_arrow:
+            return FORMAT_ARROW
+        return output_format
+    return FORMAT_ARROW if wants_arrow else FORMAT_ROWS
+
+
+def arrow_table(columns: Dict[str, List], metadata: Optional[Dict[str, str]] = None):
+    """Arrow-таблица из параллельных списков (timestamp в UTC, остальные колонки float64)"""
+    arrays = {}
+    for name, values in columns.items():
+        if name == 'timestamp':
+            arrays[name] = pa.array(values, type=pa.timestamp('us', tz='UTC'))
+        else:
+            arrays[name] = pa.array(values, type=pa.float64())
+    return pa.table(arrays, metadata=metadata)
+
+
+def columnar_response(columns: Dict[str, List], output_format: str, vm: str, metric: str) -> Response:
+    """
+    Ответ с рядом в колоночном виде
+
+    Args:
+        columns: Параллельные списки, одним из которых является 'timestamp'
+        output_format: FORMAT_COLUMNAR или FORMAT_ARROW
+        vm: Имя виртуальной машины
+        metric: Тип метрики
+
+    Returns:
+        JSONResponse или Response с Arrow IPC stream
+    """
+    if output_format == FORMAT_ARROW:
+        if pa is None:
+            raise HTTPException(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                detail="Arrow format is not available: pyarrow is not installed"
+            )
+        table = arrow_table(columns, metadata={'vm': vm, 'metric': metric})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    content = {'vm': vm, 'metric': metric, 'count': len(columns['timestamp'])}
+    for name, values in columns.items():
+        content[name] = [value.isoformat() for value in values] if name == 'timestamp' else values
+    return JSONResponse(content=content)
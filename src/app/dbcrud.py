@@ -1,10 +1,61 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
+from sqlalchemy import desc, and_, case, func, text, tuple_, type_coerce
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Tuple
+import os
+import time
+from collections import OrderedDict
 import models as db_models
+from routing import replica_read
+import partitions
+from rollup_crud import RollupCRUD
 import schemas as pydantic_models
 
+# Время жизни оценочной статистики (get_database_stats без exact)
+STATS_CACHE_TTL_SECONDS = float(os.getenv('STATS_CACHE_TTL_SECONDS', '60'))
+
+# URL базы (без пароля) -> (момент истечения по time.monotonic(), статистика)
+_stats_cache: Dict[str, Tuple[float, Dict]] = {}
+
+# Время жизни отчёта о полноте данных (get_completeness_report)
+COMPLETENESS_CACHE_TTL_SECONDS = float(os.getenv('COMPLETENESS_CACHE_TTL_SECONDS', '300'))
+
+# Наибольшее число отчётов в кэше: окна с end_date=now дают новый ключ на каждый запрос
+COMPLETENESS_CACHE_MAX_ENTRIES = int(os.getenv('COMPLETENESS_CACHE_MAX_ENTRIES', '128'))
+
+# (URL базы, start_date, end_date, интервал) -> (момент истечения, строки отчёта), в порядке записи
+_completeness_cache: 'OrderedDict[Tuple, Tuple[float, List[Dict]]]' = OrderedDict()
+
+# Строки (по reltuples, -1 у ещё не анализированных секций считается нулём) и полный размер
+# с индексами и TOAST; у секционированной таблицы - сумма по её секциям
+RELATION_ESTIMATE_SQL = text("""
+    SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint AS rows,
+           coalesce(sum(pg_total_relation_size(c.oid)), 0)::bigint AS bytes
+    FROM pg_partition_tree(to_regclass(:table)) tree
+    JOIN pg_class c ON c.oid = tree.relid
+    WHERE tree.isleaf
+""")
+
+def clear_stats_cache() -> None:
+    """Сброс кэша оценочной статистики"""
+    _stats_cache.clear()
+
+
+def clear_completeness_cache() -> None:
+    """Сброс кэша отчётов о полноте данных"""
+    _completeness_cache.clear()
+
+
+def _store_completeness(key: Tuple, report: List[Dict]) -> None:
+    # При записи удаляются истёкшие отчёты, а сверх COMPLETENESS_CACHE_MAX_ENTRIES - самые старые
+    now = time.monotonic()
+    for expired in [k for k, (expires_at, _) in _completeness_cache.items() if expires_at <= now]:
+        del _completeness_cache[expired]
+    _completeness_cache[key] = (now + COMPLETENESS_CACHE_TTL_SECONDS, report)
+    _completeness_cache.move_to_end(key)
+    while len(_completeness_cache) > COMPLETENESS_CACHE_MAX_ENTRIES:
+        _completeness_cache.popitem(last=False)
+
 
 class DBCRUD:
     def __init__(self, db: Session):
@@ -14,17 +65,19 @@ class DBCRUD:
 
     def get_all_vms(self) -> List[str]:
         """
-        Получить список всех виртуальных машин в базе
+        Получить список всех виртуальных машин в базе (по справочнику рядов)
 
         Returns:
             Список имен VM
         """
-        result = self.db.query(db_models.ServerMetricsFact.vm).distinct().all()
+        result = self.db.query(db_models.ServerMetricsSeries.vm).distinct().order_by(
+            db_models.ServerMetricsSeries.vm
+        ).all()
         return [row[0] for row in result]
 
     def get_metrics_for_vm(self, vm: str) -> List[str]:
         """
-        Получить список метрик для конкретной VM
+        Получить список метрик для конкретной VM (по справочнику рядов)
 
         Args:
             vm: Имя виртуальной машины
@@ -32,9 +85,9 @@ class DBCRUD:
         Returns:
             Список метрик
         """
-        result = self.db.query(db_models.ServerMetricsFact.metric).filter(
-            db_models.ServerMetricsFact.vm == vm
-        ).distinct().all()
+        result = self.db.query(db_models.ServerMetricsSeries.metric).filter(
+            db_models.ServerMetricsSeries.vm == vm
+        ).order_by(db_models.ServerMetricsSeries.metric).all()
         return [row[0] for row in result]
 
     def get_data_time_range(self, vm: str, metric: str) -> Dict:
@@ -48,33 +101,63 @@ class DBCRUD:
         Returns:
             Словарь с датами начала и конца
         """
-        first_record = self.db.query(db_models.ServerMetricsFact).filter(
-            db_models.ServerMetricsFact.vm == vm,
-            db_models.ServerMetricsFact.metric == metric
-        ).order_by(db_models.ServerMetricsFact.timestamp).first()
+        return self.get_data_time_ranges([(vm, metric)]).get((vm, metric), {})
 
-        last_record = self.db.query(db_models.ServerMetricsFact).filter(
-            db_models.ServerMetricsFact.vm == vm,
-            db_models.ServerMetricsFact.metric == metric
-        ).order_by(desc(db_models.ServerMetricsFact.timestamp)).first()
+    def get_data_time_ranges(self, series: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+        """
+        Получить временные диапазоны и количество точек для нескольких рядов
+
+        Диапазоны читаются одним запросом из справочника рядов; ряды, которых в нём нет
+        (данные загружены в обход API и ещё не обработаны refresh_range), - одним
+        сгруппированным запросом min/max/count по фактам.
+
+        Args:
+            series: Ряды (vm, metric)
 
-        if not first_record or not last_record:
+        Returns:
+            Словарь (vm, metric) -> first_timestamp, last_timestamp, total_hours, total_records
+            (ряды без данных не включаются)
+        """
+        series = list(dict.fromkeys(series))
+        if not series:
             return {}
 
+        catalog = db_models.ServerMetricsSeries
+        rows = self.db.query(
+            catalog.vm, catalog.metric, catalog.first_ts, catalog.last_ts, catalog.point_count
+        ).filter(
+            tuple_(catalog.vm, catalog.metric).in_(series),
+            catalog.first_ts.isnot(None)
+        ).all()
+
+        missing = set(series) - {(row.vm, row.metric) for row in rows}
+        if missing:
+            fact = db_models.ServerMetricsFact
+            rows += self.db.query(
+                fact.vm, fact.metric, func.min(fact.timestamp), func.max(fact.timestamp), func.count(fact.value)
+            ).filter(
+                tuple_(fact.vm, fact.metric).in_(list(missing))
+            ).group_by(fact.vm, fact.metric).all()
+
         return {
-            'first_timestamp': first_record.timestamp,
-            'last_timestamp': last_record.timestamp,
-            'total_hours': (last_record.timestamp - first_record.timestamp).total_seconds() / 3600,
-            'total_records': self.db.query(db_models.ServerMetricsFact).filter(
-                db_models.ServerMetricsFact.vm == vm,
-                db_models.ServerMetricsFact.metric == metric
-            ).count()
+            (vm, metric): {
+                'first_timestamp': first,
+                'last_timestamp': last,
+                'total_hours': (last - first).total_seconds() / 3600,
+                'total_records': count
+            }
+            for vm, metric, first, last, count in rows
         }
 
     def cleanup_old_data(self, days_to_keep: int = 90) -> Dict:
         """
         Очистка старых данных
 
+        На PostgreSQL секции, целиком лежащие раньше границы хранения, отсоединяются
+        и удаляются (DETACH + DROP) без построчного DELETE; строки месяца, в который попадает
+        граница, удаляются вместе с его секцией. На остальных СУБД - DELETE по timestamp.
+        Справочник рядов пересчитывается в той же транзакции.
+
         Args:
             days_to_keep: Количество дней для хранения
 
@@ -83,6 +166,28 @@ class DBCRUD:
         """
         cutoff_date = datetime.now() - timedelta(days=days_to_keep)
 
+        if self.db.get_bind().dialect.name == 'postgresql':
+            try:
+                connection = self.db.connection()
+                fact_result = partitions.drop_partitions_before(
+                    connection, db_models.ServerMetricsFact.__tablename__, cutoff_date
+                )
+                pred_result = partitions.drop_partitions_before(
+                    connection, db_models.ServerMetricsPredictions.__tablename__, cutoff_date
+                )
+                RollupCRUD(self.db).refresh_series()
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+
+            return {
+                'fact_records_deleted': fact_result['rows'],
+                'prediction_records_deleted': pred_result['rows'],
+                'partitions_dropped': fact_result['partitions'] + pred_result['partitions'],
+                'cutoff_date': cutoff_date
+            }
+
         # Удаляем старые фактические данные
         fact_deleted = self.db.query(db_models.ServerMetricsFact).filter(
             db_models.ServerMetricsFact.timestamp < cutoff_date
@@ -93,6 +198,7 @@ class DBCRUD:
             db_models.ServerMetricsPredictions.timestamp < cutoff_date
         ).delete(synchronize_session=False)
 
+        RollupCRUD(self.db).refresh_series()
         self.db.commit()
 
         return {
@@ -101,68 +207,113 @@ class DBCRUD:
             'cutoff_date': cutoff_date
         }
 
-    def get_database_stats(self) -> Dict:
+    @replica_read
+    def get_database_stats(self, exact: bool = False) -> Dict:
         """
         Получение статистики базы данных
 
+        На PostgreSQL по умолчанию - оценка без сканирования фактов: количество строк
+        из pg_class.reltuples (по статистике последнего ANALYZE), объём из
+        pg_total_relation_size, VM, метрики и временной диапазон из справочника
+        server_metrics_series. Результат кэшируется на STATS_CACHE_TTL_SECONDS.
+
+        Args:
+            exact: Точный подсчёт по таблицам фактов и прогнозов (без кэша)
+
         Returns:
             Словарь со статистикой
         """
         try:
-            # Подсчет записей в таблицах
-            fact_count = self.db.query(db_models.ServerMetricsFact).count()
-            prediction_count = self.db.query(db_models.ServerMetricsPredictions).count()
-
-            # Подсчет уникальных VM и метрик
-            vm_count = self.db.query(db_models.ServerMetricsFact.vm).distinct().count()
-            metric_count = self.db.query(db_models.ServerMetricsFact.metric).distinct().count()
-
-            # Временной диапазон данных
-            oldest_record = self.db.query(db_models.ServerMetricsFact).order_by(
-                db_models.ServerMetricsFact.timestamp
-            ).first()
-
-            newest_record = self.db.query(db_models.ServerMetricsFact).order_by(
-                desc(db_models.ServerMetricsFact.timestamp)
-            ).first()
-
-            stats = {
-                'fact_records': fact_count,
-                'prediction_records': prediction_count,
-                'total_records': fact_count + prediction_count,
-                'unique_vms': vm_count,
-                'unique_metrics': metric_count,
-                'data_volume_mb': self._estimate_data_volume(),
-                'oldest_record': oldest_record.timestamp if oldest_record else None,
-                'newest_record': newest_record.timestamp if newest_record else None,
-                'collection_period_days': (
-                    (newest_record.timestamp - oldest_record.timestamp).days
-                    if oldest_record and newest_record else 0
-                )
-            }
+            if exact or not self._is_postgres():
+                return self._exact_database_stats()
 
-            return stats
+            cache_key = self.db.get_bind().url.render_as_string(hide_password=True)
+            cached = _stats_cache.get(cache_key)
+            if cached and cached[0] > time.monotonic():
+                return dict(cached[1])
+
+            stats = self._estimated_database_stats()
+            _stats_cache[cache_key] = (time.monotonic() + STATS_CACHE_TTL_SECONDS, stats)
+            return dict(stats)
 
         except Exception as e:
             print(f"Error getting database stats: {e}")
             return {}
 
-    def _estimate_data_volume(self) -> float:
-        """
-        Оценка объема данных в базе (в МБ)
-
-        Returns:
-            Примерный объем в мегабайтах
-        """
-        # Примерная оценка: каждая запись ~ 100 байт
+    def _exact_database_stats(self) -> Dict:
+        # Подсчет записей в таблицах
         fact_count = self.db.query(db_models.ServerMetricsFact).count()
-        pred_count = self.db.query(db_models.ServerMetricsPredictions).count()
-
-        total_bytes = (fact_count + pred_count) * 100
+        prediction_count = self.db.query(db_models.ServerMetricsPredictions).count()
+
+        # Подсчет уникальных VM и метрик
+        vm_count = self.db.query(db_models.ServerMetricsFact.vm).distinct().count()
+        metric_count = self.db.query(db_models.ServerMetricsFact.metric).distinct().count()
+
+        # Временной диапазон данных
+        oldest, newest = self.db.query(
+            func.min(db_models.ServerMetricsFact.timestamp),
+            func.max(db_models.ServerMetricsFact.timestamp)
+        ).one()
+
+        if self._is_postgres():
+            data_volume_mb = self._relation_sizes_mb()
+        else:
+            # Примерная оценка: каждая запись ~ 100 байт
+            data_volume_mb = round((fact_count + prediction_count) * 100 / (1024 * 1024), 2)
+
+        return self._stats_dict(fact_count, prediction_count, vm_count, metric_count,
+                                data_volume_mb, oldest, newest, estimated=False)
+
+    def _estimated_database_stats(self) -> Dict:
+        fact_count, fact_bytes = self.db.execute(
+            RELATION_ESTIMATE_SQL, {'table': db_models.ServerMetricsFact.__tablename__}
+        ).one()
+        prediction_count, prediction_bytes = self.db.execute(
+            RELATION_ESTIMATE_SQL, {'table': db_models.ServerMetricsPredictions.__tablename__}
+        ).one()
+        vm_count, metric_count = self.db.query(
+            func.count(func.distinct(db_models.ServerMetricsSeries.vm)),
+            func.count(func.distinct(db_models.ServerMetricsSeries.metric))
+        ).one()
+        oldest, newest = self.db.query(
+            func.min(db_models.ServerMetricsSeries.first_ts),
+            func.max(db_models.ServerMetricsSeries.last_ts)
+        ).one()
+
+        data_volume_mb = round((fact_bytes + prediction_bytes) / (1024 * 1024), 2)
+        return self._stats_dict(fact_count, prediction_count, vm_count, metric_count,
+                                data_volume_mb, oldest, newest, estimated=True)
+
+    def _relation_sizes_mb(self) -> float:
+        total_bytes = sum(
+            self.db.execute(RELATION_ESTIMATE_SQL, {'table': model.__tablename__}).one()[1]
+            for model in (db_models.ServerMetricsFact, db_models.ServerMetricsPredictions)
+        )
         return round(total_bytes / (1024 * 1024), 2)
 
+    @staticmethod
+    def _stats_dict(fact_count: int, prediction_count: int, vm_count: int, metric_count: int,
+                    data_volume_mb: float, oldest: Optional[datetime], newest: Optional[datetime],
+                    estimated: bool) -> Dict:
+        return {
+            'fact_records': fact_count,
+            'prediction_records': prediction_count,
+            'total_records': fact_count + prediction_count,
+            'unique_vms': vm_count,
+            'unique_metrics': metric_count,
+            'data_volume_mb': data_volume_mb,
+            'oldest_record': oldest,
+            'newest_record': newest,
+            'collection_period_days': (newest - oldest).days if oldest and newest else 0,
+            'estimated': estimated
+        }
+
+    def _is_postgres(self) -> bool:
+        return self.db.get_bind().dialect.name == 'postgresql'
+
     # ================================== МЕТОДЫ ДЛЯ АНАЛИЗА ====================================
 
+    @replica_read
     def detect_missing_data(
             self,
             vm: str,
@@ -184,29 +335,84 @@ class DBCRUD:
         Returns:
             Список пропущенных интервалов
         """
-        # Получаем все записи в периоде
-        records = self.get_historical_metrics(vm, metric, start_date, end_date)
+        return self._find_gaps(
+            [db_models.ServerMetricsFact.vm == vm, db_models.ServerMetricsFact.metric == metric],
+            start_date, end_date, expected_interval_minutes, with_series=False
+        )
 
-        if len(records) < 2:
-            return []
+    @replica_read
+    def detect_missing_data_all(
+            self,
+            start_date: datetime,
+            end_date: datetime,
+            expected_interval_minutes: int = 30
+    ) -> List[Dict]:
+        """
+        Обнаружение пропущенных данных по всем рядам за один проход
 
-        missing_intervals = []
+        Args:
+            start_date: Начальная дата
+            end_date: Конечная дата
+            expected_interval_minutes: Ожидаемый интервал между записями
+
+        Returns:
+            Список пропущенных интервалов с vm и metric, упорядоченный по ряду и времени
+        """
+        return self._find_gaps([], start_date, end_date, expected_interval_minutes, with_series=True)
+
+    def _find_gaps(
+            self,
+            filters: List,
+            start_date: datetime,
+            end_date: datetime,
+            expected_interval_minutes: int,
+            with_series: bool
+    ) -> List[Dict]:
+        """
+        Пропуски между соседними записями рядов: LAG(timestamp) по ряду в порядке времени
+
+        На PostgreSQL интервалы сравниваются в запросе и возвращаются только пропуски;
+        на других СУБД сравнение выполняется при чтении (по две метки времени на строку).
+        Ограничения на число записей нет.
+        """
+        fact = db_models.ServerMetricsFact
         expected_interval = timedelta(minutes=expected_interval_minutes)
+        # Пропуск - интервал больше ожидаемого более чем в 1.5 раза
+        threshold = expected_interval * 1.5
+
+        # Тип столбца у оконного выражения: на SQLite метка иначе читается строкой
+        prev_ts = type_coerce(func.lag(fact.timestamp).over(
+            partition_by=(fact.vm, fact.metric),
+            order_by=fact.timestamp
+        ), fact.timestamp.type)
+        steps = self.db.query(
+            fact.vm, fact.metric, prev_ts.label('prev_ts'), fact.timestamp.label('ts')
+        ).filter(
+            *filters,
+            fact.timestamp >= start_date,
+            fact.timestamp <= end_date
+        ).subquery()
+
+        query = self.db.query(steps.c.vm, steps.c.metric, steps.c.prev_ts, steps.c.ts).filter(
+            steps.c.prev_ts.isnot(None)
+        )
+        if self._is_postgres():
+            query = query.filter(steps.c.ts - steps.c.prev_ts > threshold)
 
-        for i in range(len(records) - 1):
-            current_time = records[i].timestamp
-            next_time = records[i + 1].timestamp
+        missing_intervals = []
+        for vm, metric, current_time, next_time in query.order_by(steps.c.vm, steps.c.metric, steps.c.ts):
             actual_interval = next_time - current_time
-
-            # Если интервал больше ожидаемого более чем в 1.5 раза
-            if actual_interval > expected_interval * 1.5:
-                missing_intervals.append({
-                    'gap_start': current_time,
-                    'gap_end': next_time,
-                    'gap_duration_minutes': actual_interval.total_seconds() / 60,
-                    'expected_interval_minutes': expected_interval_minutes,
-                    'missing_points': int((actual_interval.total_seconds() / 60) / expected_interval_minutes) - 1
-                })
+            if actual_interval <= threshold:
+                continue
+            gap = {'vm': vm, 'metric': metric} if with_series else {}
+            gap.update({
+                'gap_start': current_time,
+                'gap_end': next_time,
+                'gap_duration_minutes': actual_interval.total_seconds() / 60,
+                'expected_interval_minutes': expected_interval_minutes,
+                'missing_points': int((actual_interval.total_seconds() / 60) / expected_interval_minutes) - 1
+            })
+            missing_intervals.append(gap)
 
         return missing_intervals
 
@@ -254,6 +460,88 @@ class DBCRUD:
             'missing_intervals_count': len(missing_intervals)
         }
 
+    @replica_read
+    def get_completeness_report(
+            self,
+            start_date: datetime,
+            end_date: datetime,
+            expected_interval_minutes: int = 30
+    ) -> List[Dict]:
+        """
+        Отчёт о полноте данных по всем рядам за окно
+
+        Фактическое количество точек и количество пропусков (LAG по ряду) считаются одним
+        сгруппированным запросом; ряды справочника без точек в окне входят с нулями.
+        Отчёт кэшируется по окну на COMPLETENESS_CACHE_TTL_SECONDS
+        (не более COMPLETENESS_CACHE_MAX_ENTRIES окон).
+
+        Args:
+            start_date: Начальная дата
+            end_date: Конечная дата
+            expected_interval_minutes: Ожидаемый интервал
+
+        Returns:
+            Список словарей vm, metric, expected_points, actual_points,
+            completeness_percentage, missing_points, gap_count, упорядоченный по (vm, metric)
+        """
+        cache_key = (
+            self.db.get_bind().url.render_as_string(hide_password=True),
+            start_date, end_date, expected_interval_minutes
+        )
+        cached = _completeness_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return [dict(row) for row in cached[1]]
+
+        total_minutes = (end_date - start_date).total_seconds() / 60
+        expected_points = int(total_minutes / expected_interval_minutes) + 1
+        # Пропуск - интервал больше ожидаемого более чем в 1.5 раза
+        threshold_seconds = expected_interval_minutes * 60 * 1.5
+
+        fact = db_models.ServerMetricsFact
+        prev_ts = func.lag(fact.timestamp).over(
+            partition_by=(fact.vm, fact.metric),
+            order_by=fact.timestamp
+        )
+        steps = self.db.query(
+            fact.vm, fact.metric, prev_ts.label('prev_ts'), fact.timestamp.label('ts')
+        ).filter(
+            fact.timestamp >= start_date,
+            fact.timestamp <= end_date
+        ).subquery()
+        is_gap = case((self._seconds_between(steps.c.ts, steps.c.prev_ts) > threshold_seconds, 1), else_=0)
+
+        counts = {
+            (vm, metric): (actual_points, int(gap_count or 0))
+            for vm, metric, actual_points, gap_count in self.db.query(
+                steps.c.vm, steps.c.metric, func.count(), func.sum(is_gap)
+            ).group_by(steps.c.vm, steps.c.metric)
+        }
+        catalog = db_models.ServerMetricsSeries
+        for vm, metric in self.db.query(catalog.vm, catalog.metric).filter(catalog.first_ts <= end_date):
+            counts.setdefault((vm, metric), (0, 0))
+
+        report = []
+        for (vm, metric), (actual_points, gap_count) in sorted(counts.items()):
+            completeness_percentage = (actual_points / expected_points * 100) if expected_points > 0 else 0
+            report.append({
+                'vm': vm,
+                'metric': metric,
+                'expected_points': expected_points,
+                'actual_points': actual_points,
+                'completeness_percentage': round(completeness_percentage, 2),
+                'missing_points': expected_points - actual_points,
+                'gap_count': gap_count
+            })
+
+        _store_completeness(cache_key, report)
+        return [dict(row) for row in report]
+
+    def _seconds_between(self, later, earlier):
+        """Выражение: разница двух меток времени в секундах"""
+        if self._is_postgres():
+            return func.extract('epoch', later - earlier)
+        return (func.julianday(later) - func.julianday(earlier)) * 86400
+
     # ================================== МЕТОДЫ ДЛЯ МЕТРИК ====================================
 
     def get_historical_metrics(
@@ -0,0 +1,124 @@
+"""
+Прореживание рядов метрик для графиков.
+
+- LTTB (Largest-Triangle-Three-Buckets): выбирает реальные точки ряда, сохраняя форму графика
+- min/max/avg: ряд делится на равные по времени корзины, по каждой - среднее, минимум и максимум;
+  для корзин от часа и крупнее те же значения собираются из агрегатов (merge_buckets)
+
+Время передаётся как epoch в секундах (float64), чтобы все вычисления были векторными.
+"""
+from typing import Dict
+
+import numpy as np
+
+METHOD_LTTB = 'lttb'
+METHOD_MINMAX = 'minmax'
+METHODS = (METHOD_LTTB, METHOD_MINMAX)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Индексы точек, выбранных алгоритмом LTTB
+
+    Args:
+        x: Время (по возрастанию)
+        y: Значения
+        n_out: Количество точек в результате
+
+    Returns:
+        Массив индексов длины min(n_out, len(x)); первая и последняя точки сохраняются всегда
+    """
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    # Первая и последняя точки - отдельные корзины, остальные n - 2 точки делятся на n_out - 2 корзины
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    selected = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Площадь треугольника (выбранная точка, кандидат, среднее следующей корзины), без множителя 1/2
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(area.argmax())
+        indices[bucket + 1] = selected
+    return indices
+
+
+def minmax_buckets(x: np.ndarray, y: np.ndarray, origin: float, width: float) -> Dict[str, np.ndarray]:
+    """
+    Агрегация ряда по корзинам равной длительности (аналог date_bin в PostgreSQL)
+
+    Args:
+        x: Время (по возрастанию)
+        y: Значения
+        origin: Начало первой корзины
+        width: Длительность корзины в секундах
+
+    Returns:
+        Словарь массивов: timestamp (начало корзины), value (среднее), min, max, count;
+        пустые корзины пропускаются
+    """
+    if len(x) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {'timestamp': empty, 'value': empty, 'min': empty, 'max': empty,
+                'count': np.array([], dtype=np.int64)}
+
+    bucket_ids = np.floor((x - origin) / width).astype(np.int64)
+    # x отсортирован, поэтому корзины идут подряд и reduceat работает по границам смены корзины
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(x)])
+
+    return {
+        'timestamp': origin + bucket_ids[starts] * width,
+        'value': np.add.reduceat(y, starts) / counts,
+        'min': np.minimum.reduceat(y, starts),
+        'max': np.maximum.reduceat(y, starts),
+        'count': counts,
+    }
+
+
+def merge_buckets(series: Dict[str, np.ndarray], origin: float, width: float) -> Dict[str, np.ndarray]:
+    """
+    Объединение часовых/суточных агрегатов в корзины равной длительности
+
+    Агрегат целиком относится к корзине, в которую попадает его начало.
+
+    Args:
+        series: Массивы timestamp (начало агрегата, по возрастанию), count, sum, min, max
+        origin: Начало первой корзины
+        width: Длительность корзины в секундах (не меньше длительности агрегата)
+
+    Returns:
+        Словарь массивов: timestamp (начало корзины), value (среднее, взвешенное по count), min, max, count
+    """
+    x = series['timestamp']
+    if len(x) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {'timestamp': empty, 'value': empty, 'min': empty, 'max': empty,
+                'count': np.array([], dtype=np.int64)}
+
+    # Агрегат, начавшийся раньше origin (неполный час/сутки в начале периода), - в первую корзину
+    bucket_ids = np.maximum(np.floor((x - origin) / width), 0).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    counts = np.add.reduceat(series['count'], starts)
+
+    return {
+        'timestamp': origin + bucket_ids[starts] * width,
+        'value': np.add.reduceat(series['sum'], starts) / counts,
+        'min': np.minimum.reduceat(series['min'], starts),
+        'max': np.maximum.reduceat(series['max'], starts),
+        'count': counts.astype(np.int64),
+    }
@@ -7,17 +7,26 @@ This module provides RESTful API endpoints for:
 - Predictions CRUD operations
 - Legacy endpoints for backward compatibility
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Body, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Body, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
 
-from connection import get_db
+from connection import get_db, engine
+from async_connection import get_async_db, async_engine, async_replicas
+from pool_metrics import pool_status
+from async_crud import AsyncDBCRUD, AsyncFactsCRUD, AsyncPredsCRUD, AsyncRollupCRUD
 import schemas as pydantic_models
-from dbcrud import DBCRUD
 from facts_crud import FactsCRUD
-from preds_crud import PredsCRUD
+from fact_stream import FactStreamParser, detect_stream_format
+from columnar import FORMAT_ROWS, FORMAT_COLUMNAR, columnar_response, negotiate_format
+from pagination import NDJSON_MEDIA_TYPE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, ndjson_lines
+import downsampling
+import retention
 from base_logger import logger
 import models as db_models
 
@@ -35,6 +44,10 @@ MAX_DAYS_TO_KEEP = 365
 MIN_INTERVAL_MINUTES = 1
 MAX_INTERVAL_MINUTES = 1440
 DEFAULT_INTERVAL_MINUTES = 30
+DEFAULT_POINTS = 1000
+COMPLETENESS_REPORT_COLUMNS = [
+    'vm', 'metric', 'expected_points', 'actual_points', 'completeness_percentage', 'missing_points', 'gap_count'
+]
 
 
 # ===========================================
@@ -84,6 +97,58 @@ def db_prediction_to_schema(db_pred: db_models.ServerMetricsPredictions) -> pyda
     )
 
 
+def resolve_output_format(request: Request, format: Optional[str]) -> str:
+    """
+    Resolve response format from the format query parameter and Accept header.
+
+    Args:
+        request: Incoming request
+        format: Requested format (json, columnar or arrow)
+
+    Returns:
+        Output format
+
+    Raises:
+        HTTPException: 400 if format is unknown
+    """
+    output_format = negotiate_format(request.headers.get('accept'), format)
+    if output_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported format. Use json, columnar or arrow"
+        )
+    return output_format
+
+
+def parse_cursor(cursor: Optional[str]):
+    """
+    Decode a pagination cursor.
+
+    Args:
+        cursor: Cursor from the X-Next-Cursor header of the previous page
+
+    Returns:
+        (timestamp, id) key of the last row of the previous page, or None
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid
+    """
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def is_ndjson_requested(format: Optional[str]) -> bool:
+    """Check whether a streaming NDJSON response is requested."""
+    return format is not None and format.lower() == 'ndjson'
+
+
 def validate_date_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> None:
     """
     Validate that start_date is before end_date.
@@ -142,7 +207,7 @@ def handle_database_error(operation: str, error: Exception, context: Optional[st
 # ===========================================
 
 @router.get("/vms", response_model=List[str], tags=["Database"])
-async def get_all_vms(db: Session = Depends(get_db)) -> List[str]:
+async def get_all_vms(db: AsyncSession = Depends(get_async_db)) -> List[str]:
     """
     Get list of all virtual machines in the database.
 
@@ -153,8 +218,8 @@ async def get_all_vms(db: Session = Depends(get_db)) -> List[str]:
         HTTPException: If database error occurs
     """
     try:
-        crud = DBCRUD(db)
-        vms = crud.get_all_vms()
+        crud = AsyncDBCRUD(db)
+        vms = await crud.get_all_vms()
         return vms or []
     except SQLAlchemyError as e:
         raise handle_database_error("retrieving VMs", e)
@@ -167,7 +232,7 @@ async def get_all_vms(db: Session = Depends(get_db)) -> List[str]:
 
 
 @router.get("/vms/{vm}/metrics", response_model=List[str], tags=["Database"])
-async def get_metrics_for_vm(vm: str, db: Session = Depends(get_db)) -> List[str]:
+async def get_metrics_for_vm(vm: str, db: AsyncSession = Depends(get_async_db)) -> List[str]:
     """
     Get list of available metrics for a specific VM.
 
@@ -187,8 +252,8 @@ async def get_metrics_for_vm(vm: str, db: Session = Depends(get_db)) -> List[str
         )
 
     try:
-        crud = DBCRUD(db)
-        metrics = crud.get_metrics_for_vm(vm.strip())
+        crud = AsyncDBCRUD(db)
+        metrics = await crud.get_metrics_for_vm(vm.strip())
         return metrics or []
     except SQLAlchemyError as e:
         raise handle_database_error("retrieving metrics", e, f"VM: {vm}")
@@ -205,7 +270,7 @@ async def get_metrics_for_vm(vm: str, db: Session = Depends(get_db)) -> List[str
 async def get_data_time_range(
         vm: str,
         metric: str,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> pydantic_models.TimeRangeResponse:
     """
     Get time range of available data for a VM and metric.
@@ -232,8 +297,8 @@ async def get_data_time_range(
         )
 
     try:
-        crud = DBCRUD(db)
-        time_range = crud.get_data_time_range(vm.strip(), metric.strip())
+        crud = AsyncDBCRUD(db)
+        time_range = await crud.get_data_time_range(vm.strip(), metric.strip())
 
         if not time_range:
             raise HTTPException(
@@ -254,11 +319,67 @@ async def get_data_time_range(
         )
 
 
+@router.post("/time-ranges", response_model=List[pydantic_models.SeriesTimeRangeResponse], tags=["Database"])
+async def get_data_time_ranges(
+        series: List[pydantic_models.SeriesKey],
+        db: AsyncSession = Depends(get_async_db)
+) -> List[pydantic_models.SeriesTimeRangeResponse]:
+    """
+    Get time ranges of available data for many VM/metric pairs in one call.
+
+    Args:
+        series: List of {"vm": ..., "metric": ...} pairs (max: 10000)
+
+    Returns:
+        Time range information for every pair that has data, in request order
+
+    Raises:
+        HTTPException: 400 if the list is empty or too large, 500 if database error occurs
+    """
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Series list cannot be empty"
+        )
+    if len(series) > MAX_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many series. Maximum {MAX_LIMIT} per request"
+        )
+
+    keys = list(dict.fromkeys((item.vm.strip(), item.metric.strip()) for item in series))
+
+    try:
+        crud = AsyncDBCRUD(db)
+        time_ranges = await crud.get_data_time_ranges(keys)
+        return [
+            pydantic_models.SeriesTimeRangeResponse(vm=vm, metric=metric, **time_ranges[(vm, metric)])
+            for vm, metric in keys if (vm, metric) in time_ranges
+        ]
+    except SQLAlchemyError as e:
+        raise handle_database_error("retrieving time ranges", e)
+    except Exception as e:
+        logger.error(f"Unexpected error getting time ranges: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while retrieving time ranges"
+        )
+
+
 @router.get("/stats", response_model=pydantic_models.DatabaseStatsResponse, tags=["Database"])
-async def get_database_stats(db: Session = Depends(get_db)) -> pydantic_models.DatabaseStatsResponse:
+async def get_database_stats(
+        exact: bool = Query(False, description="Exact counts instead of cached catalog estimates"),
+        db: AsyncSession = Depends(get_async_db)
+) -> pydantic_models.DatabaseStatsResponse:
     """
     Get database statistics.
 
+    On PostgreSQL counts and data volume are estimated from the catalog and cached;
+    exact=true scans the fact and prediction tables.
+
+    Args:
+        exact: Compute exact statistics (slow on large tables)
+
     Returns:
         Database statistics including record counts, unique VMs/metrics, data volume
 
@@ -266,8 +387,8 @@ async def get_database_stats(db: Session = Depends(get_db)) -> pydantic_models.D
         HTTPException: If database error occurs
     """
     try:
-        crud = DBCRUD(db)
-        stats = crud.get_database_stats()
+        crud = AsyncDBCRUD(db)
+        stats = await crud.get_database_stats(exact=exact)
         return pydantic_models.DatabaseStatsResponse(**stats)
     except SQLAlchemyError as e:
         raise handle_database_error("retrieving database statistics", e)
@@ -279,40 +400,138 @@ async def get_database_stats(db: Session = Depends(get_db)) -> pydantic_models.D
         )
 
 
-@router.post("/cleanup", response_model=Dict[str, Any], tags=["Database"])
+@router.post("/cleanup", response_model=pydantic_models.RetentionJobResponse,
+             status_code=status.HTTP_202_ACCEPTED, tags=["Database"])
 async def cleanup_old_data(
+        background_tasks: BackgroundTasks,
         days_to_keep: int = Body(
             DEFAULT_DAYS_TO_KEEP,
             ge=1,
             le=MAX_DAYS_TO_KEEP,
             description="Number of days to keep"
         ),
-        db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+        policies: Optional[Dict[str, int]] = Body(
+            None,
+            description="Days to keep per metric (default: RETENTION_POLICIES)"
+        ),
+        rollup_before_delete: bool = Body(
+            retention.RETENTION_ROLLUP_BEFORE_DELETE,
+            description="Refresh rollups for the expiring period before deleting raw data"
+        )
+) -> pydantic_models.RetentionJobResponse:
     """
-    Clean up old data from database.
+    Start a background retention job that deletes old data.
+
+    Raw rows are deleted in bounded batches with a pause between them; on PostgreSQL
+    months expired for every policy are dropped as whole partitions. The job opens its
+    own database session. Track progress with GET /cleanup/jobs/{job_id}.
 
     Args:
         days_to_keep: Number of days of data to keep (default: 90, max: 365)
+        policies: Number of days to keep for specific metrics
+        rollup_before_delete: Refresh hourly and daily rollups before deleting raw data
 
     Returns:
-        Statistics about deleted records
+        Status of the started job
 
     Raises:
-        HTTPException: If database error occurs
+        HTTPException: 400 if a policy is invalid, 409 if another retention job is running
+    """
+    if policies is None:
+        policies = retention.RETENTION_POLICIES
+    for metric, days in policies.items():
+        if not metric.strip() or not 1 <= days <= MAX_DAYS_TO_KEEP:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid retention policy for metric '{metric}': days must be between 1 and {MAX_DAYS_TO_KEEP}"
+            )
+
+    try:
+        job = retention.submit_job(retention.RetentionJob(
+            days_to_keep,
+            {metric.strip(): days for metric, days in policies.items()},
+            rollup_before_delete=rollup_before_delete
+        ))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    background_tasks.add_task(retention.run_job_in_new_session, job)
+    logger.info(f"Retention job {job.id} started")
+    return pydantic_models.RetentionJobResponse(**job.snapshot())
+
+
+@router.get("/cleanup/jobs", response_model=List[pydantic_models.RetentionJobResponse], tags=["Database"])
+async def list_cleanup_jobs() -> List[pydantic_models.RetentionJobResponse]:
+    """
+    List recent retention jobs, newest first.
+
+    Returns:
+        Status of every retained job
+    """
+    return [pydantic_models.RetentionJobResponse(**job.snapshot()) for job in retention.list_jobs()]
+
+
+@router.get("/cleanup/jobs/{job_id}", response_model=pydantic_models.RetentionJobResponse, tags=["Database"])
+async def get_cleanup_job(job_id: str) -> pydantic_models.RetentionJobResponse:
+    """
+    Get progress of a retention job.
+
+    Args:
+        job_id: Job identifier returned by POST /cleanup
+
+    Returns:
+        Job status, current step, deleted record counts and number of batches
+
+    Raises:
+        HTTPException: 404 if the job is unknown
+    """
+    job = retention.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Retention job {job_id} not found"
+        )
+    return pydantic_models.RetentionJobResponse(**job.snapshot())
+
+
+@router.post("/rollups/refresh", response_model=Dict[str, Any], tags=["Database"])
+async def refresh_rollups(
+        start_date: datetime = Body(..., description="Start date (inclusive)"),
+        end_date: datetime = Body(..., description="End date (inclusive)"),
+        vm: Optional[str] = Body(None, description="Virtual machine name (default: all)"),
+        metric: Optional[str] = Body(None, description="Metric name (default: all)"),
+        db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    Rebuild hourly and daily rollups for a period.
+
+    The API ingest endpoints and utils/data_loader.py keep rollups up to date on their own;
+    this refresh job is needed for data written directly to server_metrics_fact by other tools.
+
+    Args:
+        start_date: Start of the period
+        end_date: End of the period
+        vm: Optional VM filter
+        metric: Optional metric filter
+
+    Returns:
+        Number of processed days and series-days
+
+    Raises:
+        HTTPException: 400 if invalid date range, 500 if database error occurs
     """
+    validate_date_range(start_date, end_date)
+
     try:
-        crud = DBCRUD(db)
-        result = crud.cleanup_old_data(days_to_keep)
-        logger.info(f"Cleanup completed: {result}")
-        return result
+        crud = AsyncRollupCRUD(db)
+        return await crud.refresh_range(start_date, end_date, vm=vm, metric=metric)
     except SQLAlchemyError as e:
-        raise handle_database_error("cleaning up old data", e)
+        raise handle_database_error("refreshing rollups", e)
     except Exception as e:
-        logger.error(f"Unexpected error cleaning up old data: {e}", exc_info=True)
+        logger.error(f"Unexpected error refreshing rollups: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An unexpected error occurred while cleaning up old data"
+            detail="An unexpected error occurred while refreshing rollups"
         )
 
 
@@ -329,7 +548,7 @@ async def get_data_completeness(
             le=MAX_INTERVAL_MINUTES,
             description="Expected interval in minutes"
         ),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> pydantic_models.DataCompletenessResponse:
     """
     Calculate data completeness for a VM and metric.
@@ -361,8 +580,8 @@ async def get_data_completeness(
         )
 
     try:
-        crud = DBCRUD(db)
-        completeness = crud.calculate_data_completeness(
+        crud = AsyncDBCRUD(db)
+        completeness = await crud.calculate_data_completeness(
             vm.strip(), metric.strip(), start_date, end_date, expected_interval_minutes
         )
         return pydantic_models.DataCompletenessResponse(**completeness)
@@ -378,6 +597,68 @@ async def get_data_completeness(
         )
 
 
+def completeness_report_csv(report: List[Dict[str, Any]]) -> Iterator[str]:
+    """Yield the completeness report as CSV lines, header first."""
+    yield ','.join(COMPLETENESS_REPORT_COLUMNS) + '\n'
+    for row in report:
+        yield ','.join(str(row[column]) for column in COMPLETENESS_REPORT_COLUMNS) + '\n'
+
+
+@router.get("/completeness/report", response_model=List[pydantic_models.CompletenessReportRow], tags=["Database"])
+async def get_completeness_report(
+        start_date: datetime = Query(..., description="Start date"),
+        end_date: datetime = Query(..., description="End date"),
+        expected_interval_minutes: int = Query(
+            DEFAULT_INTERVAL_MINUTES,
+            ge=MIN_INTERVAL_MINUTES,
+            le=MAX_INTERVAL_MINUTES,
+            description="Expected interval in minutes"
+        ),
+        format: str = Query("json", description="Response format: json (default) or csv"),
+        db: AsyncSession = Depends(get_async_db)
+) -> List[pydantic_models.CompletenessReportRow]:
+    """
+    Calculate data completeness for every VM and metric over a window.
+
+    Points and gaps of all series are counted in one grouped query; the report is
+    cached per window. With format=csv the report is streamed as a CSV table.
+
+    Args:
+        start_date: Start date for analysis
+        end_date: End date for analysis
+        expected_interval_minutes: Expected interval between data points (default: 30, max: 1440)
+        format: Response format (json or csv)
+
+    Returns:
+        One row per series, ordered by VM and metric
+
+    Raises:
+        HTTPException: 400 if invalid date range or format, 500 if database error occurs
+    """
+    validate_date_range(start_date, end_date)
+
+    if format.lower() not in ('json', 'csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported format. Use json or csv"
+        )
+
+    try:
+        crud = AsyncDBCRUD(db)
+        report = await crud.get_completeness_report(start_date, end_date, expected_interval_minutes)
+        if format.lower() == 'csv':
+            return StreamingResponse(completeness_report_csv(report), media_type='text/csv')
+        return [pydantic_models.CompletenessReportRow(**row) for row in report]
+    except SQLAlchemyError as e:
+        raise handle_database_error("calculating completeness report", e)
+    except Exception as e:
+        logger.error(f"Unexpected error calculating completeness report: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while calculating completeness report"
+        )
+
+
 @router.get("/vms/{vm}/metrics/{metric}/missing-data", response_model=List[Dict[str, Any]], tags=["Database"])
 async def get_missing_data(
         vm: str,
@@ -390,7 +671,7 @@ async def get_missing_data(
             le=MAX_INTERVAL_MINUTES,
             description="Expected interval in minutes"
         ),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """
     Detect missing data intervals for a VM and metric.
@@ -422,8 +703,8 @@ async def get_missing_data(
         )
 
     try:
-        crud = DBCRUD(db)
-        missing = crud.detect_missing_data(
+        crud = AsyncDBCRUD(db)
+        missing = await crud.detect_missing_data(
             vm.strip(), metric.strip(), start_date, end_date, expected_interval_minutes
         )
         return missing or []
@@ -439,6 +720,67 @@ async def get_missing_data(
         )
 
 
+@router.get("/missing-data", response_model=List[Dict[str, Any]], tags=["Database"])
+async def get_missing_data_all(
+        start_date: datetime = Query(..., description="Start date"),
+        end_date: datetime = Query(..., description="End date"),
+        expected_interval_minutes: int = Query(
+            DEFAULT_INTERVAL_MINUTES,
+            ge=MIN_INTERVAL_MINUTES,
+            le=MAX_INTERVAL_MINUTES,
+            description="Expected interval in minutes"
+        ),
+        db: AsyncSession = Depends(get_async_db)
+) -> List[Dict[str, Any]]:
+    """
+    Detect missing data intervals for every VM and metric in one pass.
+
+    Args:
+        start_date: Start date for analysis
+        end_date: End date for analysis
+        expected_interval_minutes: Expected interval between data points (default: 30, max: 1440)
+
+    Returns:
+        List of missing data intervals with vm and metric, ordered by series and time
+
+    Raises:
+        HTTPException: 400 if invalid date range, 500 if database error occurs
+    """
+    validate_date_range(start_date, end_date)
+
+    try:
+        crud = AsyncDBCRUD(db)
+        return await crud.detect_missing_data_all(start_date, end_date, expected_interval_minutes)
+    except SQLAlchemyError as e:
+        raise handle_database_error("detecting missing data", e)
+    except Exception as e:
+        logger.error(f"Unexpected error detecting missing data: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while detecting missing data"
+        )
+
+
+@router.get("/metrics/pool", response_model=Dict[str, Any], tags=["Database"])
+async def get_pool_metrics() -> Dict[str, Any]:
+    """
+    Get connection pool state of the API engines.
+
+    Returns:
+        For the async (API) and sync (COPY stream) engines: pool size, checked-out,
+        checked-in and overflow connections, pool timeout, and accumulated checkout
+        wait time and pool timeout count since startup; the same for every read replica
+    """
+    return {
+        'async': pool_status(async_engine.pool),
+        'sync': pool_status(engine.pool),
+        'replicas': {
+            replica.url.render_as_string(hide_password=True): pool_status(replica.pool)
+            for replica in async_replicas.async_engines
+        },
+    }
+
+
 # ===========================================
 # FACTS CRUD ENDPOINTS (Fact Metrics)
 # ===========================================
@@ -446,7 +788,7 @@ async def get_missing_data(
 @router.post("/facts", response_model=pydantic_models.MetricFact, status_code=status.HTTP_201_CREATED, tags=["Facts"])
 async def create_metric_fact(
         metric: pydantic_models.MetricFactCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         background_tasks: Optional[BackgroundTasks] = None
 ) -> pydantic_models.MetricFact:
     """
@@ -463,7 +805,7 @@ async def create_metric_fact(
         HTTPException: 400 if validation fails, 500 if database error occurs
     """
     try:
-        crud = FactsCRUD(db)
+        crud = AsyncFactsCRUD(db)
         # Create a MetricFact with created_at for the CRUD method
         fact_data = pydantic_models.MetricFact(
             vm=metric.vm.strip() if metric.vm else metric.vm,
@@ -472,7 +814,7 @@ async def create_metric_fact(
             value=metric.value,
             created_at=datetime.now()
         )
-        db_metric = crud.create_metric_fact(fact_data)
+        db_metric = await crud.create_metric_fact(fact_data)
 
         # TODO: Add background task for anomaly detection if needed
         # if background_tasks:
@@ -498,7 +840,7 @@ async def create_metric_fact(
 @router.post("/facts/batch", response_model=pydantic_models.BatchCreateResponse, tags=["Facts"])
 async def create_metrics_fact_batch(
         metrics: List[pydantic_models.MetricFactCreate],
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> pydantic_models.BatchCreateResponse:
     """
     Batch create or update metric facts.
@@ -525,29 +867,33 @@ async def create_metrics_fact_batch(
         )
 
     try:
-        crud = FactsCRUD(db)
+        crud = AsyncFactsCRUD(db)
 
-        # Convert create schemas to fact schemas
-        fact_metrics = []
-        for metric in metrics:
-            fact_data = pydantic_models.MetricFact(
-                vm=metric.vm.strip() if metric.vm else metric.vm,
-                timestamp=metric.timestamp,
-                metric=metric.metric.strip() if metric.metric else metric.metric,
-                value=metric.value,
-                created_at=datetime.now()
-            )
-            fact_metrics.append(fact_data)
+        # Plain dicts go straight into the set-based upsert, no per-row ORM objects
+        rows = [
+            {
+                'vm': metric.vm.strip() if metric.vm else metric.vm,
+                'timestamp': metric.timestamp,
+                'metric': metric.metric.strip() if metric.metric else metric.metric,
+                'value': metric.value
+            }
+            for metric in metrics
+        ]
 
-        created_count = crud.create_metrics_fact_batch(fact_metrics)
-        failed_count = len(metrics) - created_count
+        result = await crud.upsert_metrics_fact_batch(rows)
+        created_count = result['inserted'] + result['updated']
 
-        logger.info(f"Batch create completed: {created_count}/{len(metrics)} metrics created")
+        logger.info(
+            f"Batch create completed: {created_count}/{len(metrics)} metrics "
+            f"({result['inserted']} inserted, {result['updated']} updated, {result['rejected']} rejected)"
+        )
 
         return pydantic_models.BatchCreateResponse(
             created=created_count,
-            failed=failed_count,
-            total=len(metrics)
+            failed=result['rejected'],
+            total=len(metrics),
+            inserted=result['inserted'],
+            updated=result['updated']
         )
     except SQLAlchemyError as e:
         raise handle_database_error("creating metrics batch", e)
@@ -559,32 +905,123 @@ async def create_metrics_fact_batch(
         )
 
 
+@router.post("/facts/stream", response_model=pydantic_models.BatchCreateResponse, tags=["Facts"])
+async def stream_metrics_fact(
+        request: Request,
+        format: Optional[str] = Query(None, description="Body format: csv or ndjson (default: from Content-Type)"),
+        db: Session = Depends(get_db)
+) -> pydantic_models.BatchCreateResponse:
+    """
+    Bulk load metric facts from a streamed CSV or NDJSON body.
+
+    The body is parsed incrementally and loaded with COPY into a staging table,
+    then merged into server_metrics_fact with a single upsert. There is no
+    row limit; invalid rows are counted as failed and skipped.
+
+    COPY needs the synchronous psycopg2 session, so database calls run in the threadpool.
+
+    Args:
+        format: Body format, overrides Content-Type (text/csv or application/x-ndjson)
+
+    Returns:
+        Load statistics
+
+    Raises:
+        HTTPException: 400 if format is unknown or CSV header is invalid, 500 if database error occurs
+    """
+    stream_format = detect_stream_format(request.headers.get('content-type'), format)
+    if stream_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported body format. Use text/csv or application/x-ndjson"
+        )
+
+    try:
+        crud = FactsCRUD(db)
+        parser = FactStreamParser(stream_format)
+
+        await run_in_threadpool(crud.begin_facts_staging)
+        async for rows in parser.chunks(request.stream()):
+            await run_in_threadpool(crud.copy_facts_to_staging, rows)
+        result = await run_in_threadpool(crud.merge_facts_staging)
+
+        created_count = result['inserted'] + result['updated']
+        failed_count = parser.rejected + result['rejected']
+
+        logger.info(
+            f"Stream load completed: {created_count}/{parser.total} metrics "
+            f"({result['inserted']} inserted, {result['updated']} updated, {failed_count} rejected)"
+        )
+
+        return pydantic_models.BatchCreateResponse(
+            created=created_count,
+            failed=failed_count,
+            total=parser.total,
+            inserted=result['inserted'],
+            updated=result['updated']
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise handle_database_error("streaming metrics load", e)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Unexpected error streaming metrics load: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while streaming metrics load"
+        )
+
+
 @router.get("/facts", response_model=List[pydantic_models.MetricFact], tags=["Facts"])
 async def get_metrics_fact(
+        request: Request,
+        response: Response,
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
         start_date: Optional[datetime] = Query(None, description="Start date (inclusive)"),
         end_date: Optional[datetime] = Query(None, description="End date (inclusive)"),
         limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="Maximum number of records"),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor of the previous page"),
+        format: Optional[str] = Query(None, description="Response format: json (default), columnar, arrow or ndjson"),
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[pydantic_models.MetricFact]:
     """
     Get historical metric facts with optional date filtering.
 
+    Pages are ordered by (timestamp, id). When a page is full, the X-Next-Cursor header
+    holds the cursor of the next page; pass it back as cursor.
+
+    With format=columnar (or Accept: application/vnd.apache.arrow.stream) the series
+    is returned as parallel timestamp/value arrays, as JSON or as an Arrow IPC stream.
+    With format=ndjson the whole series is streamed as one JSON object per line,
+    without limit.
+
     Args:
         vm: Virtual machine name
         metric: Metric name
         start_date: Optional start date filter
         end_date: Optional end date filter
         limit: Maximum number of records to return (default: 5000, max: 10000)
+        cursor: Cursor of the next page
+        format: Response format (json, columnar, arrow or ndjson)
 
     Returns:
         List of metric facts (empty list if no data found)
 
     Raises:
-        HTTPException: 400 if invalid date range, 500 if database error occurs
+        HTTPException: 400 if invalid date range, format or cursor, 406 if Arrow is unavailable,
+            500 if database error occurs
     """
     validate_date_range(start_date, end_date)
+    stream = is_ndjson_requested(format)
+    output_format = FORMAT_ROWS if stream else resolve_output_format(request, format)
+    after = parse_cursor(cursor)
 
     if not vm or not vm.strip():
         raise HTTPException(
@@ -598,8 +1035,18 @@ async def get_metrics_fact(
         )
 
     try:
-        crud = FactsCRUD(db)
-        records = crud.get_metrics_fact(vm.strip(), metric.strip(), start_date, end_date, limit)
+        crud = AsyncFactsCRUD(db)
+        if stream:
+            rows = await crud.stream_metrics_fact(vm.strip(), metric.strip(), start_date, end_date)
+            return StreamingResponse(ndjson_lines(rows, db_metric_to_schema), media_type=NDJSON_MEDIA_TYPE)
+
+        if output_format != FORMAT_ROWS:
+            columns = await crud.get_metrics_fact_columns(vm.strip(), metric.strip(), start_date, end_date, limit)
+            return columnar_response(columns, output_format, vm.strip(), metric.strip())
+
+        records = await crud.get_metrics_fact(vm.strip(), metric.strip(), start_date, end_date, limit, after)
+        if len(records) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(records[-1].timestamp, records[-1].id)
 
         return [db_metric_to_schema(record) for record in records]
     except HTTPException:
@@ -616,10 +1063,12 @@ async def get_metrics_fact(
 
 @router.get("/facts/latest", response_model=List[pydantic_models.MetricFact], tags=["Facts"])
 async def get_latest_metrics_fact(
+        request: Request,
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
         hours: int = Query(DEFAULT_HOURS, ge=1, le=MAX_HOURS, description="Number of hours to retrieve"),
-        db: Session = Depends(get_db)
+        format: Optional[str] = Query(None, description="Response format: json (default), columnar or arrow"),
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[pydantic_models.MetricFact]:
     """
     Get latest metric facts for the last N hours.
@@ -628,13 +1077,16 @@ async def get_latest_metrics_fact(
         vm: Virtual machine name
         metric: Metric name
         hours: Number of hours to retrieve (default: 24, max: 720)
+        format: Response format (json, columnar or arrow)
 
     Returns:
         List of metric facts (empty list if no data found)
 
     Raises:
-        HTTPException: 500 if database error occurs
+        HTTPException: 400 if format is unknown, 406 if Arrow is unavailable, 500 if database error occurs
     """
+    output_format = resolve_output_format(request, format)
+
     if not vm or not vm.strip():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -647,10 +1099,17 @@ async def get_latest_metrics_fact(
         )
 
     try:
-        crud = FactsCRUD(db)
-        records = crud.get_latest_metrics(vm.strip(), metric.strip(), hours)
+        crud = AsyncFactsCRUD(db)
+        if output_format != FORMAT_ROWS:
+            cutoff_time = datetime.now() - timedelta(hours=hours)
+            columns = await crud.get_metrics_fact_columns(vm.strip(), metric.strip(), start_date=cutoff_time)
+            return columnar_response(columns, output_format, vm.strip(), metric.strip())
+
+        records = await crud.get_latest_metrics(vm.strip(), metric.strip(), hours)
 
         return [db_metric_to_schema(record) for record in records]
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise handle_database_error("retrieving latest metrics", e, f"VM: {vm}, Metric: {metric}")
     except Exception as e:
@@ -661,13 +1120,87 @@ async def get_latest_metrics_fact(
         )
 
 
+@router.get("/facts/downsampled", tags=["Facts"])
+async def get_metrics_fact_downsampled(
+        request: Request,
+        vm: str = Query(..., description="Virtual machine name"),
+        metric: str = Query(..., description="Metric name"),
+        start_date: Optional[datetime] = Query(None, description="Start date (inclusive, default: series start)"),
+        end_date: Optional[datetime] = Query(None, description="End date (inclusive, default: series end)"),
+        points: int = Query(DEFAULT_POINTS, ge=1, le=MAX_LIMIT, description="Maximum number of points"),
+        method: str = Query(downsampling.METHOD_LTTB, description="Downsampling method: lttb or minmax"),
+        format: Optional[str] = Query(None, description="Response format: columnar (default) or arrow"),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a metric series downsampled to at most N points.
+
+    The response size depends only on `points`, not on the length of the range.
+    Method `lttb` keeps real points chosen by Largest-Triangle-Three-Buckets;
+    method `minmax` returns equal-time buckets with avg (`value`), `min` and `max`.
+
+    Args:
+        vm: Virtual machine name
+        metric: Metric name
+        start_date: Optional start date (default: first point of the series)
+        end_date: Optional end date (default: last point of the series)
+        points: Maximum number of points (default: 1000, max: 10000)
+        method: Downsampling method (lttb or minmax)
+        format: Response format (columnar or arrow)
+
+    Returns:
+        Parallel timestamp/value arrays (plus min/max for minmax)
+
+    Raises:
+        HTTPException: 400 if invalid parameters, 406 if Arrow is unavailable, 500 if database error occurs
+    """
+    validate_date_range(start_date, end_date)
+
+    if not vm or not vm.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="VM name cannot be empty"
+        )
+    if not metric or not metric.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Metric name cannot be empty"
+        )
+    if method not in downsampling.METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported method. Use one of: {', '.join(downsampling.METHODS)}"
+        )
+
+    output_format = resolve_output_format(request, format)
+    if output_format == FORMAT_ROWS:
+        output_format = FORMAT_COLUMNAR
+
+    try:
+        crud = AsyncFactsCRUD(db)
+        columns = await crud.get_metrics_fact_downsampled(
+            vm.strip(), metric.strip(), start_date, end_date, points, method
+        )
+        return columnar_response(columns, output_format, vm.strip(), metric.strip())
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        raise handle_database_error("retrieving downsampled metrics", e, f"VM: {vm}, Metric: {metric}")
+    except Exception as e:
+        logger.error(f"Unexpected error getting downsampled metrics: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while retrieving downsampled metrics"
+        )
+
+
 @router.get("/facts/statistics", response_model=Dict[str, Any], tags=["Facts"])
 async def get_metrics_fact_statistics(
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
         start_date: Optional[datetime] = Query(None, description="Start date (inclusive)"),
         end_date: Optional[datetime] = Query(None, description="End date (inclusive)"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     Get aggregated statistics for a metric.
@@ -679,7 +1212,7 @@ async def get_metrics_fact_statistics(
         end_date: Optional end date filter
 
     Returns:
-        Statistics including count, min, max, avg, stddev
+        Statistics including count, min, max, avg, stddev and p95 (from hourly/daily rollups)
 
     Raises:
         HTTPException: 400 if invalid date range, 500 if database error occurs
@@ -698,8 +1231,8 @@ async def get_metrics_fact_statistics(
         )
 
     try:
-        crud = FactsCRUD(db)
-        stats = crud.get_metrics_fact_statistics(vm.strip(), metric.strip(), start_date, end_date)
+        crud = AsyncFactsCRUD(db)
+        stats = await crud.get_metrics_fact_statistics(vm.strip(), metric.strip(), start_date, end_date)
         return stats or {}
     except HTTPException:
         raise
@@ -721,7 +1254,7 @@ async def get_metrics_fact_statistics(
              tags=["Predictions"])
 async def save_prediction(
         prediction: pydantic_models.MetricPredictionCreate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> pydantic_models.MetricPrediction:
     """
     Save a prediction (upsert operation).
@@ -736,8 +1269,8 @@ async def save_prediction(
         HTTPException: 400 if validation fails, 500 if database error occurs
     """
     try:
-        crud = PredsCRUD(db)
-        db_pred = crud.save_prediction(
+        crud = AsyncPredsCRUD(db)
+        db_pred = await crud.save_prediction(
             vm=prediction.vm.strip() if prediction.vm else prediction.vm,
             metric=prediction.metric.strip() if prediction.metric else prediction.metric,
             timestamp=prediction.timestamp,
@@ -766,7 +1299,7 @@ async def save_prediction(
 @router.post("/predictions/batch", response_model=pydantic_models.BatchCreateResponse, tags=["Predictions"])
 async def save_predictions_batch(
         predictions: List[pydantic_models.MetricPredictionCreate],
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> pydantic_models.BatchCreateResponse:
     """
     Batch save predictions.
@@ -793,7 +1326,7 @@ async def save_predictions_batch(
         )
 
     try:
-        crud = PredsCRUD(db)
+        crud = AsyncPredsCRUD(db)
 
         # Convert to dict format expected by save_predictions_batch
         # Note: PredsCRUD.save_predictions_batch expects 'lower' and 'upper' keys
@@ -808,7 +1341,7 @@ async def save_predictions_batch(
                 'upper': pred.upper_bound
             })
 
-        saved_count = crud.save_predictions_batch(pred_dicts)
+        saved_count = await crud.save_predictions_batch(pred_dicts)
         failed_count = len(predictions) - saved_count
 
         logger.info(f"Batch save predictions completed: {saved_count}/{len(predictions)} predictions saved")
@@ -830,28 +1363,48 @@ async def save_predictions_batch(
 
 @router.get("/predictions", response_model=List[pydantic_models.MetricPrediction], tags=["Predictions"])
 async def get_predictions(
+        request: Request,
+        response: Response,
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
         start_date: Optional[datetime] = Query(None, description="Start date (inclusive)"),
         end_date: Optional[datetime] = Query(None, description="End date (inclusive)"),
-        db: Session = Depends(get_db)
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="Maximum number of records"),
+        cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor of the previous page"),
+        format: Optional[str] = Query(None, description="Response format: json (default), columnar, arrow or ndjson"),
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[pydantic_models.MetricPrediction]:
     """
     Get predictions for a VM and metric.
 
+    Pages are ordered by (timestamp, id). When a page is full, the X-Next-Cursor header
+    holds the cursor of the next page; pass it back as cursor.
+
+    With format=columnar (or Accept: application/vnd.apache.arrow.stream) predictions are
+    returned as parallel timestamp/value_predicted/lower_bound/upper_bound arrays.
+    With format=ndjson all predictions are streamed as one JSON object per line,
+    without limit.
+
     Args:
         vm: Virtual machine name
         metric: Metric name
         start_date: Optional start date filter
         end_date: Optional end date filter
+        limit: Maximum number of records to return (default: 5000, max: 10000)
+        cursor: Cursor of the next page
+        format: Response format (json, columnar, arrow or ndjson)
 
     Returns:
         List of predictions (empty list if no predictions found)
 
     Raises:
-        HTTPException: 400 if invalid date range, 500 if database error occurs
+        HTTPException: 400 if invalid date range, format or cursor, 406 if Arrow is unavailable,
+            500 if database error occurs
     """
     validate_date_range(start_date, end_date)
+    stream = is_ndjson_requested(format)
+    output_format = FORMAT_ROWS if stream else resolve_output_format(request, format)
+    after = parse_cursor(cursor)
 
     if not vm or not vm.strip():
         raise HTTPException(
@@ -865,8 +1418,18 @@ async def get_predictions(
         )
 
     try:
-        crud = PredsCRUD(db)
-        predictions = crud.get_predictions(vm.strip(), metric.strip(), start_date, end_date)
+        crud = AsyncPredsCRUD(db)
+        if stream:
+            rows = await crud.stream_predictions(vm.strip(), metric.strip(), start_date, end_date)
+            return StreamingResponse(ndjson_lines(rows, db_prediction_to_schema), media_type=NDJSON_MEDIA_TYPE)
+
+        if output_format != FORMAT_ROWS:
+            columns = await crud.get_predictions_columns(vm.strip(), metric.strip(), start_date, end_date)
+            return columnar_response(columns, output_format, vm.strip(), metric.strip())
+
+        predictions = await crud.get_predictions(vm.strip(), metric.strip(), start_date, end_date, limit, after)
+        if len(predictions) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(predictions[-1].timestamp, predictions[-1].id)
 
         return [db_prediction_to_schema(pred) for pred in predictions]
     except HTTPException:
@@ -885,7 +1448,7 @@ async def get_predictions(
 async def get_future_predictions(
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[pydantic_models.MetricPrediction]:
     """
     Get future predictions (timestamp > now) for a VM and metric.
@@ -912,8 +1475,8 @@ async def get_future_predictions(
         )
 
     try:
-        crud = PredsCRUD(db)
-        predictions = crud.get_future_predictions(vm.strip(), metric.strip())
+        crud = AsyncPredsCRUD(db)
+        predictions = await crud.get_future_predictions(vm.strip(), metric.strip())
 
         return [db_prediction_to_schema(pred) for pred in predictions]
     except SQLAlchemyError as e:
@@ -932,7 +1495,7 @@ async def get_actual_vs_predicted(
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
         hours: int = Query(DEFAULT_HOURS, ge=1, le=MAX_HOURS, description="Number of hours to compare"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[pydantic_models.ActualVsPredictedResponse]:
     """
     Compare actual values with predictions for a VM and metric.
@@ -960,8 +1523,8 @@ async def get_actual_vs_predicted(
         )
 
     try:
-        crud = PredsCRUD(db)
-        comparisons = crud.get_actual_vs_predicted(vm.strip(), metric.strip(), hours)
+        crud = AsyncPredsCRUD(db)
+        comparisons = await crud.get_actual_vs_predicted(vm.strip(), metric.strip(), hours)
 
         return [
             pydantic_models.ActualVsPredictedResponse(**comp)
@@ -985,7 +1548,7 @@ async def get_actual_vs_predicted(
 async def get_latest_metrics_legacy(
         vm: str = Query(..., description="Virtual machine name"),
         metric: str = Query(..., description="Metric name"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """
     [Legacy] Get latest metrics for the last 24 hours.
@@ -1015,8 +1578,8 @@ async def get_latest_metrics_legacy(
         )
 
     try:
-        crud = FactsCRUD(db)
-        data = crud.get_latest_metrics(vm.strip(), metric.strip(), DEFAULT_HOURS)
+        crud = AsyncFactsCRUD(db)
+        data = await crud.get_latest_metrics(vm.strip(), metric.strip(), DEFAULT_HOURS)
 
         return [
             {
@@ -1043,7 +1606,7 @@ async def get_metrics_legacy(
         days: Optional[int] = Query(1, ge=1, le=30, description="Number of days"),
         start_date: Optional[datetime] = Query(None, description="Start date"),
         end_date: Optional[datetime] = Query(None, description="End date"),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """
     [Legacy] Get metrics with flexible date range.
@@ -1084,14 +1647,14 @@ async def get_metrics_legacy(
         )
 
     try:
-        crud = FactsCRUD(db)
+        crud = AsyncFactsCRUD(db)
 
         if start_date and end_date:
             validate_date_range(start_date, end_date)
-            data = crud.get_metrics_fact(vm.strip(), metric.strip(), start_date, end_date)
+            data = await crud.get_metrics_fact(vm.strip(), metric.strip(), start_date, end_date)
         else:
             hours = days * 24 if days else DEFAULT_HOURS
-            data = crud.get_latest_metrics(vm.strip(), metric.strip(), hours)
+            data = await crud.get_latest_metrics(vm.strip(), metric.strip(), hours)
 
         return [
             {
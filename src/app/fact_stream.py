@@ -0,0 +1,210 @@
+"""
+Инкрементальный разбор тела запроса для потоковой загрузки фактических метрик.
+
+Тело (CSV с заголовком или NDJSON) читается по мере поступления байтов и отдаётся
+пачками кортежей (vm, timestamp, metric, value), без сборки всего списка в памяти
+и без pydantic-модели на каждую строку.
+"""
+import csv
+import codecs
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from facts_crud import fact_row_key
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+
+# Те же границы значения, что и в MetricFactCreate
+VALUE_MIN = 0.0
+VALUE_MAX = 100.0
+
+# Формат временных меток в выгрузках vCenter (см. utils/prepare_data.py)
+VCENTER_TIMESTAMP_FORMAT = '%d.%m.%y %H:%M:%S'
+
+# Названия колонок CSV, которые встречаются в выгрузках
+CSV_COLUMN_ALIASES = {
+    'vm': 'vm',
+    'vm_name': 'vm',
+    'timestamp': 'timestamp',
+    'metric': 'metric',
+    'value': 'value',
+}
+
+FactRow = Tuple[str, datetime, str, float]
+
+
+def detect_stream_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    Определение формата тела запроса
+
+    Args:
+        content_type: Заголовок Content-Type
+        requested: Явно указанный формат (csv или ndjson)
+
+    Returns:
+        FORMAT_CSV, FORMAT_NDJSON или None, если формат не распознан
+    """
+    if requested:
+        requested = requested.lower()
+        return requested if requested in (FORMAT_CSV, FORMAT_NDJSON) else None
+
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return FORMAT_CSV
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return FORMAT_NDJSON
+    return None
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Разбор временной метки в ISO 8601 или в формате vCenter"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, VCENTER_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+async def iter_lines(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Разбиение потока байтов на строки
+
+    Строка может быть разрезана между чанками, в том числе посреди символа UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = ''
+    async for chunk in byte_chunks:
+        text = tail + decoder.decode(chunk)
+        lines = text.split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    tail += decoder.decode(b'', final=True)
+    if tail.strip():
+        yield tail.rstrip('\r')
+
+
+class FactStreamParser:
+    """
+    Потоковый парсер фактических метрик
+
+    Считает общее количество строк и отклонённые строки; корректные строки
+    отдаются пачками по chunk_size.
+    """
+
+    def __init__(self, stream_format: str, chunk_size: int = 50000):
+        if stream_format not in (FORMAT_CSV, FORMAT_NDJSON):
+            raise ValueError(f"Unsupported stream format: {stream_format}")
+        self.stream_format = stream_format
+        self.chunk_size = chunk_size
+        self.total = 0
+        self.rejected = 0
+        self._columns: Optional[Dict[str, int]] = None
+
+    async def chunks(self, byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[List[FactRow]]:
+        """
+        Разбор потока байтов
+
+        Args:
+            byte_chunks: Асинхронный итератор байтов (например, Request.stream())
+
+        Yields:
+            Пачки кортежей (vm, timestamp, metric, value)
+        """
+        lines: List[str] = []
+        async for line in iter_lines(byte_chunks):
+            if not line.strip():
+                continue
+            lines.append(line)
+            if len(lines) >= self.chunk_size:
+                rows = self._parse_lines(lines)
+                lines = []
+                if rows:
+                    yield rows
+        if lines:
+            rows = self._parse_lines(lines)
+            if rows:
+                yield rows
+
+    def _parse_lines(self, lines: List[str]) -> List[FactRow]:
+        if self.stream_format == FORMAT_CSV:
+            records = self._csv_records(lines)
+        else:
+            records = self._ndjson_records(lines)
+
+        rows = []
+        for record in records:
+            self.total += 1
+            row = self._to_row(record)
+            if row is None:
+                self.rejected += 1
+            else:
+                rows.append(row)
+        return rows
+
+    def _csv_records(self, lines: List[str]):
+        reader = csv.reader(lines)
+        if self._columns is None:
+            header = next(reader, None)
+            if header is None:
+                return
+            columns = {}
+            for index, name in enumerate(header):
+                alias = CSV_COLUMN_ALIASES.get(name.strip().lower())
+                if alias and alias not in columns:
+                    columns[alias] = index
+            missing = [name for name in ('vm', 'timestamp', 'metric', 'value') if name not in columns]
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {missing}")
+            self._columns = columns
+
+        columns = self._columns
+        width = max(columns.values()) + 1
+        for fields in reader:
+            if len(fields) < width:
+                yield None
+                continue
+            yield {name: fields[index] for name, index in columns.items()}
+
+    @staticmethod
+    def _ndjson_records(lines: List[str]):
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield record if isinstance(record, dict) else None
+
+    @staticmethod
+    def _to_row(record: Optional[Dict]) -> Optional[FactRow]:
+        if record is None:
+            return None
+        try:
+            value = float(record.get('value'))
+        except (TypeError, ValueError):
+            return None
+        if not VALUE_MIN <= value <= VALUE_MAX:
+            return None
+
+        row = {
+            'vm': record.get('vm'),
+            'timestamp': parse_timestamp(record.get('timestamp')),
+            'metric': record.get('metric'),
+            'value': value,
+        }
+        key = fact_row_key(row)
+        if key is None:
+            return None
+        vm, timestamp, metric = key
+        return vm, timestamp, metric, value
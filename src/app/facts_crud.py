@@ -1,15 +1,118 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from sqlalchemy import (desc, and_, func, select, insert, update, tuple_, text, bindparam, any_, cast, literal,
+                        String, DateTime, Float, Interval)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Select
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Tuple
+import csv
+import io
+import math
+import uuid
+import numpy as np
+import pandas as pd
+import downsampling
+from rollup_crud import RollupCRUD, rollup_keys, to_utc
 import models as db_models
+from routing import replica_read
 import schemas as pydantic_models
 from base_logger import logger
 
+# Размер пачки для одного INSERT ... ON CONFLICT
+BATCH_CHUNK_SIZE = 5000
+
+# Пачка передаётся четырьмя массивами и разворачивается через unnest: один план на любой
+# размер пачки и никакой компиляции VALUES на стороне Python. Вставленные строки отличаются
+# по created_at = now() (время начала транзакции; при обновлении created_at не меняется):
+# системная колонка xmax в RETURNING секционированной таблицы недоступна.
+UPSERT_FACTS_SQL = text("""
+    WITH upserted AS (
+        INSERT INTO server_metrics_fact (id, vm, timestamp, metric, value)
+        SELECT gen_random_uuid(), r.vm, r.timestamp, r.metric, r.value
+        FROM unnest(:vms, :timestamps, :metrics, :vals) AS r(vm, timestamp, metric, value)
+        ON CONFLICT ON CONSTRAINT uq_vm_timestamp_metric DO UPDATE SET value = EXCLUDED.value
+        RETURNING (created_at = now()) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted) AS inserted, count(*) AS total FROM upserted
+""").bindparams(
+    bindparam('vms', type_=ARRAY(String)),
+    bindparam('timestamps', type_=ARRAY(DateTime(timezone=True))),
+    bindparam('metrics', type_=ARRAY(String)),
+    bindparam('vals', type_=ARRAY(Float))
+)
+
+# Staging-таблица потоковой загрузки живёт до конца транзакции; seq сохраняет порядок
+# строк, чтобы при дублях ключа побеждала последняя
+CREATE_FACTS_STAGING_SQL = text("""
+    CREATE TEMP TABLE IF NOT EXISTS server_metrics_fact_staging (
+        seq BIGSERIAL,
+        vm TEXT NOT NULL,
+        timestamp TIMESTAMPTZ NOT NULL,
+        metric TEXT NOT NULL,
+        value NUMERIC(20, 5)
+    ) ON COMMIT DROP
+""")
+
+COPY_FACTS_STAGING_SQL = (
+    "COPY server_metrics_fact_staging (vm, timestamp, metric, value) FROM STDIN WITH (FORMAT csv)"
+)
+
+MERGE_FACTS_STAGING_SQL = text("""
+    WITH upserted AS (
+        INSERT INTO server_metrics_fact (id, vm, timestamp, metric, value)
+        SELECT DISTINCT ON (vm, timestamp, metric) gen_random_uuid(), vm, timestamp, metric, value
+        FROM server_metrics_fact_staging
+        ORDER BY vm, timestamp, metric, seq DESC
+        ON CONFLICT ON CONSTRAINT uq_vm_timestamp_metric DO UPDATE SET value = EXCLUDED.value
+        RETURNING (created_at = now()) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted) AS inserted, count(*) AS total FROM upserted
+""")
+
+STAGING_ROLLUP_KEYS_SQL = text("""
+    SELECT vm, metric, min(timestamp) AS first, max(timestamp) AS last
+    FROM server_metrics_fact_staging
+    GROUP BY vm, metric
+""")
+
+
+def fact_row_key(row: Dict) -> Optional[Tuple[str, datetime, str]]:
+    """
+    Проверка строки перед записью
+
+    Returns:
+        Ключ (vm, timestamp, metric) или None, если строку нужно отклонить
+    """
+    vm = row.get('vm')
+    metric = row.get('metric')
+    timestamp = row.get('timestamp')
+    value = row.get('value')
+
+    if not isinstance(vm, str) or not vm.strip():
+        return None
+    if not isinstance(metric, str) or not metric.strip():
+        return None
+    if not isinstance(timestamp, datetime):
+        return None
+    try:
+        if value is None or not math.isfinite(float(value)):
+            return None
+    except (TypeError, ValueError):
+        return None
+
+    # chk_timestamp_not_future отклонил бы всю пачку целиком
+    now = datetime.now(timezone.utc) if timestamp.tzinfo else datetime.now()
+    if timestamp > now:
+        return None
+
+    return vm.strip(), timestamp, metric.strip()
+
 
 class FactsCRUD:
     def __init__(self, db: Session):
         self.db = db
+        self._staging_stats: Optional[Dict[str, int]] = None
 
     # =================================== ФАКТИЧЕСКИЕ МЕТРИКИ =====================================
 
@@ -29,8 +132,11 @@ class FactsCRUD:
             db_models.ServerMetricsFact.timestamp == metric.timestamp
         ).first()
 
+        rollup_key = rollup_keys([(metric.vm, metric.timestamp, metric.metric)])
+
         if existing:
             existing.value = metric.value
+            RollupCRUD(self.db).refresh_keys(rollup_key)
             self.db.commit()
             self.db.refresh(existing)
             return existing
@@ -42,6 +148,7 @@ class FactsCRUD:
             value=metric.value
         )
         self.db.add(db_metric)
+        RollupCRUD(self.db).refresh_keys(rollup_key)
         self.db.commit()
         self.db.refresh(db_metric)
         return db_metric
@@ -56,22 +163,226 @@ class FactsCRUD:
         Returns:
             Количество успешно обработанных записей
         """
-        created_count = 0
-        for metric in metrics:
+        rows = [
+            {'vm': m.vm, 'timestamp': m.timestamp, 'metric': m.metric, 'value': m.value}
+            for m in metrics
+        ]
+        result = self.upsert_metrics_fact_batch(rows)
+        return result['inserted'] + result['updated']
+
+    def upsert_metrics_fact_batch(self, rows: List[Dict], chunk_size: int = BATCH_CHUNK_SIZE) -> Dict[str, int]:
+        """
+        Множественный upsert фактических метрик в одной транзакции.
+
+        На PostgreSQL строки пишутся пачками через INSERT ... ON CONFLICT (vm, timestamp, metric)
+        DO UPDATE по uq_vm_timestamp_metric, на остальных СУБД (SQLite в тестах) - через
+        один SELECT существующих ключей и bulk insert/update на пачку.
+        Если пачка падает целиком, она переигрывается построчно в savepoint, чтобы
+        отделить некорректные строки от корректных.
+
+        Args:
+            rows: Список словарей с ключами vm, timestamp, metric, value
+            chunk_size: Количество строк в одном запросе
+
+        Returns:
+            Словарь: inserted, updated, rejected, total
+        """
+        stats = {'inserted': 0, 'updated': 0, 'rejected': 0, 'total': len(rows)}
+
+        # Отбрасываем некорректные строки и дубли внутри пачки (побеждает последняя),
+        # иначе ON CONFLICT DO UPDATE не сможет обновить одну строку дважды
+        unique_rows: Dict[Tuple, float] = {}
+        for row in rows:
+            key = fact_row_key(row)
+            if key is None:
+                stats['rejected'] += 1
+                continue
+            if key in unique_rows:
+                stats['updated'] += 1
+            unique_rows[key] = float(row['value'])
+
+        items = list(unique_rows.items())
+        is_postgres = self._is_postgres()
+
+        try:
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start:start + chunk_size]
+                try:
+                    with self.db.begin_nested():
+                        if is_postgres:
+                            inserted, updated = self._upsert_fact_chunk_postgres(chunk)
+                        else:
+                            inserted, updated = self._upsert_fact_chunk_portable(chunk)
+                except SQLAlchemyError as e:
+                    logger.warning(f"Batch chunk of {len(chunk)} facts failed, retrying row by row: {e}")
+                    inserted, updated, rejected = self._upsert_fact_rows_isolated(chunk, is_postgres)
+                    stats['rejected'] += rejected
+                stats['inserted'] += inserted
+                stats['updated'] += updated
+
+            # Агрегаты затронутых часов и суток пересчитываются в той же транзакции
+            RollupCRUD(self.db).refresh_keys(rollup_keys(unique_rows))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return stats
+
+    def _upsert_fact_chunk_postgres(self, chunk: List[Tuple[Tuple, float]]) -> Tuple[int, int]:
+        """Один INSERT ... ON CONFLICT DO UPDATE на всю пачку"""
+        vms, timestamps, metrics = zip(*[key for key, _ in chunk])
+        values = [value for _, value in chunk]
+        result = self.db.execute(UPSERT_FACTS_SQL, {
+            'vms': list(vms),
+            'timestamps': list(timestamps),
+            'metrics': list(metrics),
+            'vals': values
+        }).one()
+        return result.inserted, result.total - result.inserted
+
+    def _upsert_fact_chunk_portable(self, chunk: List[Tuple[Tuple, float]]) -> Tuple[int, int]:
+        """Переносимый путь: один SELECT существующих ключей, затем bulk insert и bulk update"""
+        model = db_models.ServerMetricsFact
+        key_columns = tuple_(model.vm, model.timestamp, model.metric)
+
+        # Первичный ключ - (id, timestamp), bulk update адресует строку по обоим полям
+        existing = {
+            (row.vm, row.timestamp, row.metric): (row.id, row.timestamp)
+            for row in self.db.execute(
+                select(model.id, model.vm, model.timestamp, model.metric).where(
+                    key_columns.in_([key for key, _ in chunk])
+                )
+            )
+        }
+
+        inserts = []
+        updates = []
+        for (vm, timestamp, metric), value in chunk:
+            existing_key = existing.get((vm, timestamp, metric))
+            if existing_key is not None:
+                updates.append({'id': existing_key[0], 'timestamp': existing_key[1], 'value': value})
+            else:
+                inserts.append({'vm': vm, 'timestamp': timestamp, 'metric': metric, 'value': value})
+
+        if inserts:
+            self.db.execute(insert(model), inserts)
+        if updates:
+            self.db.execute(update(model), updates)
+        return len(inserts), len(updates)
+
+    def _upsert_fact_rows_isolated(self, chunk: List[Tuple[Tuple, float]], is_postgres: bool) -> Tuple[int, int, int]:
+        """Построчная запись пачки, каждая строка в своём savepoint"""
+        inserted = updated = rejected = 0
+        for item in chunk:
             try:
-                self.create_metric_fact(metric)
-                created_count += 1
-            except Exception as e:
-                logger.error(f"Error creating metric {metric.vm}/{metric.metric} at {metric.timestamp}: {e}")
-        return created_count
+                with self.db.begin_nested():
+                    if is_postgres:
+                        row_inserted, row_updated = self._upsert_fact_chunk_postgres([item])
+                    else:
+                        row_inserted, row_updated = self._upsert_fact_chunk_portable([item])
+                inserted += row_inserted
+                updated += row_updated
+            except SQLAlchemyError as e:
+                (vm, timestamp, metric), _ = item
+                logger.error(f"Error creating metric {vm}/{metric} at {timestamp}: {e}")
+                rejected += 1
+        return inserted, updated, rejected
+
+    # ============================== ПОТОКОВАЯ ЗАГРУЗКА (COPY) ==================================
+
+    def begin_facts_staging(self) -> None:
+        """
+        Начало потоковой загрузки фактических метрик.
+
+        На PostgreSQL создаёт временную staging-таблицу в текущей транзакции; строки
+        загружаются в неё через COPY (copy_facts_to_staging) и переносятся в
+        server_metrics_fact одним upsert (merge_facts_staging).
+        На остальных СУБД пачки сразу пишутся через upsert_metrics_fact_batch.
+        """
+        self._staging_stats = {'staged': 0, 'inserted': 0, 'updated': 0, 'rejected': 0}
+        if self._is_postgres():
+            self.db.execute(CREATE_FACTS_STAGING_SQL)
+
+    def copy_facts_to_staging(self, rows: List[Tuple[str, datetime, str, float]]) -> int:
+        """
+        Загрузка пачки строк в staging-таблицу через COPY
+
+        Args:
+            rows: Кортежи (vm, timestamp, metric, value), уже прошедшие проверку
+
+        Returns:
+            Количество загруженных строк
+        """
+        if self._staging_stats is None:
+            raise RuntimeError("begin_facts_staging() must be called before copy_facts_to_staging()")
+        if not rows:
+            return 0
+
+        if not self._is_postgres():
+            result = self.upsert_metrics_fact_batch([
+                {'vm': vm, 'timestamp': timestamp, 'metric': metric, 'value': value}
+                for vm, timestamp, metric, value in rows
+            ])
+            for key in ('inserted', 'updated', 'rejected'):
+                self._staging_stats[key] += result[key]
+            self._staging_stats['staged'] += len(rows)
+            return len(rows)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for vm, timestamp, metric, value in rows:
+            writer.writerow((vm, timestamp.isoformat(), metric, repr(value)))
+        buffer.seek(0)
+
+        # COPY идёт через то же DBAPI-соединение, что и транзакция сессии
+        dbapi_connection = self.db.connection().connection.dbapi_connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(COPY_FACTS_STAGING_SQL, buffer)
+
+        self._staging_stats['staged'] += len(rows)
+        return len(rows)
+
+    def merge_facts_staging(self) -> Dict[str, int]:
+        """
+        Перенос staging-таблицы в server_metrics_fact одним INSERT ... ON CONFLICT и commit
+
+        Returns:
+            Словарь: staged, inserted, updated, rejected
+        """
+        if self._staging_stats is None:
+            raise RuntimeError("begin_facts_staging() must be called before merge_facts_staging()")
 
+        stats = self._staging_stats
+        self._staging_stats = None
+        try:
+            if self._is_postgres():
+                result = self.db.execute(MERGE_FACTS_STAGING_SQL).one()
+                stats['inserted'] = result.inserted
+                # Дубли ключа внутри потока схлопываются в одну строку, считаем их обновлениями
+                stats['updated'] = stats['staged'] - result.inserted
+                RollupCRUD(self.db).refresh_keys({
+                    (row.vm, row.metric): (row.first, row.last)
+                    for row in self.db.execute(STAGING_ROLLUP_KEYS_SQL)
+                })
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return stats
+
+    def _is_postgres(self) -> bool:
+        return self.db.get_bind().dialect.name == 'postgresql'
+
+    @replica_read
     def get_metrics_fact(
         self,
         vm: str,
         metric: str,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        limit: int = 5000
+        limit: int = 5000,
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
     ) -> List[db_models.ServerMetricsFact]:
         """
         Получение исторических метрик с фильтрацией по времени
@@ -82,21 +393,270 @@ class FactsCRUD:
             start_date: Начальная дата (включительно)
             end_date: Конечная дата (включительно)
             limit: Максимальное количество записей
+            after: Ключ (timestamp, id) последней записи предыдущей страницы
 
         Returns:
-            Список записей, отсортированных по времени (ASC)
+            Список записей, отсортированных по (timestamp, id) (ASC)
         """
-        query = self.db.query(db_models.ServerMetricsFact).filter(
-            db_models.ServerMetricsFact.vm == vm,
-            db_models.ServerMetricsFact.metric == metric
-        )
+        fact = db_models.ServerMetricsFact
+        query = self.db.query(fact).filter(*self._series_filters(vm, metric, start_date, end_date, after))
+        return query.order_by(fact.timestamp, fact.id).limit(limit).all()
+
+    def metrics_fact_select(
+        self,
+        vm: str,
+        metric: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Select:
+        """
+        Запрос колонок ряда для потоковой выгрузки (AsyncSession.stream с yield_per)
 
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата (включительно)
+            end_date: Конечная дата (включительно)
+
+        Returns:
+            SELECT id, vm, timestamp, metric, value, created_at в порядке (timestamp, id)
+        """
+        fact = db_models.ServerMetricsFact
+        return select(
+            fact.id, fact.vm, fact.timestamp, fact.metric, fact.value, fact.created_at
+        ).where(
+            *self._series_filters(vm, metric, start_date, end_date)
+        ).order_by(fact.timestamp, fact.id)
+
+    @staticmethod
+    def _series_filters(
+        vm: str,
+        metric: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List:
+        fact = db_models.ServerMetricsFact
+        filters = [fact.vm == vm, fact.metric == metric]
         if start_date:
-            query = query.filter(db_models.ServerMetricsFact.timestamp >= start_date)
+            filters.append(fact.timestamp >= start_date)
         if end_date:
-            query = query.filter(db_models.ServerMetricsFact.timestamp <= end_date)
+            filters.append(fact.timestamp <= end_date)
+        if after:
+            filters.append(tuple_(fact.timestamp, fact.id) > tuple(after))
+        return filters
 
-        return query.order_by(db_models.ServerMetricsFact.timestamp).limit(limit).all()
+    def get_metrics_fact_downsampled(
+        self,
+        vm: str,
+        metric: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        points: int = 1000,
+        method: str = downsampling.METHOD_LTTB
+    ) -> Dict[str, List]:
+        """
+        Получение ряда, прореженного до заданного количества точек
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата (по умолчанию - начало ряда)
+            end_date: Конечная дата (по умолчанию - конец ряда)
+            points: Максимальное количество точек в результате
+            method: 'lttb' - точки ряда по алгоритму LTTB,
+                    'minmax' - корзины равной длительности со средним, минимумом и максимумом
+
+        Returns:
+            Словарь с параллельными списками 'timestamp' и 'value' (для minmax также 'min' и 'max')
+        """
+        if method not in downsampling.METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+
+        fact = db_models.ServerMetricsFact
+        series_filter = and_(fact.vm == vm, fact.metric == metric, fact.value.isnot(None))
+
+        if start_date is None or end_date is None:
+            first, last = self.db.connection().execute(
+                select(func.min(fact.timestamp), func.max(fact.timestamp)).where(series_filter)
+            ).one()
+            start_date = start_date or first
+            end_date = end_date or last
+        if start_date is not None and end_date is not None and (start_date.tzinfo is None) != (end_date.tzinfo is None):
+            # Граница из запроса без часового пояса и граница из БД с поясом: обе приводятся к наивному UTC
+            start_date, end_date = (
+                value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+                for value in (start_date, end_date)
+            )
+        if start_date is None or end_date is None or start_date > end_date:
+            empty = np.array([], dtype=np.float64)
+            columns = {'value': empty, 'min': empty, 'max': empty} if method == downsampling.METHOD_MINMAX \
+                else {'value': empty}
+            return self._downsampled_columns(empty, columns)
+
+        # Длительность корзины в целых секундах с запасом, чтобы end_date не образовал лишнюю корзину
+        span_seconds = int((end_date - start_date).total_seconds())
+        width = timedelta(seconds=span_seconds // max(points, 1) + 1)
+        range_filter = and_(series_filter, fact.timestamp >= start_date, fact.timestamp <= end_date)
+
+        if method == downsampling.METHOD_MINMAX:
+            # Корзина от часа и крупнее собирается из часовых/суточных агрегатов без чтения сырых строк
+            series = RollupCRUD(self.db).get_series(vm, metric, start_date, end_date, width)
+            if series is not None:
+                buckets = downsampling.merge_buckets(series, to_utc(start_date).timestamp(), width.total_seconds())
+                return self._downsampled_columns(
+                    buckets['timestamp'], {'value': buckets['value'], 'min': buckets['min'], 'max': buckets['max']}
+                )
+
+        if method == downsampling.METHOD_MINMAX and self._is_postgres():
+            bucket = func.date_bin(literal(width, Interval), fact.timestamp, literal(start_date, DateTime))
+            binned = select(bucket.label('bucket'), fact.value).where(range_filter).subquery()
+            rows = self.db.connection().execute(
+                select(
+                    cast(func.extract('epoch', binned.c.bucket), Float),
+                    cast(func.avg(binned.c.value), Float),
+                    cast(func.min(binned.c.value), Float),
+                    cast(func.max(binned.c.value), Float)
+                ).group_by(binned.c.bucket).order_by(binned.c.bucket)
+            ).all()
+            x, avg, low, high = (np.array(col, dtype=np.float64) for col in zip(*rows)) if rows \
+                else (np.array([]),) * 4
+            return self._downsampled_columns(x, {'value': avg, 'min': low, 'max': high})
+
+        x, y = self._series_arrays(range_filter)
+        if method == downsampling.METHOD_MINMAX:
+            origin = start_date if start_date.tzinfo else start_date.replace(tzinfo=timezone.utc)
+            buckets = downsampling.minmax_buckets(x, y, origin.timestamp(), width.total_seconds())
+            return self._downsampled_columns(
+                buckets['timestamp'], {'value': buckets['value'], 'min': buckets['min'], 'max': buckets['max']}
+            )
+
+        indices = downsampling.lttb_indices(x, y, points)
+        return self._downsampled_columns(x[indices], {'value': y[indices]})
+
+    def _series_arrays(self, where_clause) -> Tuple[np.ndarray, np.ndarray]:
+        """Ряд в виде массивов (epoch в секундах, значение), отсортированных по времени"""
+        fact = db_models.ServerMetricsFact
+        if self._is_postgres():
+            stmt = select(cast(func.extract('epoch', fact.timestamp), Float), cast(fact.value, Float))
+        else:
+            stmt = select(fact.timestamp, cast(fact.value, Float))
+        rows = self.db.connection().execute(stmt.where(where_clause).order_by(fact.timestamp)).all()
+        if not rows:
+            return np.array([]), np.array([])
+
+        timestamps, values = zip(*rows)
+        if self._is_postgres():
+            x = np.array(timestamps, dtype=np.float64)
+        else:
+            # Секунды от эпохи без расчёта на единицу хранения меток (нс в pandas 2, мкс в pandas 3)
+            epoch = pd.Timestamp(0, tz='UTC')
+            x = (pd.to_datetime(pd.Series(timestamps), utc=True) - epoch).dt.total_seconds().to_numpy()
+        return x, np.array(values, dtype=np.float64)
+
+    @staticmethod
+    def _downsampled_columns(x: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, List]:
+        microseconds = np.round(x * 1e6).astype(np.int64)
+        result = {'timestamp': pd.to_datetime(microseconds, unit='us', utc=True).to_pydatetime().tolist()}
+        for name, values in columns.items():
+            result[name] = values.tolist()
+        return result
+
+    def get_metrics_frame(
+        self,
+        vms: List[str],
+        metrics: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Получение метрик нескольких ВМ одним запросом в широком формате
+
+        Строки читаются как кортежи колонок, без ORM-объектов; на PostgreSQL фильтр
+        передаётся массивами (vm = ANY(:vms)), поэтому план не зависит от количества ВМ.
+
+        Args:
+            vms: Имена виртуальных машин
+            metrics: Типы метрик (None - все метрики)
+            start_date: Начальная дата (включительно)
+            end_date: Конечная дата (включительно)
+
+        Returns:
+            DataFrame с колонками vm, timestamp и по одной колонке на метрику,
+            отсортированный по (vm, timestamp)
+        """
+        fact = db_models.ServerMetricsFact
+        if not vms or metrics == []:
+            return pd.DataFrame(columns=['vm', 'timestamp'])
+
+        is_postgres = self._is_postgres()
+        # На PostgreSQL время читается как epoch: разбор timestamptz в datetime по одной строке дороже запроса
+        timestamp_col = cast(func.extract('epoch', fact.timestamp), Float) if is_postgres else fact.timestamp
+        stmt = select(fact.vm, timestamp_col, fact.metric, cast(fact.value, Float))
+        if is_postgres:
+            stmt = stmt.where(fact.vm == any_(bindparam('vms', list(vms), type_=ARRAY(String))))
+            if metrics is not None:
+                stmt = stmt.where(fact.metric == any_(bindparam('metrics', list(metrics), type_=ARRAY(String))))
+        else:
+            stmt = stmt.where(fact.vm.in_(vms))
+            if metrics is not None:
+                stmt = stmt.where(fact.metric.in_(metrics))
+        if start_date:
+            stmt = stmt.where(fact.timestamp >= start_date)
+        if end_date:
+            stmt = stmt.where(fact.timestamp <= end_date)
+
+        # Core-соединение сессии: строки без ORM-загрузчика
+        rows = self.db.connection().execute(stmt).all()
+        if not rows:
+            return pd.DataFrame(columns=['vm', 'timestamp'])
+
+        vm_col, timestamp_col, metric_col, value_col = zip(*rows)
+        if is_postgres:
+            timestamps = pd.to_datetime(pd.Series(timestamp_col, dtype='float64'), unit='s', utc=True)
+        else:
+            timestamps = pd.to_datetime(pd.Series(timestamp_col))
+        long_frame = pd.DataFrame({
+            'vm': vm_col,
+            'timestamp': timestamps,
+            'metric': metric_col,
+            'value': pd.Series(value_col, dtype='float64')
+        })
+
+        # uq_vm_timestamp_metric гарантирует уникальность, агрегация как в pivot_table не нужна
+        frame = long_frame.pivot(index=['vm', 'timestamp'], columns='metric', values='value').reset_index()
+        frame.columns.name = None
+        return frame
+
+    def get_metrics_fact_columns(
+        self,
+        vm: str,
+        metric: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 5000
+    ) -> Dict[str, List]:
+        """
+        Получение исторических метрик в колоночном виде, без ORM-объектов
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата (включительно)
+            end_date: Конечная дата (включительно)
+            limit: Максимальное количество записей
+
+        Returns:
+            Словарь с параллельными списками 'timestamp' и 'value', отсортированными по времени (ASC)
+        """
+        fact = db_models.ServerMetricsFact
+        stmt = select(fact.timestamp, cast(fact.value, Float)).where(
+            *self._series_filters(vm, metric, start_date, end_date)
+        ).order_by(fact.timestamp, fact.id).limit(limit)
+
+        rows = self.db.connection().execute(stmt).all()
+        timestamps, values = zip(*rows) if rows else ((), ())
+        return {'timestamp': list(timestamps), 'value': list(values)}
 
     def get_latest_metrics(self, vm: str, metric: str, hours: int = 24) -> List[db_models.ServerMetricsFact]:
         """
@@ -150,48 +710,21 @@ class FactsCRUD:
         end_date: Optional[datetime] = None
     ) -> Dict:
         """
-        Получение агрегированной статистики по метрике
+        Получение агрегированной статистики по метрике из часовых и суточных агрегатов
+        (сырые строки читаются только для неполных часов на границах периода)
 
         Returns:
-            Словарь: count, min, max, avg, stddev, period
-        """
-        query = self.db.query(
-            func.count(db_models.ServerMetricsFact.id).label('count'),
-            func.min(db_models.ServerMetricsFact.value).label('min'),
-            func.max(db_models.ServerMetricsFact.value).label('max'),
-            func.avg(db_models.ServerMetricsFact.value).label('avg'),
-            func.stddev(db_models.ServerMetricsFact.value).label('stddev')
-        ).filter(
-            db_models.ServerMetricsFact.vm == vm,
-            db_models.ServerMetricsFact.metric == metric
-        )
-
-        if start_date:
-            query = query.filter(db_models.ServerMetricsFact.timestamp >= start_date)
-        if end_date:
-            query = query.filter(db_models.ServerMetricsFact.timestamp <= end_date)
-
-        result = query.first()
-
-        if not result or result.count == 0:
-            return {
-                'count': 0,
-                'min': 0.0,
-                'max': 0.0,
-                'avg': 0.0,
-                'stddev': 0.0,
-                'period': {
-                    'start': start_date.isoformat() if start_date else None,
-                    'end': end_date.isoformat() if end_date else None
-                }
-            }
+            Словарь: count, min, max, avg, stddev, p95, period
+        """
+        result = RollupCRUD(self.db).get_statistics(vm, metric, start_date, end_date, quantile=0.95)
 
         return {
-            'count': result.count,
-            'min': float(result.min) if result.min is not None else 0.0,
-            'max': float(result.max) if result.max is not None else 0.0,
-            'avg': float(result.avg) if result.avg is not None else 0.0,
-            'stddev': float(result.stddev) if result.stddev is not None else 0.0,
+            'count': result['count'],
+            'min': result['min'] if result['min'] is not None else 0.0,
+            'max': result['max'] if result['max'] is not None else 0.0,
+            'avg': result['avg'] if result['avg'] is not None else 0.0,
+            'stddev': result['stddev'] if result['stddev'] is not None else 0.0,
+            'p95': result['quantile'] if result['quantile'] is not None else 0.0,
             'period': {
                 'start': start_date.isoformat() if start_date else None,
                 'end': end_date.isoformat() if end_date else None
@@ -5,8 +5,11 @@ from datetime import datetime, timedelta
 import asyncio
 from typing import List, Optional
 
-from connection import get_db, engine
+from connection import get_db, engine, replicas, DB_REPLICA_HEALTH_INTERVAL
+from async_connection import async_engine, async_replicas
 import models as db_models
+import partitions
+import retention
 # from . import schemas as pydantic_models
 # from .crud import DBCRUD
 # from prophet_service import ProphetForecaster
@@ -40,6 +43,69 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api/v1")
 
 
+async def partition_maintenance_loop():
+    """Секции на ближайшие месяцы при старте и далее раз в сутки"""
+    while True:
+        try:
+            created = await asyncio.to_thread(partitions.run_partition_maintenance, engine)
+            if any(created.values()):
+                logger.info(f"Partition maintenance created: {created}")
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(partitions.MAINTENANCE_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_partition_maintenance():
+    app.state.partition_maintenance = asyncio.create_task(partition_maintenance_loop())
+
+
+async def replica_health_loop():
+    """Проверка реплик чтения: недоступные исключаются из ротации до следующей успешной проверки"""
+    while True:
+        await asyncio.to_thread(replicas.check)
+        await async_replicas.check()
+        await asyncio.sleep(DB_REPLICA_HEALTH_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_replica_health_checks():
+    if replicas:
+        app.state.replica_health = asyncio.create_task(replica_health_loop())
+
+
+def run_scheduled_retention():
+    """Задание хранения со сроками RETENTION_DEFAULT_DAYS / RETENTION_POLICIES"""
+    try:
+        job = retention.submit_job(
+            retention.RetentionJob(retention.RETENTION_DEFAULT_DAYS, retention.RETENTION_POLICIES)
+        )
+    except RuntimeError as e:
+        logger.warning(f"Scheduled retention skipped: {e}")
+        return
+    retention.run_job_in_new_session(job)
+
+
+async def retention_loop():
+    """Хранение данных раз в RETENTION_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(retention.RETENTION_INTERVAL_SECONDS)
+        await asyncio.to_thread(run_scheduled_retention)
+
+
+@app.on_event("startup")
+async def start_retention():
+    if retention.RETENTION_INTERVAL_SECONDS > 0:
+        app.state.retention = asyncio.create_task(retention_loop())
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
+    for replica in async_replicas.async_engines:
+        await replica.dispose()
+
+
 # @app.on_event("startup")
 # async def startup_event():
 #     """Запуск фоновых задач при старте"""
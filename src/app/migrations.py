@@ -0,0 +1,129 @@
+"""
+Версионированные изменения схемы PostgreSQL, которые не выполняет Base.metadata.create_all
+(перестройка уже существующих таблиц и индексов).
+
+Применённые миграции записываются в таблицу schema_migrations; upgrade выполняет
+недостающие по порядку, каждую в отдельной транзакции. Миграции идемпотентны: на базе,
+созданной по текущим моделям, они ничего не меняют и только отмечаются как применённые.
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from base_logger import logger
+from connection import engine
+import models as db_models
+import partitions
+
+CREATE_MIGRATIONS_TABLE_SQL = text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(64) PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+""")
+
+# Одиночные индексы прежней схемы: их покрывают первичный ключ (id, timestamp)
+# и индексы (vm, metric, timestamp), а поддерживать их приходится на каждой вставке
+LEGACY_INDEXES = (
+    'ix_server_metrics_fact_id',
+    'ix_server_metrics_fact_vm',
+    'ix_server_metrics_fact_timestamp',
+    'ix_server_metrics_fact_value',
+    'idx_vm_timestamp_metric',
+    'ix_server_metrics_predictions_id',
+    'ix_server_metrics_predictions_vm',
+    'ix_server_metrics_predictions_timestamp',
+    'idx_vm_timestamp_metric_pred',
+)
+
+
+def _partition_by_month(conn: Connection) -> None:
+    for table in (db_models.ServerMetricsFact.__table__, db_models.ServerMetricsPredictions.__table__):
+        partitions.convert_to_partitioned(conn, table)
+
+
+def _covering_indexes(conn: Connection) -> None:
+    for name in LEGACY_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    # Индексы создаются на родительской таблице и наследуются всеми секциями
+    for table in (db_models.ServerMetricsFact.__table__, db_models.ServerMetricsPredictions.__table__):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _series_catalog(conn: Connection) -> None:
+    # Таблица создана create_all; заполняется рядами уже загруженных фактов
+    conn.execute(text("""
+        INSERT INTO server_metrics_series (vm, metric)
+        SELECT DISTINCT vm, metric FROM server_metrics_fact
+        ON CONFLICT DO NOTHING
+    """))
+
+
+def _series_ranges(conn: Connection) -> None:
+    # rollup_crud обращается к моделям при импорте, а migrations импортируется из models.py
+    import rollup_crud
+
+    conn.execute(text("""
+        ALTER TABLE server_metrics_series
+            ADD COLUMN IF NOT EXISTS first_ts TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS last_ts TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS point_count BIGINT NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    """))
+    series = conn.execute(text("SELECT vm, metric FROM server_metrics_series")).all()
+    if series:
+        conn.execute(rollup_crud.REFRESH_SERIES_SQL, {
+            'vms': [vm for vm, _ in series],
+            'metrics': [metric for _, metric in series],
+        })
+
+
+MIGRATIONS: List[Tuple[str, str, Callable[[Connection], None]]] = [
+    ('001_partition_by_month', 'Помесячное секционирование фактов и прогнозов', _partition_by_month),
+    ('002_covering_indexes', 'Индексы (vm, metric, timestamp) INCLUDE и BRIN по timestamp', _covering_indexes),
+    ('003_series_catalog', 'Справочник рядов server_metrics_series', _series_catalog),
+    ('004_series_ranges', 'Диапазон меток и количество точек в справочнике рядов', _series_ranges),
+]
+
+
+def applied_migrations(conn: Connection) -> List[str]:
+    """Версии применённых миграций"""
+    conn.execute(CREATE_MIGRATIONS_TABLE_SQL)
+    return conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+
+
+def upgrade(engine: Engine) -> List[str]:
+    """
+    Применение недостающих миграций
+
+    Args:
+        engine: Engine базы данных (для других СУБД, кроме PostgreSQL, ничего не делает)
+
+    Returns:
+        Версии миграций, применённых при этом вызове
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+
+    with engine.begin() as conn:
+        applied = set(applied_migrations(conn))
+
+    upgraded = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {'version': version, 'description': description}
+            )
+        logger.info(f"Applied migration {version}: {description}")
+        upgraded.append(version)
+    return upgraded
+
+
+if __name__ == "__main__":
+    print(upgrade(engine))
@@ -0,0 +1,292 @@
+"""
+Реестр моделей Prophet (таблица prophet_model_registry).
+
+Раньше модель ряда искалась просмотром каталога моделей (os.listdir и сравнение префикса
+имени файла "<vm>_<metric>_prophet" на каждый прогноз), а очистка проверяла mtime каждого
+файла. Теперь версии модели ряда хранятся в таблице с первичным ключом (vm, metric, version):
+последняя или закреплённая версия находится одним запросом по индексу, очистка выбирает
+версии по политике одним запросом.
+
+Файлы моделей лежат в подкаталогах <vm>/<metric>/ с экранированными именами, поэтому ряды,
+имена которых различаются только положением '_' ("a" / "b_c" и "a_b" / "c"), не пересекаются.
+
+Политика хранения: у каждого ряда остаются MODEL_RETENTION_VERSIONS последних версий
+и закреплённая версия; остальные версии старше MODEL_RETENTION_DAYS дней удаляются
+вместе с файлами.
+"""
+import json
+import os
+import pickle
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+import models as db_models
+from base_logger import logger
+
+# Сколько последних версий ряда не удаляется независимо от возраста
+MODEL_RETENTION_VERSIONS = int(os.getenv('MODEL_RETENTION_VERSIONS', '3'))
+
+# Возраст, после которого остальные версии удаляются
+MODEL_RETENTION_DAYS = int(os.getenv('MODEL_RETENTION_DAYS', '30'))
+
+_LEGACY_MODEL_FILE = re.compile(r'_prophet_\d{8}_\d{6}\.pkl$')
+
+
+def model_file_path(model_storage_path: str, vm: str, metric: str, version: int) -> str:
+    """Путь к файлу версии модели: <каталог>/<vm>/<metric>/prophet_v<version>.pkl"""
+    return os.path.join(model_storage_path, quote(vm, safe=''), quote(metric, safe=''), f"prophet_v{version}.pkl")
+
+
+def _to_json(value: Any) -> Any:
+    # numpy-числа - в числа Python, метки времени и прочее - в строки
+    if value is None:
+        return None
+    return json.loads(json.dumps(value, default=lambda v: v.item() if hasattr(v, 'item') else str(v)))
+
+
+def _remove_model_files(path: str) -> None:
+    for file_path in (path, path.replace('.pkl', '_metrics.json')):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+class ModelRegistryCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _is_postgres(self) -> bool:
+        return self.db.get_bind().dialect.name == 'postgresql'
+
+    def next_version(self, vm: str, metric: str) -> int:
+        """Номер следующей версии модели ряда"""
+        entry = db_models.ProphetModelRegistry
+        current = self.db.query(func.max(entry.version)).filter(entry.vm == vm, entry.metric == metric).scalar()
+        return (current or 0) + 1
+
+    def register(
+            self,
+            vm: str,
+            metric: str,
+            version: int,
+            path: str,
+            trained_at: datetime,
+            metrics: Optional[Dict] = None,
+            data_points: int = 0,
+            params: Optional[Dict] = None
+    ) -> db_models.ProphetModelRegistry:
+        """
+        Регистрация сохранённой модели
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            version: Версия (next_version)
+            path: Путь к файлу модели
+            trained_at: Время обучения
+            metrics: Метрики качества
+            data_points: Количество точек обучающих данных
+            params: Параметры модели и подобранные гиперпараметры
+
+        Returns:
+            Запись реестра
+        """
+        entry = db_models.ProphetModelRegistry(
+            vm=vm,
+            metric=metric,
+            version=version,
+            path=path,
+            trained_at=trained_at,
+            metrics=_to_json(metrics),
+            data_points=data_points,
+            params=_to_json(params),
+            pinned=False
+        )
+        try:
+            self.db.add(entry)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return entry
+
+    def get_model(self, vm: str, metric: str, version: Optional[int] = None) -> Optional[db_models.ProphetModelRegistry]:
+        """
+        Версия модели ряда
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            version: Версия (None - закреплённая, а если её нет - последняя)
+
+        Returns:
+            Запись реестра или None
+        """
+        entry = db_models.ProphetModelRegistry
+        query = self.db.query(entry).filter(entry.vm == vm, entry.metric == metric)
+        if version is not None:
+            return query.filter(entry.version == version).first()
+        return query.order_by(entry.pinned.desc(), entry.version.desc()).first()
+
+    def list_versions(self, vm: str, metric: str) -> List[db_models.ProphetModelRegistry]:
+        """Версии модели ряда от новых к старым"""
+        entry = db_models.ProphetModelRegistry
+        return self.db.query(entry).filter(
+            entry.vm == vm, entry.metric == metric
+        ).order_by(entry.version.desc()).all()
+
+    def get_latest_trained_at(self, series: Optional[List[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], datetime]:
+        """
+        Время обучения последней версии моделей рядов одним сгруппированным запросом
+
+        Args:
+            series: Ряды (vm, metric) (None - все ряды реестра)
+
+        Returns:
+            Словарь (vm, metric) -> trained_at (UTC)
+        """
+        entry = db_models.ProphetModelRegistry
+        query = self.db.query(entry.vm, entry.metric, func.max(entry.trained_at))
+        if series is not None:
+            series = list(dict.fromkeys(series))
+            if not series:
+                return {}
+            query = query.filter(tuple_(entry.vm, entry.metric).in_(series))
+        return {
+            # На SQLite метки читаются без пояса
+            (vm, metric): trained_at if trained_at.tzinfo else trained_at.replace(tzinfo=timezone.utc)
+            for vm, metric, trained_at in query.group_by(entry.vm, entry.metric)
+        }
+
+    def pin(self, vm: str, metric: str, version: int) -> bool:
+        """
+        Закрепление версии: get_model без версии возвращает её вместо последней
+
+        Returns:
+            False, если версии нет
+        """
+        entry = db_models.ProphetModelRegistry
+        if self.get_model(vm, metric, version) is None:
+            return False
+        try:
+            self.db.execute(update(entry).where(entry.vm == vm, entry.metric == metric).values(
+                pinned=entry.version == version
+            ))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return True
+
+    def unpin(self, vm: str, metric: str) -> None:
+        """Снятие закрепления: используется последняя версия"""
+        entry = db_models.ProphetModelRegistry
+        try:
+            self.db.execute(update(entry).where(
+                entry.vm == vm, entry.metric == metric, entry.pinned.is_(True)
+            ).values(pinned=False))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def apply_retention(
+            self,
+            keep_versions: int = MODEL_RETENTION_VERSIONS,
+            days_to_keep: int = MODEL_RETENTION_DAYS,
+            now: Optional[datetime] = None
+    ) -> Dict[str, int]:
+        """
+        Удаление версий по политике хранения вместе с файлами
+
+        Args:
+            keep_versions: Сколько последних версий ряда оставить независимо от возраста
+            days_to_keep: Остальные версии старше этого срока удаляются
+            now: Текущее время (для тестов)
+
+        Returns:
+            Словарь: deleted, kept
+        """
+        entry = db_models.ProphetModelRegistry
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days_to_keep)
+        # На SQLite метки хранятся без пояса
+        bound = cutoff if self._is_postgres() else cutoff.replace(tzinfo=None)
+
+        rank = func.row_number().over(
+            partition_by=(entry.vm, entry.metric), order_by=entry.version.desc()
+        ).label('rank')
+        ranked = select(entry.vm, entry.metric, entry.version, entry.path, entry.trained_at, entry.pinned, rank).subquery()
+        expired = self.db.execute(
+            select(ranked.c.vm, ranked.c.metric, ranked.c.version, ranked.c.path).where(
+                ranked.c.rank > keep_versions,
+                ranked.c.pinned.is_(False),
+                ranked.c.trained_at < bound
+            )
+        ).all()
+
+        try:
+            if expired:
+                self.db.execute(delete(entry).where(
+                    tuple_(entry.vm, entry.metric, entry.version).in_(
+                        [(vm, metric, version) for vm, metric, version, _ in expired]
+                    )
+                ))
+            kept = self.db.query(func.count()).select_from(entry).scalar()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # Файлы удаляются после фиксации: запись реестра не может ссылаться на удалённый файл
+        for _, _, _, path in expired:
+            _remove_model_files(path)
+
+        logger.info(f"Model retention: {len(expired)} versions deleted, {kept} kept")
+        return {'deleted': len(expired), 'kept': kept}
+
+    def register_legacy_models(self, model_storage_path: str) -> int:
+        """
+        Однократный перенос моделей прежнего формата (<vm>_<metric>_prophet_<время>.pkl) в реестр
+
+        vm и metric берутся из метаданных внутри файла, а не из имени. Файлы остаются на месте.
+
+        Returns:
+            Количество зарегистрированных моделей
+        """
+        registered = set(self.db.execute(select(db_models.ProphetModelRegistry.path)).scalars())
+        legacy = []
+        for filename in os.listdir(model_storage_path):
+            path = os.path.join(model_storage_path, filename)
+            if not _LEGACY_MODEL_FILE.search(filename) or path in registered:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                legacy.append((data['trained_at'], path, data))
+            except Exception as e:
+                logger.warning(f"Skipping model file {path}: {e}")
+
+        # Версии по порядку обучения
+        for trained_at, path, data in sorted(legacy, key=lambda item: (item[0].timestamp(), item[1])):
+            if trained_at.tzinfo is None:
+                trained_at = trained_at.astimezone(timezone.utc)
+            self.register(
+                data['vm'], data['metric'], self.next_version(data['vm'], data['metric']), path, trained_at,
+                metrics=data.get('metrics'), data_points=data.get('data_points', 0),
+                params={'config': data.get('config'), 'optimized_params': data.get('optimized_params')}
+            )
+        return len(legacy)
+
+
+if __name__ == "__main__":
+    import sys
+    from connection import SessionLocal
+
+    with SessionLocal() as session:
+        print(ModelRegistryCRUD(session).register_legacy_models(sys.argv[1] if len(sys.argv) > 1 else './models_storage'))
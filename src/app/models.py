@@ -1,13 +1,17 @@
 """
 Модели для хранения метрик серверов и прогнозов.
-Соответствующие таблицам server_metrics_fact и server_metrics_predictions в PostgreSQL.
+Соответствующие таблицам server_metrics_fact, server_metrics_fact_1h, server_metrics_fact_1d,
+server_metrics_predictions и prophet_model_registry в PostgreSQL.
 """
 
 from connection import Base, engine
-from sqlalchemy import Column, DateTime, DECIMAL, String, UniqueConstraint, Index, CheckConstraint, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (Column, DateTime, DECIMAL, String, UniqueConstraint, Index, CheckConstraint, text,
+                        BigInteger, Boolean, Float, Integer, JSON, event)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 import uuid
+import migrations
+import partitions
 
 
 class ServerMetricsFact(Base):
@@ -19,30 +23,35 @@ class ServerMetricsFact(Base):
 
     __table_args__ = (
         UniqueConstraint('vm', 'timestamp', 'metric', name='uq_vm_timestamp_metric'),
-        Index('idx_vm_timestamp_metric', 'vm', 'timestamp', 'metric'),
+        # Запросы ряда - vm = ? AND metric = ? ORDER BY timestamp; value в INCLUDE даёт index-only scan
+        Index('idx_vm_metric_timestamp', 'vm', 'metric', 'timestamp', postgresql_include=['value']),
+        # Сканы по времени без vm/metric (очистка default-секции, поиск строк вне секций)
+        Index('brin_fact_timestamp', 'timestamp', postgresql_using='brin'),
         CheckConstraint('timestamp <= CURRENT_TIMESTAMP', name='chk_timestamp_not_future'),
-        {'comment': 'Фактическая таблица метрик серверов. Хранит исторические данные метрик.'}
+        {
+            'comment': 'Фактическая таблица метрик серверов. Хранит исторические данные метрик.',
+            'postgresql_partition_by': 'RANGE (timestamp)'
+        }
     )
 
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
         default=uuid.uuid4,
-        index=True,
         comment='Уникальный идентификатор записи'
     )
 
     vm = Column(
         String(255),
         nullable=False,
-        index=True,
         comment='Идентификатор виртуального сервера'
     )
 
+    # Ключ секционирования входит в первичный ключ (требование PostgreSQL для секционированных таблиц)
     timestamp = Column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
-        index=True,
         comment='Временная метка измерения метрики (часовой пояс UTC)'
     )
 
@@ -55,7 +64,6 @@ class ServerMetricsFact(Base):
     value = Column(
         DECIMAL(20, 5),
         nullable=True,
-        index=True,
         comment='Фактическое значение метрики. Точность: 20 цифр, 5 знаков после запятой'
     )
 
@@ -86,6 +94,160 @@ class ServerMetricsFact(Base):
         }
 
 
+class MetricsRollupMixin:
+    """
+    Общие колонки агрегатов фактических метрик по интервалу времени.
+    Строка хранит аддитивные агрегаты, поэтому интервалы объединяются без обращения к сырым данным:
+    avg = sum / count, stddev - из sum и sumsq, перцентили - из скетча.
+    """
+    vm = Column(
+        String(255),
+        primary_key=True,
+        comment='Имя виртуальной машины'
+    )
+
+    metric = Column(
+        String(255),
+        primary_key=True,
+        comment='Тип метрики'
+    )
+
+    bucket = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        comment='Начало интервала агрегации'
+    )
+
+    count = Column(
+        BigInteger,
+        nullable=False,
+        comment='Количество значений в интервале'
+    )
+
+    min = Column(Float, nullable=False, comment='Минимальное значение')
+
+    max = Column(Float, nullable=False, comment='Максимальное значение')
+
+    sum = Column(Float, nullable=False, comment='Сумма значений')
+
+    sumsq = Column(Float, nullable=False, comment='Сумма квадратов значений')
+
+    sketch = Column(
+        JSON().with_variant(JSONB(), 'postgresql'),
+        nullable=False,
+        comment='Скетч распределения для перцентилей: номер логарифмической корзины -> количество (см. quantile_sketch.py)'
+    )
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment='Дата и время последнего пересчёта'
+    )
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__}(vm='{self.vm}', "
+            f"metric='{self.metric}', "
+            f"bucket='{self.bucket}', "
+            f"count={self.count})>"
+        )
+
+
+class ServerMetricsFactHourly(MetricsRollupMixin, Base):
+    """
+    Часовые агрегаты фактических метрик.
+    Соответствующая таблице server_metrics_fact_1h в PostgreSQL.
+    """
+    __tablename__ = "server_metrics_fact_1h"
+
+    __table_args__ = (
+        {'comment': 'Часовые агрегаты server_metrics_fact: count, min, max, sum, sumsq и скетч для p95.'},
+    )
+
+
+class ServerMetricsFactDaily(MetricsRollupMixin, Base):
+    """
+    Суточные агрегаты фактических метрик.
+    Соответствующая таблице server_metrics_fact_1d в PostgreSQL.
+    """
+    __tablename__ = "server_metrics_fact_1d"
+
+    __table_args__ = (
+        {'comment': 'Суточные агрегаты server_metrics_fact: count, min, max, sum, sumsq и скетч для p95.'},
+    )
+
+
+class ServerMetricsSeries(Base):
+    """
+    Справочник рядов (vm, metric) с диапазоном меток и количеством точек.
+    Соответствующая таблице server_metrics_series в PostgreSQL.
+    Обновляется вместе с агрегатами (RollupCRUD.refresh_keys) и при удалении
+    старых фактов (DBCRUD.cleanup_old_data); ряды без фактов удаляются.
+    """
+    __tablename__ = "server_metrics_series"
+
+    __table_args__ = (
+        {'comment': 'Справочник рядов фактических метрик: списки VM и метрик и диапазоны данных без сканирования фактов.'},
+    )
+
+    vm = Column(
+        String(255),
+        primary_key=True,
+        comment='Идентификатор виртуального сервера'
+    )
+
+    metric = Column(
+        String(255),
+        primary_key=True,
+        comment='Тип метрики'
+    )
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment='Дата и время первой записи ряда'
+    )
+
+    first_ts = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment='Первая временная метка ряда'
+    )
+
+    last_ts = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        comment='Последняя временная метка ряда'
+    )
+
+    point_count = Column(
+        BigInteger,
+        nullable=False,
+        server_default=text('0'),
+        comment='Количество точек ряда со значением (по суточным агрегатам начиная с суток first_ts)'
+    )
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        comment='Дата и время последнего обновления'
+    )
+
+    def __repr__(self):
+        return (
+            f"<ServerMetricsSeries(vm='{self.vm}', "
+            f"metric='{self.metric}', "
+            f"first_ts='{self.first_ts}', "
+            f"last_ts='{self.last_ts}', "
+            f"point_count={self.point_count})>"
+        )
+
+
 class ServerMetricsPredictions(Base):
     """
     Модель для хранения предсказанных метрик серверов.
@@ -95,30 +257,34 @@ class ServerMetricsPredictions(Base):
 
     __table_args__ = (
         UniqueConstraint('vm', 'timestamp', 'metric', name='uq_vm_timestamp_metric_pred'),
-        Index('idx_vm_timestamp_metric_pred', 'vm', 'timestamp', 'metric'),
+        Index('idx_vm_metric_timestamp_pred', 'vm', 'metric', 'timestamp',
+              postgresql_include=['value_predicted', 'lower_bound', 'upper_bound']),
+        Index('brin_pred_timestamp', 'timestamp', postgresql_using='brin'),
         # CheckConstraint('prediction_horizon > 0', name='chk_positive_horizon'),
-        {'comment': 'Таблица предсказаний метрик серверов. Хранит прогнозные значения.'}
+        {
+            'comment': 'Таблица предсказаний метрик серверов. Хранит прогнозные значения.',
+            'postgresql_partition_by': 'RANGE (timestamp)'
+        }
     )
 
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
         default=uuid.uuid4,
-        index=True,
         comment='Уникальный идентификатор предсказания'
     )
 
     vm = Column(
         String(255),
         nullable=False,
-        index=True,
         comment='Идентификатор виртуального сервера'
     )
 
+    # Ключ секционирования входит в первичный ключ (требование PostgreSQL для секционированных таблиц)
     timestamp = Column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
-        index=True,
         comment='Временная метка для которой сделано предсказание'
     )
 
@@ -192,6 +358,102 @@ class ServerMetricsPredictions(Base):
         }
 
 
+class ProphetModelRegistry(Base):
+    """
+    Реестр обученных моделей Prophet: версии модели ряда, путь к файлу и метаданные.
+    Соответствующая таблице prophet_model_registry в PostgreSQL.
+    Последняя (или закреплённая) версия ряда находится по первичному ключу без просмотра
+    каталога моделей (см. model_registry.py).
+    """
+    __tablename__ = "prophet_model_registry"
+
+    __table_args__ = (
+        {'comment': 'Реестр моделей Prophet: версии моделей рядов, файлы и метрики качества.'},
+    )
+
+    vm = Column(
+        String(255),
+        primary_key=True,
+        comment='Идентификатор виртуального сервера'
+    )
+
+    metric = Column(
+        String(255),
+        primary_key=True,
+        comment='Тип метрики'
+    )
+
+    version = Column(
+        Integer,
+        primary_key=True,
+        autoincrement=False,
+        comment='Версия модели ряда (1, 2, ...)'
+    )
+
+    path = Column(
+        String(1024),
+        nullable=False,
+        comment='Путь к файлу модели'
+    )
+
+    trained_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        comment='Дата и время обучения'
+    )
+
+    metrics = Column(
+        JSON().with_variant(JSONB(), 'postgresql'),
+        nullable=True,
+        comment='Метрики качества модели (mape, rmse, coverage, ...)'
+    )
+
+    data_points = Column(
+        Integer,
+        nullable=False,
+        server_default=text('0'),
+        comment='Количество точек обучающих данных'
+    )
+
+    params = Column(
+        JSON().with_variant(JSONB(), 'postgresql'),
+        nullable=True,
+        comment='Параметры модели и подобранные гиперпараметры'
+    )
+
+    pinned = Column(
+        Boolean,
+        nullable=False,
+        server_default=text('false'),
+        comment='Закреплённая версия: используется вместо последней и не удаляется политикой хранения'
+    )
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        comment='Дата и время регистрации'
+    )
+
+    def __repr__(self):
+        return (
+            f"<ProphetModelRegistry(vm='{self.vm}', "
+            f"metric='{self.metric}', "
+            f"version={self.version}, "
+            f"pinned={self.pinned})>"
+        )
+
+
+def _create_initial_partitions(target, connection, **kw):
+    """Default-секция и секции на ближайшие месяцы сразу после CREATE TABLE (только PostgreSQL)"""
+    if connection.dialect.name == 'postgresql':
+        partitions.create_initial_partitions(connection, target.name)
+
+
+for _partitioned_table in (ServerMetricsFact.__table__, ServerMetricsPredictions.__table__):
+    event.listen(_partitioned_table, 'after_create', _create_initial_partitions)
+
+
 def create_tables_with_optimizations():
     """
     Создать все таблицы с дополнительными оптимизациями
@@ -199,20 +461,16 @@ def create_tables_with_optimizations():
     # Создание базовых таблиц
     Base.metadata.create_all(engine)
 
-    # Дополнительные оптимизации
-    with engine.connect() as conn:
-        # Оптимизация для fact таблицы
-        conn.execute(
-            text("ALTER TABLE server_metrics_fact SET (fillfactor = 90);")
-        )
+    # Перестройка таблиц и индексов, созданных прежними версиями схемы
+    migrations.upgrade(engine)
 
-        # Оптимизация для predictions таблицы
-        conn.execute(
-            text("ALTER TABLE server_metrics_predictions SET (fillfactor = 90);")
-        )
+    with engine.begin() as conn:
+        # Секции на ближайшие месяцы (fillfactor = 90 задаётся для каждой секции при создании)
+        partitions.maintain_partitions(conn)
 
         # Анализ всех таблиц
-        for table in ['server_metrics_fact', 'server_metrics_predictions']:
+        for table in ['server_metrics_fact', 'server_metrics_fact_1h', 'server_metrics_fact_1d',
+                      'server_metrics_series', 'server_metrics_predictions']:
             conn.execute(text(f"ANALYZE {table};"))
 
 
@@ -0,0 +1,54 @@
+"""
+Постраничное чтение рядов и потоковая выгрузка.
+
+Страницы выбираются по ключу (timestamp, id): следующая страница начинается строго после
+последней строки предыдущей (WHERE (timestamp, id) > (:ts, :id)), поэтому цена страницы
+не зависит от её номера, в отличие от OFFSET. Курсор для клиента непрозрачен - это
+base64 от JSON с ключом последней строки.
+
+Потоковая выгрузка (NDJSON) читает строки серверным курсором частями по STREAM_YIELD_PER,
+так что память не зависит от размера выгрузки.
+"""
+import base64
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Tuple
+
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Размер части, которую серверный курсор отдаёт за один запрос к БД
+STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', '1000'))
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    """Курсор, указывающий на строку (timestamp, id)"""
+    payload = json.dumps({'ts': timestamp.isoformat(), 'id': str(row_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """
+    Ключ строки из курсора
+
+    Raises:
+        ValueError: Курсор повреждён
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['ts']), uuid.UUID(payload['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def ndjson_lines(rows: AsyncIterator[Any], to_schema: Callable[[Any], BaseModel]) -> AsyncIterator[str]:
+    """Строки NDJSON: по одному JSON-объекту на строку результата"""
+    async for row in rows:
+        yield to_schema(row).model_dump_json() + '\n'
@@ -0,0 +1,289 @@
+"""
+Помесячное секционирование server_metrics_fact и server_metrics_predictions (PostgreSQL).
+
+Таблицы объявлены как PARTITION BY RANGE (timestamp) (models.py). Секции:
+- <таблица>_pYYYYMM - [первое число месяца, первое число следующего месяца) по UTC;
+- <таблица>_default - строки вне созданных секций (например, загрузка старой истории).
+
+Секции создаются вместе с таблицей (текущий месяц и PREMAKE_MONTHS вперёд) и заданием
+maintain_partitions (при старте API и раз в сутки), которое также заводит секции для
+месяцев, чьи строки попали в default-секцию; для загрузки истории секции можно создать
+заранее (ensure_partitions). Строки месяца из default-секции переносятся в новую секцию
+до её подключения.
+
+Удаление старых данных - DETACH + DROP целых секций (drop_partitions_before)
+вместо построчного DELETE: без раздувания таблицы и долгих блокировок записи.
+"""
+import os
+import re
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection, Engine
+from base_logger import logger
+
+PARTITIONED_TABLES = ('server_metrics_fact', 'server_metrics_predictions')
+
+# Сколько месяцев вперёд держать созданные секции (прогнозы пишутся в будущее)
+PREMAKE_MONTHS = int(os.getenv('PARTITION_PREMAKE_MONTHS', '3'))
+
+PARTITION_FILLFACTOR = 90
+
+# DETACH/ATTACH берут эксклюзивную блокировку родительской таблицы на время изменения каталога;
+# если её не удаётся получить быстро, очистка и обслуживание завершаются ошибкой,
+# а не ставят запись в очередь за собой
+PARTITION_LOCK_TIMEOUT = os.getenv('PARTITION_LOCK_TIMEOUT', '5s')
+
+MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+
+_PARTITION_MONTH = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def month_start(value: datetime) -> datetime:
+    """Первое число месяца (UTC), в который попадает метка (наивная метка считается UTC)"""
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _bound(value: datetime) -> str:
+    # Границы секций - литералы DDL, параметры в них не поддерживаются
+    return f"'{value.isoformat()}'"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    """Объявлена ли таблица как секционированная"""
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+        {'table': table}
+    ).scalar() is True
+
+
+def list_partitions(conn: Connection, table: str) -> Dict[datetime, str]:
+    """
+    Помесячные секции таблицы
+
+    Returns:
+        Словарь: первое число месяца -> имя секции (default-секция не включается)
+    """
+    rows = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:table)
+    """), {'table': table}).scalars()
+
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_MONTH.search(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)] = name
+    return partitions
+
+
+def create_default_partition(conn: Connection, table: str) -> None:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT "
+        f"WITH (fillfactor = {PARTITION_FILLFACTOR})"
+    ))
+
+
+def ensure_partitions(conn: Connection, table: str, start: datetime, end: datetime) -> List[str]:
+    """
+    Создание недостающих помесячных секций для периода
+
+    Args:
+        conn: Соединение (изменения выполняются в его транзакции)
+        table: Имя секционированной таблицы
+        start: Начало периода
+        end: Конец периода (включительно)
+
+    Returns:
+        Имена созданных секций
+    """
+    existing = list_partitions(conn, table)
+    created = []
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        if month not in existing:
+            created.append(_create_partition(conn, table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def _create_partition(conn: Connection, table: str, month: datetime) -> str:
+    name = partition_name(table, month)
+    default = default_partition_name(table)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+
+    has_default = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': default}).scalar()
+    stranded = has_default and conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE timestamp >= {lower} AND timestamp < {upper})"
+    )).scalar()
+
+    if not stranded:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper}) "
+            f"WITH (fillfactor = {PARTITION_FILLFACTOR})"
+        ))
+        logger.info(f"Created partition {name}")
+        return name
+
+    # Строки месяца уже лежат в default-секции: новая секция создаётся отдельной таблицей,
+    # строки переносятся в неё, после чего она подключается к родительской
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"WITH (fillfactor = {PARTITION_FILLFACTOR})"
+    ))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE timestamp >= {lower} AND timestamp < {upper} RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """)).rowcount
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    logger.info(f"Created partition {name}, moved {moved} rows from {default}")
+    return name
+
+
+def create_initial_partitions(conn: Connection, table: str, months_ahead: int = PREMAKE_MONTHS) -> List[str]:
+    """Default-секция и секции с текущего месяца на months_ahead месяцев вперёд"""
+    create_default_partition(conn, table)
+    now = datetime.now(timezone.utc)
+    return ensure_partitions(conn, table, now, add_months(month_start(now), months_ahead))
+
+
+def maintain_partitions(conn: Connection, months_ahead: int = PREMAKE_MONTHS) -> Dict[str, List[str]]:
+    """
+    Задание обслуживания: секции на ближайшие месяцы для всех секционированных таблиц
+
+    Returns:
+        Словарь: таблица -> имена созданных секций
+    """
+    created = {}
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(conn, table):
+            created[table] = create_initial_partitions(conn, table, months_ahead)
+            # Месяцы, строки которых попали в default-секцию (загрузка истории), получают свои секции
+            for month in stranded_months(conn, table):
+                created[table] += ensure_partitions(conn, table, month, month)
+    return created
+
+
+def stranded_months(conn: Connection, table: str) -> List[datetime]:
+    """Месяцы, строки которых лежат в default-секции"""
+    default = default_partition_name(table)
+    if not conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': default}).scalar():
+        return []
+    return conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp, 'UTC') FROM {default} ORDER BY 1"
+    )).scalars().all()
+
+
+def run_partition_maintenance(engine: Engine, months_ahead: int = PREMAKE_MONTHS) -> Dict[str, List[str]]:
+    """maintain_partitions в отдельной транзакции (для фонового запуска)"""
+    if engine.dialect.name != 'postgresql':
+        return {}
+    with engine.begin() as conn:
+        return maintain_partitions(conn, months_ahead)
+
+
+def drop_partitions_before(conn: Connection, table: str, cutoff: datetime) -> Dict:
+    """
+    Удаление секций, целиком лежащих раньше cutoff (DETACH + DROP), и старых строк default-секции
+
+    Строки месяца, в который попадает cutoff, остаются до истечения всего месяца.
+
+    Args:
+        conn: Соединение (изменения выполняются в его транзакции)
+        table: Имя секционированной таблицы
+        cutoff: Граница хранения
+
+    Returns:
+        Словарь: partitions (имена удалённых секций), rows (количество удалённых строк,
+        для секций - по статистике планировщика)
+    """
+    result = {'partitions': [], 'rows': 0}
+    cutoff = cutoff.astimezone(timezone.utc) if cutoff.tzinfo else cutoff.replace(tzinfo=timezone.utc)
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+
+    for month, name in sorted(list_partitions(conn, table).items()):
+        if add_months(month, 1) > cutoff:
+            break
+        result['rows'] += _partition_rows(conn, name)
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        result['partitions'].append(name)
+        logger.info(f"Dropped partition {name}")
+
+    default = default_partition_name(table)
+    if conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': default}).scalar():
+        result['rows'] += conn.execute(
+            text(f"DELETE FROM {default} WHERE timestamp < :cutoff"), {'cutoff': cutoff}
+        ).rowcount
+    return result
+
+
+def _partition_rows(conn: Connection, name: str) -> int:
+    estimate = conn.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"), {'name': name}
+    ).scalar()
+    if estimate is None or estimate < 0:
+        # Секция ещё не анализировалась
+        return conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+    return estimate
+
+
+def convert_to_partitioned(conn: Connection, table: Table) -> bool:
+    """
+    Перевод существующей несекционированной таблицы на секционирование по месяцам
+
+    Таблица переименовывается, создаётся заново по модели (с секциями), данные переносятся
+    одним INSERT ... SELECT. Выполняется один раз при обновлении схемы.
+
+    Args:
+        conn: Соединение (изменения выполняются в его транзакции)
+        table: Таблица модели (ServerMetricsFact.__table__ или ServerMetricsPredictions.__table__)
+
+    Returns:
+        True, если таблица была переведена
+    """
+    name = table.name
+    if conn.execute(text("SELECT to_regclass(:name) IS NULL"), {'name': name}).scalar() \
+            or is_partitioned(conn, name):
+        return False
+
+    legacy = f"{name}_legacy"
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    # Имена индексов (и ограничений на них) уникальны в схеме - освобождаем их для новой таблицы
+    index_names = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :name"),
+        {'name': legacy}
+    ).scalars().all()
+    for index_name in index_names:
+        conn.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name[:55]}_legacy"))
+
+    table.create(conn)
+    first, last = conn.execute(text(f"SELECT min(timestamp), max(timestamp) FROM {legacy}")).one()
+    if first is not None:
+        ensure_partitions(conn, name, first, last)
+
+    columns = ', '.join(column.name for column in table.columns)
+    moved = conn.execute(text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {legacy}")).rowcount
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    logger.info(f"Converted {name} to monthly partitions, moved {moved} rows")
+    return True
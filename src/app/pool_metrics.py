@@ -0,0 +1,99 @@
+"""
+Пулы соединений с учётом ожидания свободного соединения.
+
+QueuePool сам по себе сообщает только текущие размеры (checkedout, overflow); сколько
+запросы ждали соединение и сколько из них упали по pool_timeout ("QueuePool limit of
+size ... reached"), он не хранит. Пулы ниже замеряют время получения соединения из пула.
+"""
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolWaitStats:
+    """Накопленная статистика ожидания соединений одного пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_avg': round(self.wait_seconds_total / attempts, 6) if attempts else 0.0,
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+            }
+
+
+class _MeteredPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start, timed_out=False)
+        return connection
+
+    def recreate(self):
+        # Пул пересоздаётся при dispose(): накопленная статистика сохраняется
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    """QueuePool с замером ожидания соединения"""
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool с замером ожидания соединения"""
+
+
+def pool_status(pool: Pool) -> Dict:
+    """
+    Состояние пула соединений
+
+    Returns:
+        Словарь: pool_class, size, checked_out, checked_in, overflow, max_overflow, timeout
+        и статистика ожидания (для MeteredQueuePool / MeteredAsyncQueuePool)
+    """
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            # overflow() отрицателен, пока пул не заполнен до size
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    stats = getattr(pool, 'wait_stats', None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
+from sqlalchemy import desc, and_, func, select, cast, tuple_, Float
+from sqlalchemy.sql import Select
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Tuple
+import uuid
 import models as db_models
+from routing import replica_read
 import schemas as pydantic_models
 
 
@@ -111,7 +114,9 @@ class PredsCRUD:
             vm: str,
             metric: str,
             start_date: Optional[datetime] = None,
-            end_date: Optional[datetime] = None
+            end_date: Optional[datetime] = None,
+            limit: Optional[int] = None,
+            after: Optional[Tuple[datetime, uuid.UUID]] = None
     ) -> List[db_models.ServerMetricsPredictions]:
         """
         Получение предсказаний
@@ -121,21 +126,100 @@ class PredsCRUD:
             metric: Тип метрики
             start_date: Начальная дата
             end_date: Конечная дата
+            limit: Максимальное количество записей (None - без ограничения)
+            after: Ключ (timestamp, id) последней записи предыдущей страницы
 
         Returns:
-            Список предсказаний
+            Список предсказаний, отсортированных по (timestamp, id)
         """
-        query = self.db.query(db_models.ServerMetricsPredictions).filter(
-            db_models.ServerMetricsPredictions.vm == vm,
-            db_models.ServerMetricsPredictions.metric == metric
-        )
+        pred = db_models.ServerMetricsPredictions
+        query = self.db.query(pred).filter(
+            *self._series_filters(vm, metric, start_date, end_date, after)
+        ).order_by(pred.timestamp, pred.id)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
+
+    def predictions_select(
+            self,
+            vm: str,
+            metric: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None
+    ) -> Select:
+        """
+        Запрос колонок предсказаний для потоковой выгрузки (AsyncSession.stream с yield_per)
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата
+            end_date: Конечная дата
 
+        Returns:
+            SELECT id, vm, timestamp, metric, value_predicted, lower_bound, upper_bound, created_at
+            в порядке (timestamp, id)
+        """
+        pred = db_models.ServerMetricsPredictions
+        return select(
+            pred.id, pred.vm, pred.timestamp, pred.metric,
+            pred.value_predicted, pred.lower_bound, pred.upper_bound, pred.created_at
+        ).where(
+            *self._series_filters(vm, metric, start_date, end_date)
+        ).order_by(pred.timestamp, pred.id)
+
+    @staticmethod
+    def _series_filters(
+            vm: str,
+            metric: str,
+            start_date: Optional[datetime],
+            end_date: Optional[datetime],
+            after: Optional[Tuple[datetime, uuid.UUID]] = None
+    ) -> List:
+        pred = db_models.ServerMetricsPredictions
+        filters = [pred.vm == vm, pred.metric == metric]
         if start_date:
-            query = query.filter(db_models.ServerMetricsPredictions.timestamp >= start_date)
+            filters.append(pred.timestamp >= start_date)
         if end_date:
-            query = query.filter(db_models.ServerMetricsPredictions.timestamp <= end_date)
+            filters.append(pred.timestamp <= end_date)
+        if after:
+            filters.append(tuple_(pred.timestamp, pred.id) > tuple(after))
+        return filters
+
+    def get_predictions_columns(
+            self,
+            vm: str,
+            metric: str,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None
+    ) -> Dict[str, List]:
+        """
+        Получение предсказаний в колоночном виде, без ORM-объектов
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата
+            end_date: Конечная дата
+
+        Returns:
+            Словарь с параллельными списками 'timestamp', 'value_predicted', 'lower_bound', 'upper_bound'
+        """
+        pred = db_models.ServerMetricsPredictions
+        stmt = select(
+            pred.timestamp,
+            cast(pred.value_predicted, Float),
+            cast(pred.lower_bound, Float),
+            cast(pred.upper_bound, Float)
+        ).where(
+            *self._series_filters(vm, metric, start_date, end_date)
+        ).order_by(pred.timestamp, pred.id)
 
-        return query.order_by(db_models.ServerMetricsPredictions.timestamp).all()
+        rows = self.db.connection().execute(stmt).all()
+        columns = zip(*rows) if rows else ((), (), (), ())
+        return dict(zip(('timestamp', 'value_predicted', 'lower_bound', 'upper_bound'), map(list, columns)))
 
     def get_future_predictions(self, vm: str, metric: str) -> List[db_models.ServerMetricsPredictions]:
         """
@@ -154,6 +238,7 @@ class PredsCRUD:
             db_models.ServerMetricsPredictions.timestamp > datetime.now()
         ).order_by(db_models.ServerMetricsPredictions.timestamp).all()
 
+    @replica_read
     def get_actual_vs_predicted(
             self,
             vm: str,
@@ -3,27 +3,49 @@ import pandas as pd
 import numpy as np
 from prophet import Prophet
 from prophet.diagnostics import cross_validation, performance_metrics
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 import os
 import json
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 import logging
 from itertools import product
 import random
 from sqlalchemy.orm import Session
 from dbcrud import DBCRUD
+from model_registry import MODEL_RETENTION_VERSIONS, ModelRegistryCRUD, model_file_path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def warm_start_params(model: Prophet) -> Dict[str, Any]:
+    """
+    Параметры обученной модели для инициализации Stan при повторном обучении:
+    k, m, sigma_obs - скаляры, delta, beta - векторы (среднее по выборкам при MCMC)
+    """
+    params = {name: float(np.mean(model.params[name])) for name in ('k', 'm', 'sigma_obs')}
+    params.update({name: np.mean(model.params[name], axis=0) for name in ('delta', 'beta')})
+    return params
+
+
+def _naive_timestamp(value) -> pd.Timestamp:
+    # Как в prepare_data: пояс отбрасывается без пересчёта
+    value = pd.Timestamp(value)
+    return value.tz_localize(None) if value.tzinfo else value
+
+
 class ProphetForecaster:
     def __init__(self, model_storage_path: str = "./models_storage",
-                 enable_optimization: bool = True):
+                 enable_optimization: bool = True, incremental_refit: bool = True):
         self.model_storage_path = model_storage_path
         self.enable_optimization = enable_optimization
+        # Дообучение сохранённой модели при появлении новых фактов (см. train_or_load_model)
+        self.incremental_refit = incremental_refit
         os.makedirs(model_storage_path, exist_ok=True)
         self.loaded_models = {}
+        # Режим распараллеливания кросс-валидации (None - последовательно, для процессов пула обучения)
+        self.cv_parallel = "processes"
 
         # Параметры для grid search
         self.default_param_grid = {
@@ -176,7 +198,7 @@ class ProphetForecaster:
                             initial='3 days',
                             period='1 day',
                             horizon='1 day',
-                            parallel="processes",
+                            parallel=self.cv_parallel,
                             disable_tqdm=True
                         )
 
@@ -233,8 +255,20 @@ class ProphetForecaster:
             return None
 
     def train_model(self, df: pd.DataFrame, vm: str, metric: str,
-                    optimize_hyperparams: bool = None) -> Tuple[Prophet, Dict, str]:
-        """Обучение модели Prophet с возможностью оптимизации гиперпараметров"""
+                    optimize_hyperparams: bool = None,
+                    warm_start: Optional[Dict] = None,
+                    db: Optional[Session] = None) -> Tuple[Prophet, Dict, str]:
+        """
+        Обучение модели Prophet с возможностью оптимизации гиперпараметров
+
+        Модель сохраняется новой версией ряда и регистрируется в реестре моделей.
+
+        Args:
+            db: Сессия БД для реестра (None - отдельная сессия)
+            warm_start: Данные сохранённой модели (load_model_data). Модель обучается с её
+                настройками, без подбора гиперпараметров, Stan инициализируется её параметрами,
+                оценка - без кросс-валидации
+        """
         logger.info(f"Training Prophet model for {vm} - {metric}")
 
         # Определяем использовать ли оптимизацию
@@ -247,12 +281,16 @@ class ProphetForecaster:
 
         # Оптимизация гиперпараметров если включена
         best_params = None
-        if optimize_hyperparams and len(df) >= 100:
+        if warm_start:
+            best_params = warm_start.get('optimized_params')
+        elif optimize_hyperparams and len(df) >= 100:
             logger.info("Optimizing hyperparameters...")
             best_params = self.tune_hyperparameters(df)
 
         # Настройки модели
-        if best_params:
+        if warm_start and warm_start.get('config'):
+            model_params = warm_start['config']
+        elif best_params:
             logger.info(f"Using optimized parameters: {best_params}")
             model_params = {
                 'growth': 'linear',
@@ -279,38 +317,27 @@ class ProphetForecaster:
                 'interval_width': 0.95
             }
 
-        model = Prophet(**model_params)
-
-        # Добавление кастомных сезонностей
-        if 'is_work_hours' in df.columns:
-            model.add_seasonality(
-                name='work_hours',
-                period=1,
-                fourier_order=5,
-                condition_name='is_work_hours'
-            )
-
-        if 'is_night' in df.columns:
-            model.add_seasonality(
-                name='night_hours',
-                period=1,
-                fourier_order=3,
-                condition_name='is_night'
-            )
-
-        if 'is_weekend' in df.columns:
-            model.add_seasonality(
-                name='weekend_effect',
-                period=1,
-                fourier_order=3,
-                condition_name='is_weekend'
-            )
+        model = None
+        if warm_start:
+            try:
+                model = self._build_model(model_params, df)
+                model.fit(df, init=warm_start_params(warm_start['model']))
+            except Exception as e:
+                # Например, изменился набор сезонностей и размерности параметров не совпадают
+                logger.warning(f"Warm start failed for {vm} - {metric}, training from scratch: {e}")
+                model = None
 
-        # Обучение
-        model.fit(df)
+        if model is None:
+            warm_start = None
+            model = self._build_model(model_params, df)
+            model.fit(df)
 
-        # Оценка модели
-        metrics = self.evaluate_model(model, df)
+        # Оценка модели (при дообучении - без кросс-валидации)
+        if warm_start:
+            metrics = self._calculate_simple_metrics(model, df)
+        else:
+            metrics = self.evaluate_model(model, df)
+        metrics['warm_started'] = warm_start is not None
 
         # Добавляем информацию о гиперпараметрах в метрики
         if best_params:
@@ -319,34 +346,60 @@ class ProphetForecaster:
         else:
             metrics['was_optimized'] = False
 
-        # Сохранение модели
-        model_filename = f"{vm}_{metric}_prophet_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pkl"
-        model_path = os.path.join(self.model_storage_path, model_filename)
-
-        model_data = {
-            'model': model,
-            'trained_at': datetime.now(),
-            'metrics': metrics,
-            'data_points': len(df),
-            'vm': vm,
-            'metric': metric,
-            'config': model_params,
-            'optimized': best_params is not None,
-            'optimized_params': best_params
-        }
+        # Сохранение модели новой версией ряда
+        trained_at = datetime.now(timezone.utc)
+        with self._session(db) as session:
+            registry = ModelRegistryCRUD(session)
+            version = registry.next_version(vm, metric)
+            model_path = model_file_path(self.model_storage_path, vm, metric, version)
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            self._save_model(model_path, {
+                'model': model,
+                'trained_at': trained_at,
+                'version': version,
+                'metrics': metrics,
+                'data_points': len(df),
+                'vm': vm,
+                'metric': metric,
+                'config': model_params,
+                'optimized': best_params is not None,
+                'optimized_params': best_params,
+                # Последняя метка обучающих данных: новые факты - после неё
+                'data_end': df['ds'].max(),
+                'warm_started': warm_start is not None
+            })
+            registry.register(
+                vm, metric, version, model_path, trained_at,
+                metrics=metrics, data_points=len(df),
+                params={'config': model_params, 'optimized_params': best_params}
+            )
+
+        logger.info(f"Model saved to {model_path} (version {version})")
+        logger.info(f"Model metrics: MAPE={metrics.get('mape', 0):.2f}%, Coverage={metrics.get('coverage', 0):.1f}%")
+
+        return model, metrics, model_path
 
+    @staticmethod
+    def _save_model(model_path: str, model_data: Dict) -> None:
         with open(model_path, 'wb') as f:
             pickle.dump(model_data, f)
 
         # Сохранение метрик в JSON
         metrics_path = model_path.replace('.pkl', '_metrics.json')
         with open(metrics_path, 'w') as f:
-            json.dump(metrics, f, indent=2, default=str)
-
-        logger.info(f"Model saved to {model_path}")
-        logger.info(f"Model metrics: MAPE={metrics.get('mape', 0):.2f}%, Coverage={metrics.get('coverage', 0):.1f}%")
-
-        return model, metrics, model_path
+            json.dump(model_data['metrics'], f, indent=2, default=str)
+
+    @contextmanager
+    def _session(self, db: Optional[Session]) -> Iterator[Session]:
+        if db is not None:
+            yield db
+            return
+        from connection import SessionLocal
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
 
     def evaluate_model(self, model: Prophet, df: pd.DataFrame) -> Dict:
         """Оценка качества модели"""
@@ -361,7 +414,7 @@ class ProphetForecaster:
                 initial='3 days',
                 period='1 day',
                 horizon='1 day',
-                parallel="processes",
+                parallel=self.cv_parallel,
                 disable_tqdm=True
             )
 
@@ -438,15 +491,50 @@ class ProphetForecaster:
                 'evaluation_type': 'failed'
             }
 
+    def _build_model(self, model_params: Dict, df: pd.DataFrame) -> Prophet:
+        model = Prophet(**model_params)
+
+        # Добавление кастомных сезонностей
+        if 'is_work_hours' in df.columns:
+            model.add_seasonality(
+                name='work_hours',
+                period=1,
+                fourier_order=5,
+                condition_name='is_work_hours'
+            )
+
+        if 'is_night' in df.columns:
+            model.add_seasonality(
+                name='night_hours',
+                period=1,
+                fourier_order=3,
+                condition_name='is_night'
+            )
+
+        if 'is_weekend' in df.columns:
+            model.add_seasonality(
+                name='weekend_effect',
+                period=1,
+                fourier_order=3,
+                condition_name='is_weekend'
+            )
+
+        return model
+
     def load_model(self, model_path: str) -> Optional[Prophet]:
         """Загрузка модели из файла"""
+        data = self.load_model_data(model_path)
+        return data['model'] if data else None
+
+    def load_model_data(self, model_path: str) -> Optional[Dict]:
+        """Загрузка модели с метаданными (trained_at, config, data_end, ...) из файла"""
         try:
             with open(model_path, 'rb') as f:
                 data = pickle.load(f)
 
             if 'model' in data:
                 logger.info(f"Model loaded from {model_path}")
-                return data['model']
+                return data
             else:
                 logger.error(f"No model found in {model_path}")
                 return None
@@ -492,35 +580,46 @@ class ProphetForecaster:
 
     def train_or_load_model(self, db: Session, crud: DBCRUD,
                             vm: str, metric: str, retrain: bool = False,
-                            optimize: bool = None) -> Optional[Prophet]:
-        """Обучение или загрузка модели с возможностью оптимизации"""
+                            optimize: bool = None,
+                            incremental: bool = None) -> Optional[Prophet]:
+        """
+        Обучение или загрузка модели с возможностью оптимизации
+
+        Args:
+            retrain: Обучить новую модель с нуля
+            incremental: Если после данных сохранённой модели появились новые факты - дообучить её
+                на новом окне с инициализацией Stan её параметрами (по умолчанию incremental_refit);
+                без новых фактов сохранённая модель возвращается как есть
+        """
 
         # Определяем использовать ли оптимизацию
         if optimize is None:
             optimize = self.enable_optimization
+        if incremental is None:
+            incremental = self.incremental_refit
 
-        # Проверка существующей модели
+        # Проверка существующей модели (закреплённая или последняя версия из реестра)
+        warm_start = None
         if not retrain:
             try:
-                model_files = [f for f in os.listdir(self.model_storage_path)
-                               if f.startswith(f"{vm}_{metric}_prophet") and f.endswith('.pkl')]
-
-                if model_files:
-                    # Берем самую новую модель
-                    model_files.sort(reverse=True)
-                    latest_model = model_files[0]
-                    model_path = os.path.join(self.model_storage_path, latest_model)
+                entry = ModelRegistryCRUD(db).get_model(vm, metric)
 
-                    model = self.load_model(model_path)
-                    if model:
-                        logger.info(f"Loaded existing model for {vm} - {metric}")
-                        return model
+                if entry:
+                    model_data = self.load_model_data(entry.path)
+                    if model_data:
+                        if not incremental or not self._has_new_data(crud, vm, metric, model_data):
+                            logger.info(f"Loaded existing model for {vm} - {metric}")
+                            return model_data['model']
+                        warm_start = model_data
 
             except Exception as e:
                 logger.warning(f"Failed to load existing model: {e}")
 
         # Обучение новой модели
-        logger.info(f"Training new model for {vm} - {metric}")
+        if warm_start:
+            logger.info(f"Refitting model for {vm} - {metric} with warm start")
+        else:
+            logger.info(f"Training new model for {vm} - {metric}")
 
         # Получаем данные из БД
         try:
@@ -552,7 +651,8 @@ class ProphetForecaster:
             df = self.prepare_data(data_dicts)
 
             # Обучение с оптимизацией
-            model, metrics, model_path = self.train_model(df, vm, metric, optimize_hyperparams=optimize)
+            model, metrics, model_path = self.train_model(df, vm, metric, optimize_hyperparams=optimize,
+                                                          warm_start=warm_start, db=db)
 
             logger.info(f"Model trained successfully: MAPE={metrics.get('mape', 0):.2f}%")
 
@@ -562,6 +662,15 @@ class ProphetForecaster:
             logger.error(f"Failed to train model for {vm} - {metric}: {e}")
             return None
 
+    @staticmethod
+    def _has_new_data(crud: DBCRUD, vm: str, metric: str, model_data: Dict) -> bool:
+        """Есть ли факты новее данных модели (data_end; у старых моделей - trained_at)"""
+        data_end = model_data.get('data_end') or model_data.get('trained_at')
+        last_timestamp = crud.get_data_time_range(vm, metric).get('last_timestamp')
+        if last_timestamp is None:
+            return False
+        return data_end is None or _naive_timestamp(last_timestamp) > _naive_timestamp(data_end)
+
     def generate_forecast(self, db: Session, crud: DBCRUD,
                           vm: str, metric: str,
                           periods: int = 48, freq: str = '30min',
@@ -658,84 +767,52 @@ class ProphetForecaster:
         return stats
 
     def batch_train_models(self, db: Session, crud: DBCRUD,
-                           vm_metric_pairs: List[Tuple[str, str]],
-                           optimize: bool = None) -> Dict[str, Any]:
+                           vm_metric_pairs: Optional[List[Tuple[str, str]]] = None,
+                           optimize: bool = None, max_workers: Optional[int] = None,
+                           force: bool = False) -> Dict[str, Any]:
         """
         Пакетное обучение моделей для нескольких VM и метрик
-        """
-        results = {
-            'total': len(vm_metric_pairs),
-            'successful': 0,
-            'failed': 0,
-            'details': []
-        }
 
-        for vm, metric in vm_metric_pairs:
-            try:
-                logger.info(f"Training model for {vm} - {metric}")
-
-                model = self.train_or_load_model(db, crud, vm, metric, retrain=True, optimize=optimize)
-
-                if model:
-                    results['successful'] += 1
-                    results['details'].append({
-                        'vm': vm,
-                        'metric': metric,
-                        'status': 'success',
-                        'message': 'Model trained successfully'
-                    })
-                else:
-                    results['failed'] += 1
-                    results['details'].append({
-                        'vm': vm,
-                        'metric': metric,
-                        'status': 'failed',
-                        'message': 'Failed to train model'
-                    })
+        Пары обучаются параллельно в пуле процессов (см. training_scheduler): сначала ряды
+        без модели и с самой старой моделью. Ряды без новых фактов с момента обучения
+        пропускаются, если не указан force.
 
-            except Exception as e:
-                results['failed'] += 1
-                results['details'].append({
-                    'vm': vm,
-                    'metric': metric,
-                    'status': 'error',
-                    'message': str(e)
-                })
-                logger.error(f"Error training model for {vm} - {metric}: {e}")
+        Args:
+            db: Сессия БД (для планирования; процессы пула открывают свои сессии)
+            crud: Не используется, оставлен для совместимости
+            vm_metric_pairs: Пары (vm, metric) (None - все ряды справочника)
+            optimize: Подбор гиперпараметров
+            max_workers: Максимум процессов (по умолчанию TRAINING_MAX_CPUS)
+            force: Обучать и ряды без новых фактов
+
+        Returns:
+            Словарь: run_id, total, successful, failed, skipped, duration_seconds, details
+        """
+        from training_scheduler import TRAINING_MAX_CPUS, FleetTrainingScheduler
 
-        logger.info(f"Batch training completed: {results['successful']} successful, {results['failed']} failed")
+        scheduler = FleetTrainingScheduler(self, max_cpus=max_workers or TRAINING_MAX_CPUS)
+        results = scheduler.run(db, vm_metric_pairs, optimize=optimize, force=force)
+
+        logger.info(f"Batch training completed: {results['successful']} successful, "
+                    f"{results['failed']} failed, {results['skipped']} skipped")
         return results
 
-    def cleanup_old_models(self, days_to_keep: int = 30) -> Dict:
+    def cleanup_old_models(self, days_to_keep: int = 30, db: Optional[Session] = None,
+                           keep_versions: int = MODEL_RETENTION_VERSIONS) -> Dict:
         """
-        Очистка старых моделей
+        Очистка старых моделей по политике хранения реестра: у каждого ряда остаются
+        keep_versions последних версий и закреплённая версия, остальные версии старше
+        days_to_keep дней удаляются вместе с файлами
         """
         try:
-            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-            deleted_count = 0
-            kept_count = 0
-
-            for filename in os.listdir(self.model_storage_path):
-                if filename.endswith('.pkl'):
-                    filepath = os.path.join(self.model_storage_path, filename)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(filepath))
-
-                    if file_time < cutoff_date:
-                        os.remove(filepath)
-
-                        # Также удаляем соответствующий JSON файл с метриками
-                        metrics_file = filepath.replace('.pkl', '_metrics.json')
-                        if os.path.exists(metrics_file):
-                            os.remove(metrics_file)
-
-                        deleted_count += 1
-                    else:
-                        kept_count += 1
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
+            with self._session(db) as session:
+                result = ModelRegistryCRUD(session).apply_retention(keep_versions, days_to_keep)
 
             return {
                 'success': True,
-                'deleted_models': deleted_count,
-                'kept_models': kept_count,
+                'deleted_models': result['deleted'],
+                'kept_models': result['kept'],
                 'cutoff_date': cutoff_date
             }
 
@@ -0,0 +1,103 @@
+"""
+Скетч распределения значений метрики для перцентилей по агрегатам (DDSketch-подобный).
+
+Значение v > 0 попадает в логарифмическую корзину ceil(log_gamma(v)), где
+gamma = (1 + alpha) / (1 - alpha); ноль и близкие к нему значения - в корзину ZERO_KEY,
+отрицательные - в корзины с префиксом NEGATIVE_PREFIX. Скетч - словарь {корзина: количество}:
+скетчи складываются поэлементно, поэтому часовые агрегаты объединяются в суточные
+и в произвольные периоды без обращения к сырым данным. Относительная погрешность
+перцентиля не превышает alpha.
+
+Номер корзины считается одинаково здесь и в SQL (rollup_crud.py), поэтому формула
+SKETCH_KEY_SQL должна оставаться согласованной с sketch_keys.
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_INDEXABLE = 1e-9
+ZERO_KEY = 'z'
+NEGATIVE_PREFIX = 'n'
+
+# Номер корзины в PostgreSQL для колонки value (double precision)
+SKETCH_KEY_SQL = f"""
+    CASE
+        WHEN abs(value) <= {MIN_INDEXABLE} THEN '{ZERO_KEY}'
+        WHEN value > 0 THEN ceil(ln(value) / {LOG_GAMMA!r})::bigint::text
+        ELSE '{NEGATIVE_PREFIX}' || ceil(ln(-value) / {LOG_GAMMA!r})::bigint::text
+    END
+"""
+
+
+def sketch_keys(values: np.ndarray) -> np.ndarray:
+    """
+    Номера корзин для массива значений
+
+    Args:
+        values: Значения (float64)
+
+    Returns:
+        Массив строковых ключей той же длины
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    zero = magnitude <= MIN_INDEXABLE
+    bins = np.ceil(np.log(np.where(zero, 1.0, magnitude)) / LOG_GAMMA).astype(np.int64).astype(str)
+    keys = np.where(values < 0, np.char.add(NEGATIVE_PREFIX, bins), bins)
+    return np.where(zero, ZERO_KEY, keys)
+
+
+def build_sketch(values: np.ndarray) -> Dict[str, int]:
+    """Скетч для массива значений"""
+    keys, counts = np.unique(sketch_keys(values), return_counts=True)
+    return {str(key): int(count) for key, count in zip(keys, counts)}
+
+
+def merge_sketches(sketches: Iterable[Optional[Dict[str, int]]]) -> Dict[str, int]:
+    """Объединение скетчей (поэлементная сумма количеств)"""
+    merged: Dict[str, int] = {}
+    for sketch in sketches:
+        for key, count in (sketch or {}).items():
+            merged[key] = merged.get(key, 0) + int(count)
+    return merged
+
+
+def _representative(key: str) -> float:
+    """Значение, представляющее корзину (середина по относительной погрешности)"""
+    if key == ZERO_KEY:
+        return 0.0
+    if key.startswith(NEGATIVE_PREFIX):
+        return -2.0 * GAMMA ** int(key[len(NEGATIVE_PREFIX):]) / (GAMMA + 1.0)
+    return 2.0 * GAMMA ** int(key) / (GAMMA + 1.0)
+
+
+def sketch_quantile(sketch: Dict[str, int], q: float) -> Optional[float]:
+    """
+    Перцентиль по скетчу
+
+    Args:
+        sketch: Скетч {корзина: количество}
+        q: Квантиль от 0 до 1
+
+    Returns:
+        Приближённое значение квантиля или None для пустого скетча
+    """
+    if not sketch:
+        return None
+    if not 0.0 <= q <= 1.0:
+        raise ValueError(f"Квантиль должен быть в диапазоне [0, 1]: {q}")
+
+    values = np.array([_representative(key) for key in sketch], dtype=np.float64)
+    counts = np.array(list(sketch.values()), dtype=np.int64)
+    order = np.argsort(values)
+    values, cumulative = values[order], np.cumsum(counts[order])
+
+    # Линейная интерполяция между соседними рангами, как percentile_cont в PostgreSQL
+    rank = q * (cumulative[-1] - 1)
+    lower, upper = np.searchsorted(cumulative, [math.floor(rank), math.ceil(rank)], side='right')
+    fraction = rank - math.floor(rank)
+    return float(values[lower] + (values[upper] - values[lower]) * fraction)
@@ -0,0 +1,313 @@
+"""
+Фоновое задание хранения (retention) фактов и прогнозов.
+
+Вместо одного DELETE ... WHERE timestamp < cutoff в запросе /cleanup задание:
+- пересчитывает агрегаты (server_metrics_fact_1h / _1d) за удаляемый период, чтобы
+  данные, загруженные в обход API, сохранились в агрегатах после удаления сырых строк;
+- на PostgreSQL удаляет целые секции, истёкшие для всех политик (DETACH + DROP);
+- остальное удаляет пачками по RETENTION_BATCH_SIZE строк, каждая пачка - отдельной
+  транзакцией, с паузой RETENTION_BATCH_PAUSE_SECONDS между пачками: блокировки короткие,
+  WAL пишется равномерно;
+- пересчитывает справочник рядов.
+
+Срок хранения задаётся политиками: по умолчанию days_to_keep, для отдельных метрик -
+свои сроки (RETENTION_POLICIES="cpu.usage.average=30,mem.usage.average=180").
+Граница хранения выравнивается на начало суток (UTC): сутки удаляются целиком, поэтому
+суточные агрегаты не пересчитываются по неполным данным.
+
+Состояние заданий хранится в памяти процесса (последние MAX_JOBS заданий).
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+import models as db_models
+import partitions
+from connection import SessionLocal
+from rollup_crud import ROLLUP_DAILY, ROLLUP_STEPS, RollupCRUD, floor_to
+from base_logger import logger
+
+# Строк в одной пачке DELETE
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '5000'))
+
+# Пауза между пачками
+RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv('RETENTION_BATCH_PAUSE_SECONDS', '0.5'))
+
+# Срок хранения по умолчанию для периодического запуска
+RETENTION_DEFAULT_DAYS = int(os.getenv('RETENTION_DEFAULT_DAYS', '90'))
+
+# Периодический запуск из API (0 - выключен, задание запускается через POST /cleanup)
+RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', '0'))
+
+# Пересчёт агрегатов перед удалением
+RETENTION_ROLLUP_BEFORE_DELETE = os.getenv('RETENTION_ROLLUP_BEFORE_DELETE', 'true').lower() in ('1', 'true', 'yes')
+
+MAX_JOBS = 100
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+_jobs: Dict[str, 'RetentionJob'] = {}
+_jobs_lock = threading.Lock()
+
+
+def parse_policies(value: str) -> Dict[str, int]:
+    """
+    Политики хранения из строки "metric=days,metric=days"
+
+    Raises:
+        ValueError: Неверный формат или срок меньше одного дня
+    """
+    policies = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        metric, _, days = item.rpartition('=')
+        if not metric.strip() or int(days) < 1:
+            raise ValueError(f"Invalid retention policy: {item}")
+        policies[metric.strip()] = int(days)
+    return policies
+
+
+RETENTION_POLICIES = parse_policies(os.getenv('RETENTION_POLICIES', ''))
+
+
+def retention_cutoff(days_to_keep: int, now: Optional[datetime] = None) -> datetime:
+    """Граница хранения: начало суток (UTC), в которые попадает now - days_to_keep"""
+    now = now or datetime.now(timezone.utc)
+    return floor_to(now - timedelta(days=days_to_keep), ROLLUP_STEPS[ROLLUP_DAILY])
+
+
+class RetentionJob:
+    """Задание хранения и его прогресс"""
+
+    def __init__(
+            self,
+            days_to_keep: int,
+            policies: Optional[Dict[str, int]] = None,
+            rollup_before_delete: bool = RETENTION_ROLLUP_BEFORE_DELETE,
+            batch_size: int = RETENTION_BATCH_SIZE,
+            batch_pause_seconds: float = RETENTION_BATCH_PAUSE_SECONDS
+    ):
+        self.id = uuid.uuid4().hex
+        self.days_to_keep = days_to_keep
+        self.policies = dict(policies or {})
+        self.rollup_before_delete = rollup_before_delete
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+        self.status = JOB_PENDING
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.current: Optional[str] = None
+        self.rollup_series_days = 0
+        self.partitions_dropped: List[str] = []
+        self.fact_records_deleted = 0
+        self.prediction_records_deleted = 0
+        self.batches = 0
+        self.error: Optional[str] = None
+
+    def targets(self, now: Optional[datetime] = None) -> List[Tuple[Optional[str], datetime]]:
+        """
+        Пары (метрика, граница хранения): сначала метрики с собственной политикой,
+        затем остальные метрики (None) со сроком по умолчанию
+        """
+        targets = [(metric, retention_cutoff(days, now)) for metric, days in sorted(self.policies.items())]
+        targets.append((None, retention_cutoff(self.days_to_keep, now)))
+        return targets
+
+    def snapshot(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'days_to_keep': self.days_to_keep,
+            'policies': dict(self.policies),
+            'rollup_before_delete': self.rollup_before_delete,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'current': self.current,
+            'rollup_series_days': self.rollup_series_days,
+            'partitions_dropped': list(self.partitions_dropped),
+            'fact_records_deleted': self.fact_records_deleted,
+            'prediction_records_deleted': self.prediction_records_deleted,
+            'batches': self.batches,
+            'error': self.error,
+        }
+
+
+def submit_job(job: RetentionJob) -> RetentionJob:
+    """
+    Регистрация задания
+
+    Raises:
+        RuntimeError: Другое задание ещё выполняется
+    """
+    with _jobs_lock:
+        if any(other.status in (JOB_PENDING, JOB_RUNNING) for other in _jobs.values()):
+            raise RuntimeError("Another retention job is already running")
+        _jobs[job.id] = job
+        for job_id in list(_jobs)[:-MAX_JOBS]:
+            del _jobs[job_id]
+    return job
+
+
+def get_job(job_id: str) -> Optional[RetentionJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> List[RetentionJob]:
+    """Задания от новых к старым"""
+    with _jobs_lock:
+        return list(reversed(_jobs.values()))
+
+
+def clear_jobs() -> None:
+    with _jobs_lock:
+        _jobs.clear()
+
+
+def run_job(job: RetentionJob, db: Session) -> RetentionJob:
+    """
+    Выполнение задания в переданной сессии (вызывается в фоновом потоке)
+
+    Ошибка не пробрасывается: задание получает статус failed и текст ошибки.
+    """
+    job.status = JOB_RUNNING
+    job.started_at = datetime.now(timezone.utc)
+    try:
+        targets = job.targets()
+        is_postgres = db.get_bind().dialect.name == 'postgresql'
+        fact = db_models.ServerMetricsFact
+        pred = db_models.ServerMetricsPredictions
+
+        if job.rollup_before_delete:
+            for metric, cutoff in targets:
+                job.current = f"rollups {metric or '*'} < {cutoff.isoformat()}"
+                job.rollup_series_days += _refresh_rollups_before(
+                    db, metric, cutoff, exclude=list(job.policies) if metric is None else []
+                )
+
+        if is_postgres:
+            # Секции, истёкшие для всех политик, удаляются целиком
+            oldest_cutoff = min(cutoff for _, cutoff in targets)
+            job.current = f"partitions < {oldest_cutoff.isoformat()}"
+            try:
+                connection = db.connection()
+                for model in (fact, pred):
+                    result = partitions.drop_partitions_before(connection, model.__tablename__, oldest_cutoff)
+                    job.partitions_dropped += result['partitions']
+                    if model is fact:
+                        job.fact_records_deleted += result['rows']
+                    else:
+                        job.prediction_records_deleted += result['rows']
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        for metric, cutoff in targets:
+            exclude = list(job.policies) if metric is None else []
+            for model in (fact, pred):
+                job.current = f"{model.__tablename__} {metric or '*'} < {cutoff.isoformat()}"
+                deleted = _delete_in_batches(db, job, model, metric, cutoff, exclude)
+                if model is fact:
+                    job.fact_records_deleted += deleted
+                else:
+                    job.prediction_records_deleted += deleted
+
+        job.current = "series catalog"
+        RollupCRUD(db).refresh_series()
+        db.commit()
+
+        job.status = JOB_COMPLETED
+        logger.info(f"Retention job {job.id} completed: {job.fact_records_deleted} facts, "
+                    f"{job.prediction_records_deleted} predictions in {job.batches} batches")
+    except Exception as e:
+        db.rollback()
+        job.status = JOB_FAILED
+        job.error = str(e)
+        logger.error(f"Retention job {job.id} failed: {e}", exc_info=True)
+    finally:
+        job.current = None
+        job.finished_at = datetime.now(timezone.utc)
+    return job
+
+
+def run_job_in_new_session(job: RetentionJob) -> RetentionJob:
+    """
+    Выполнение задания в собственной сессии: фоновая задача запроса /cleanup
+    работает после ответа, когда сессия запроса может быть уже закрыта
+    """
+    db = SessionLocal()
+    try:
+        return run_job(job, db)
+    finally:
+        db.close()
+
+
+def _conditions(model, metric: Optional[str], cutoff: datetime, exclude: List[str], is_postgres: bool) -> List:
+    # На SQLite метки хранятся без пояса
+    bound = cutoff if is_postgres else cutoff.replace(tzinfo=None)
+    conditions = [model.timestamp < bound]
+    if metric is not None:
+        conditions.append(model.metric == metric)
+    elif exclude:
+        conditions.append(model.metric.notin_(exclude))
+    return conditions
+
+
+def _refresh_rollups_before(db: Session, metric: Optional[str], cutoff: datetime, exclude: List[str]) -> int:
+    """
+    Пересчёт агрегатов за период от самого старого удаляемого факта до границы хранения
+
+    Returns:
+        Количество пересчитанных пар ряд/сутки
+    """
+    fact = db_models.ServerMetricsFact
+    is_postgres = db.get_bind().dialect.name == 'postgresql'
+    oldest = db.execute(
+        select(func.min(fact.timestamp)).where(*_conditions(fact, metric, cutoff, exclude, is_postgres))
+    ).scalar()
+    db.commit()
+    if oldest is None:
+        return 0
+    # Граница выровнена на сутки: пересчитываются только сутки, удаляемые целиком
+    return RollupCRUD(db).refresh_range(oldest, cutoff - timedelta(microseconds=1), metric=metric)['series']
+
+
+def _delete_in_batches(
+        db: Session,
+        job: RetentionJob,
+        model,
+        metric: Optional[str],
+        cutoff: datetime,
+        exclude: List[str]
+) -> int:
+    """Удаление строк старше cutoff пачками по первичному ключу (id, timestamp)"""
+    is_postgres = db.get_bind().dialect.name == 'postgresql'
+    batch = select(model.id, model.timestamp).where(
+        *_conditions(model, metric, cutoff, exclude, is_postgres)
+    ).limit(job.batch_size)
+
+    deleted = 0
+    while True:
+        try:
+            rows = db.execute(delete(model).where(tuple_(model.id, model.timestamp).in_(batch))).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if rows:
+            deleted += rows
+            job.batches += 1
+        if rows < job.batch_size:
+            return deleted
+        time.sleep(job.batch_pause_seconds)
@@ -0,0 +1,644 @@
+"""
+Агрегаты фактических метрик: server_metrics_fact_1h и server_metrics_fact_1d.
+
+Агрегаты аддитивны (count, min, max, sum, sumsq и скетч распределения), поэтому
+статистика за произвольный период собирается из суточных строк, часовых строк на
+краях суток и сырых данных только для неполных часов на границах периода.
+
+Агрегаты пересчитываются по затронутым (vm, metric, час/сутки) в той же транзакции,
+что и запись фактов (FactsCRUD, utils/data_loader.py), либо заданием refresh_range
+для данных, записанных в таблицу напрямую. Удаление старых фактов агрегаты
+не затрагивает: они хранятся дольше сырых данных.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, and_, func, cast, text, bindparam, String, DateTime, Float
+from sqlalchemy.dialects.postgresql import ARRAY
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import models as db_models
+import quantile_sketch
+from base_logger import logger
+
+ROLLUP_HOURLY = '1h'
+ROLLUP_DAILY = '1d'
+
+ROLLUP_MODELS = {
+    ROLLUP_HOURLY: db_models.ServerMetricsFactHourly,
+    ROLLUP_DAILY: db_models.ServerMetricsFactDaily,
+}
+
+ROLLUP_STEPS = {
+    ROLLUP_HOURLY: timedelta(hours=1),
+    ROLLUP_DAILY: timedelta(days=1),
+}
+
+STATISTICS_QUANTILE = 0.95
+
+# Затронутые ключи передаются массивами: (vm, metric, первая и последняя изменённая метка).
+# Границы корзин считаются в UTC независимо от TimeZone сессии.
+_ROLLUP_KEYS_CTE = """
+    keys AS (
+        SELECT k.vm, k.metric,
+               date_trunc('{unit}', k.first_ts, 'UTC') AS start_ts,
+               date_trunc('{unit}', k.last_ts, 'UTC') + interval '1 {unit}' AS end_ts
+        FROM unnest(:vms, :metrics, :firsts, :lasts) AS k(vm, metric, first_ts, last_ts)
+    )
+"""
+
+# Часовые агрегаты считаются по сырым строкам
+_HOURLY_SOURCE = """
+    raw AS (
+        SELECT f.vm, f.metric, date_trunc('hour', f.timestamp, 'UTC') AS bucket, f.value::float8 AS value
+        FROM server_metrics_fact f
+        JOIN keys k ON f.vm = k.vm AND f.metric = k.metric
+                   AND f.timestamp >= k.start_ts AND f.timestamp < k.end_ts
+        WHERE f.value IS NOT NULL
+    ),
+    aggregates AS (
+        SELECT vm, metric, bucket, count(*) AS count, min(value) AS min, max(value) AS max,
+               sum(value) AS sum, sum(value * value) AS sumsq
+        FROM raw
+        GROUP BY vm, metric, bucket
+    ),
+    bin_counts AS (
+        SELECT vm, metric, bucket, {sketch_key} AS sketch_bin, count(*) AS n
+        FROM raw
+        GROUP BY vm, metric, bucket, sketch_bin
+    )
+""".replace('{sketch_key}', quantile_sketch.SKETCH_KEY_SQL.strip())
+
+# Суточные агрегаты собираются из часовых, пересчитанных перед ними в той же транзакции
+_DAILY_SOURCE = """
+    hours AS (
+        SELECT h.vm, h.metric, date_trunc('day', h.bucket, 'UTC') AS bucket,
+               h.count, h.min, h.max, h.sum, h.sumsq, h.sketch
+        FROM server_metrics_fact_1h h
+        JOIN keys k ON h.vm = k.vm AND h.metric = k.metric
+                   AND h.bucket >= k.start_ts AND h.bucket < k.end_ts
+    ),
+    aggregates AS (
+        SELECT vm, metric, bucket, sum(count)::bigint AS count, min(min) AS min, max(max) AS max,
+               sum(sum) AS sum, sum(sumsq) AS sumsq
+        FROM hours
+        GROUP BY vm, metric, bucket
+    ),
+    bin_counts AS (
+        SELECT vm, metric, bucket, s.key AS sketch_bin, sum(s.value::bigint) AS n
+        FROM hours, jsonb_each_text(hours.sketch) AS s
+        GROUP BY vm, metric, bucket, s.key
+    )
+"""
+
+_ROLLUP_UPSERT = """
+    WITH {keys},
+    {source},
+    sketches AS (
+        SELECT vm, metric, bucket, jsonb_object_agg(sketch_bin, n) AS sketch
+        FROM bin_counts
+        GROUP BY vm, metric, bucket
+    )
+    INSERT INTO {table} (vm, metric, bucket, count, min, max, sum, sumsq, sketch)
+    SELECT a.vm, a.metric, a.bucket, a.count, a.min, a.max, a.sum, a.sumsq, s.sketch
+    FROM aggregates a
+    JOIN sketches s ON s.vm = a.vm AND s.metric = a.metric AND s.bucket = a.bucket
+    ON CONFLICT (vm, metric, bucket) DO UPDATE SET
+        count = EXCLUDED.count, min = EXCLUDED.min, max = EXCLUDED.max,
+        sum = EXCLUDED.sum, sumsq = EXCLUDED.sumsq, sketch = EXCLUDED.sketch, updated_at = now()
+"""
+
+
+def _refresh_sql(table: str, unit: str, source: str):
+    return text(
+        _ROLLUP_UPSERT.format(keys=_ROLLUP_KEYS_CTE.format(unit=unit), source=source, table=table)
+    ).bindparams(
+        bindparam('vms', type_=ARRAY(String)),
+        bindparam('metrics', type_=ARRAY(String)),
+        bindparam('firsts', type_=ARRAY(DateTime(timezone=True))),
+        bindparam('lasts', type_=ARRAY(DateTime(timezone=True)))
+    )
+
+
+REFRESH_HOURLY_SQL = _refresh_sql('server_metrics_fact_1h', 'hour', _HOURLY_SOURCE)
+REFRESH_DAILY_SQL = _refresh_sql('server_metrics_fact_1d', 'day', _DAILY_SOURCE)
+
+# Справочник рядов: первая и последняя метка - по индексу (vm, metric, timestamp),
+# количество точек - по суточным агрегатам, пересчитанным перед ним в той же транзакции.
+# Ряды, у которых не осталось фактов, удаляются из справочника.
+REFRESH_SERIES_SQL = text("""
+    WITH keys AS (
+        SELECT * FROM unnest(:vms, :metrics) AS k(vm, metric)
+    ),
+    bounds AS (
+        SELECT k.vm, k.metric, first_row.timestamp AS first_ts, last_row.timestamp AS last_ts
+        FROM keys k
+        CROSS JOIN LATERAL (
+            SELECT f.timestamp FROM server_metrics_fact f
+            WHERE f.vm = k.vm AND f.metric = k.metric ORDER BY f.timestamp LIMIT 1
+        ) first_row
+        CROSS JOIN LATERAL (
+            SELECT f.timestamp FROM server_metrics_fact f
+            WHERE f.vm = k.vm AND f.metric = k.metric ORDER BY f.timestamp DESC LIMIT 1
+        ) last_row
+    ),
+    removed AS (
+        DELETE FROM server_metrics_series s
+        USING keys k
+        WHERE s.vm = k.vm AND s.metric = k.metric
+          AND NOT EXISTS (SELECT 1 FROM bounds b WHERE b.vm = k.vm AND b.metric = k.metric)
+    )
+    INSERT INTO server_metrics_series (vm, metric, first_ts, last_ts, point_count)
+    SELECT b.vm, b.metric, b.first_ts, b.last_ts, coalesce((
+        SELECT sum(d.count) FROM server_metrics_fact_1d d
+        WHERE d.vm = b.vm AND d.metric = b.metric AND d.bucket >= date_trunc('day', b.first_ts, 'UTC')
+    ), 0)
+    FROM bounds b
+    ON CONFLICT (vm, metric) DO UPDATE SET
+        first_ts = EXCLUDED.first_ts, last_ts = EXCLUDED.last_ts,
+        point_count = EXCLUDED.point_count, updated_at = now()
+""").bindparams(
+    bindparam('vms', type_=ARRAY(String)),
+    bindparam('metrics', type_=ARRAY(String))
+)
+
+# Ключ затронутого ряда -> (первая, последняя) изменённая метка
+RollupKeys = Dict[Tuple[str, str], Tuple[datetime, datetime]]
+
+
+def to_utc(value: datetime) -> datetime:
+    """Метка в UTC с часовым поясом (наивная метка считается UTC)"""
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def floor_to(value: datetime, step: timedelta) -> datetime:
+    """Начало часа/суток (UTC), в которые попадает метка"""
+    value = to_utc(value)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return value - (value - epoch) % step
+
+
+def ceil_to(value: datetime, step: timedelta) -> datetime:
+    """Начало первого часа/суток (UTC), начинающихся не раньше метки"""
+    floor = floor_to(value, step)
+    return floor if floor == to_utc(value) else floor + step
+
+
+def rollup_keys(items: Iterable[Tuple[str, datetime, str]]) -> RollupKeys:
+    """
+    Диапазоны изменённых меток по рядам
+
+    Args:
+        items: Ключи записанных строк (vm, timestamp, metric)
+
+    Returns:
+        Словарь (vm, metric) -> (первая, последняя) метка в UTC
+    """
+    keys: RollupKeys = {}
+    for vm, timestamp, metric in items:
+        timestamp = to_utc(timestamp)
+        bounds = keys.get((vm, metric))
+        if bounds is None:
+            keys[(vm, metric)] = (timestamp, timestamp)
+        else:
+            keys[(vm, metric)] = (min(bounds[0], timestamp), max(bounds[1], timestamp))
+    return keys
+
+
+def empty_partial() -> Dict:
+    return {'count': 0, 'min': None, 'max': None, 'sum': 0.0, 'sumsq': 0.0, 'sketch': {}}
+
+
+def merge_partials(partials: Iterable[Dict]) -> Dict:
+    """Объединение аддитивных агрегатов"""
+    merged = empty_partial()
+    sketches = []
+    for partial in partials:
+        if not partial['count']:
+            continue
+        merged['count'] += int(partial['count'])
+        merged['sum'] += float(partial['sum'])
+        merged['sumsq'] += float(partial['sumsq'])
+        merged['min'] = partial['min'] if merged['min'] is None else min(merged['min'], partial['min'])
+        merged['max'] = partial['max'] if merged['max'] is None else max(merged['max'], partial['max'])
+        sketches.append(partial['sketch'])
+    merged['sketch'] = quantile_sketch.merge_sketches(sketches)
+    return merged
+
+
+def values_partial(values: np.ndarray) -> Dict:
+    """Агрегаты по массиву сырых значений"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return empty_partial()
+    return {
+        'count': len(values),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'sum': float(values.sum()),
+        'sumsq': float(np.dot(values, values)),
+        'sketch': quantile_sketch.build_sketch(values),
+    }
+
+
+class RollupCRUD:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # =================================== ОБНОВЛЕНИЕ АГРЕГАТОВ ====================================
+
+    def refresh_keys(self, keys: RollupKeys) -> int:
+        """
+        Пересчёт часовых и суточных агрегатов для изменённых диапазонов рядов
+        и их строк в справочнике рядов server_metrics_series.
+        Выполняется в текущей транзакции, commit остаётся за вызывающим кодом.
+
+        Args:
+            keys: Словарь (vm, metric) -> (первая, последняя) изменённая метка
+
+        Returns:
+            Количество пересчитанных рядов
+        """
+        if not keys:
+            return 0
+        self.db.flush()
+
+        if self._is_postgres():
+            params = {
+                'vms': [vm for vm, _ in keys],
+                'metrics': [metric for _, metric in keys],
+                'firsts': [to_utc(first) for first, _ in keys.values()],
+                'lasts': [to_utc(last) for _, last in keys.values()],
+            }
+            self.db.execute(REFRESH_HOURLY_SQL, params)
+            self.db.execute(REFRESH_DAILY_SQL, params)
+        else:
+            for (vm, metric), (first, last) in keys.items():
+                self._refresh_key_portable(vm, metric, first, last)
+        self.refresh_series(list(keys))
+        return len(keys)
+
+    def refresh_series(self, series: Optional[List[Tuple[str, str]]] = None) -> int:
+        """
+        Пересчёт строк справочника рядов: диапазон меток и количество точек.
+        Выполняется в текущей транзакции, commit остаётся за вызывающим кодом.
+
+        Args:
+            series: Ряды (vm, metric); по умолчанию - все ряды справочника
+
+        Returns:
+            Количество обработанных рядов
+        """
+        model = db_models.ServerMetricsSeries
+        if series is None:
+            series = [tuple(row) for row in self.db.execute(select(model.vm, model.metric)).all()]
+        if not series:
+            return 0
+
+        if self._is_postgres():
+            self.db.execute(REFRESH_SERIES_SQL, {
+                'vms': [vm for vm, _ in series],
+                'metrics': [metric for _, metric in series],
+            })
+            return len(series)
+
+        fact = db_models.ServerMetricsFact
+        for vm, metric in series:
+            first, last, count = self.db.execute(
+                select(func.min(fact.timestamp), func.max(fact.timestamp), func.count(fact.value))
+                .where(fact.vm == vm, fact.metric == metric)
+            ).one()
+            self.db.execute(delete(model).where(model.vm == vm, model.metric == metric))
+            if first is not None:
+                self.db.execute(insert(model), [
+                    {'vm': vm, 'metric': metric, 'first_ts': first, 'last_ts': last, 'point_count': count}
+                ])
+        return len(series)
+
+    def _refresh_key_portable(self, vm: str, metric: str, first: datetime, last: datetime) -> None:
+        """Переносимый путь: агрегаты считаются в pandas по сырым строкам затронутых суток"""
+        fact = db_models.ServerMetricsFact
+        day = ROLLUP_STEPS[ROLLUP_DAILY]
+        start = floor_to(first, day)
+        end = floor_to(last, day) + day
+
+        rows = self.db.execute(
+            select(fact.timestamp, cast(fact.value, Float)).where(
+                fact.vm == vm,
+                fact.metric == metric,
+                fact.value.isnot(None),
+                fact.timestamp >= self._bind_time(start),
+                fact.timestamp < self._bind_time(end)
+            )
+        ).all()
+        if not rows:
+            return
+
+        frame = pd.DataFrame(rows, columns=['timestamp', 'value'])
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
+        hourly = self._aggregate_frame(frame, frame['timestamp'].dt.floor('h'))
+        daily = self._aggregate_frame(frame, frame['timestamp'].dt.floor('D'))
+
+        for granularity, records in ((ROLLUP_HOURLY, hourly), (ROLLUP_DAILY, daily)):
+            model = ROLLUP_MODELS[granularity]
+            for record in records:
+                record.update(vm=vm, metric=metric, bucket=self._bind_time(record['bucket']))
+            self.db.execute(delete(model).where(
+                model.vm == vm,
+                model.metric == metric,
+                model.bucket.in_([record['bucket'] for record in records])
+            ))
+            if records:
+                self.db.execute(insert(model), records)
+
+    @staticmethod
+    def _aggregate_frame(frame: pd.DataFrame, buckets: pd.Series) -> List[Dict]:
+        records = []
+        for bucket, values in frame['value'].groupby(buckets):
+            record = values_partial(values.to_numpy())
+            record['bucket'] = bucket.to_pydatetime()
+            records.append(record)
+        return records
+
+    def refresh_range(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        vm: Optional[str] = None,
+        metric: Optional[str] = None
+    ) -> Dict:
+        """
+        Задание пересчёта агрегатов за период (для данных, загруженных в обход API).
+        Период обрабатывается по суткам, каждые сутки - отдельной транзакцией.
+
+        Args:
+            start_date: Начало периода
+            end_date: Конец периода (включительно)
+            vm: Имя виртуальной машины (по умолчанию - все)
+            metric: Тип метрики (по умолчанию - все)
+
+        Returns:
+            Словарь: days, series (пересчитанных пар ряд/сутки), period
+        """
+        fact = db_models.ServerMetricsFact
+        day = ROLLUP_STEPS[ROLLUP_DAILY]
+        stats = {
+            'days': 0,
+            'series': 0,
+            'period': {'start': start_date.isoformat(), 'end': end_date.isoformat()}
+        }
+
+        window_start = floor_to(start_date, day)
+        last_day = floor_to(end_date, day)
+        while window_start <= last_day:
+            conditions = [
+                fact.timestamp >= self._bind_time(max(window_start, to_utc(start_date))),
+                fact.timestamp < self._bind_time(window_start + day),
+                fact.timestamp <= self._bind_time(to_utc(end_date)),
+            ]
+            if vm:
+                conditions.append(fact.vm == vm)
+            if metric:
+                conditions.append(fact.metric == metric)
+
+            try:
+                keys = {
+                    (row.vm, row.metric): (row.first, row.last)
+                    for row in self.db.execute(
+                        select(fact.vm, fact.metric,
+                               func.min(fact.timestamp).label('first'),
+                               func.max(fact.timestamp).label('last'))
+                        .where(and_(*conditions))
+                        .group_by(fact.vm, fact.metric)
+                    )
+                }
+                stats['series'] += self.refresh_keys(keys)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+
+            stats['days'] += 1
+            window_start += day
+
+        logger.info(f"Rollups refreshed: {stats['series']} series-days over {stats['days']} days")
+        return stats
+
+    # ====================================== ЧТЕНИЕ АГРЕГАТОВ =======================================
+
+    def get_statistics(
+        self,
+        vm: str,
+        metric: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        quantile: float = STATISTICS_QUANTILE
+    ) -> Dict:
+        """
+        Статистика по ряду за период из агрегатов
+
+        Полные сутки берутся из server_metrics_fact_1d, полные часы на краях суток -
+        из server_metrics_fact_1h, сырые строки читаются только для неполных часов
+        на границах периода.
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата (включительно)
+            end_date: Конечная дата (включительно)
+            quantile: Квантиль для оценки по скетчу
+
+        Returns:
+            Словарь: count, min, max, avg, stddev, quantile (None для пустого ряда)
+        """
+        hour = ROLLUP_STEPS[ROLLUP_HOURLY]
+        day = ROLLUP_STEPS[ROLLUP_DAILY]
+
+        # Целые часы [hours_start, hours_end), остальное - сырые данные
+        hours_start = ceil_to(start_date, hour) if start_date else None
+        # end_date включительно: час, начинающийся в end_date, полным не считается
+        hours_end = floor_to(end_date, hour) if end_date else None
+
+        partials = []
+        if hours_start is not None and hours_end is not None and hours_start >= hours_end:
+            partials.append(self._raw_partial(vm, metric, start_date, end_date, include_end=True))
+        else:
+            if start_date is not None and to_utc(start_date) < hours_start:
+                partials.append(self._raw_partial(vm, metric, start_date, hours_start))
+            if end_date is not None:
+                partials.append(self._raw_partial(vm, metric, hours_end, end_date, include_end=True))
+
+            days_start = ceil_to(hours_start, day) if hours_start else None
+            days_end = floor_to(hours_end, day) if hours_end else None
+            if days_start is None or days_end is None or days_start < days_end:
+                partials.append(self._rollup_partial(ROLLUP_DAILY, vm, metric, days_start, days_end))
+                if hours_start is not None and hours_start < days_start:
+                    partials.append(self._rollup_partial(ROLLUP_HOURLY, vm, metric, hours_start, days_start))
+                if hours_end is not None and days_end < hours_end:
+                    partials.append(self._rollup_partial(ROLLUP_HOURLY, vm, metric, days_end, hours_end))
+            else:
+                partials.append(self._rollup_partial(ROLLUP_HOURLY, vm, metric, hours_start, hours_end))
+
+        total = merge_partials(partials)
+        count = total['count']
+        if count == 0:
+            return {'count': 0, 'min': None, 'max': None, 'avg': None, 'stddev': None, 'quantile': None}
+
+        avg = total['sum'] / count
+        # Выборочное стандартное отклонение, как stddev() в PostgreSQL
+        variance = (total['sumsq'] - total['sum'] * avg) / (count - 1) if count > 1 else None
+        return {
+            'count': count,
+            'min': total['min'],
+            'max': total['max'],
+            'avg': avg,
+            'stddev': float(np.sqrt(max(variance, 0.0))) if variance is not None else None,
+            'quantile': quantile_sketch.sketch_quantile(total['sketch'], quantile),
+        }
+
+    def _rollup_partial(
+        self,
+        granularity: str,
+        vm: str,
+        metric: str,
+        start: Optional[datetime],
+        end: Optional[datetime]
+    ) -> Dict:
+        """Агрегаты по строкам часовой или суточной таблицы с bucket в [start, end)"""
+        model = ROLLUP_MODELS[granularity]
+        stmt = select(model.count, model.min, model.max, model.sum, model.sumsq, model.sketch).where(
+            model.vm == vm, model.metric == metric
+        )
+        if start is not None:
+            stmt = stmt.where(model.bucket >= self._bind_time(start))
+        if end is not None:
+            stmt = stmt.where(model.bucket < self._bind_time(end))
+        return merge_partials(row._asdict() for row in self.db.execute(stmt))
+
+    def _raw_partial(
+        self,
+        vm: str,
+        metric: str,
+        start: datetime,
+        end: datetime,
+        include_end: bool = False
+    ) -> Dict:
+        """Агрегаты по сырым строкам на границе периода (не более часа данных)"""
+        fact = db_models.ServerMetricsFact
+        end_condition = fact.timestamp <= self._bind_time(end) if include_end \
+            else fact.timestamp < self._bind_time(end)
+        values = self.db.execute(
+            select(cast(fact.value, Float)).where(
+                fact.vm == vm,
+                fact.metric == metric,
+                fact.value.isnot(None),
+                fact.timestamp >= self._bind_time(start),
+                end_condition
+            )
+        ).scalars().all()
+        return values_partial(np.array(values, dtype=np.float64))
+
+    def get_series(
+        self,
+        vm: str,
+        metric: str,
+        start_date: datetime,
+        end_date: datetime,
+        resolution: timedelta
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Ряд агрегатов самой крупной гранулярности, не превышающей resolution
+
+        Args:
+            vm: Имя виртуальной машины
+            metric: Тип метрики
+            start_date: Начальная дата
+            end_date: Конечная дата (включительно)
+            resolution: Требуемый шаг ряда
+
+        Returns:
+            Словарь массивов: timestamp (epoch начала корзины), count, sum, min, max;
+            None, если шаг мельче часа и нужны сырые данные
+        """
+        granularity = self.pick_granularity(resolution)
+        if granularity is None:
+            return None
+
+        model = ROLLUP_MODELS[granularity]
+        step = ROLLUP_STEPS[granularity]
+        rows = self.db.execute(
+            select(model.bucket, model.count, model.sum, model.min, model.max).where(
+                model.vm == vm,
+                model.metric == metric,
+                model.bucket >= self._bind_time(floor_to(start_date, step)),
+                model.bucket <= self._bind_time(end_date)
+            ).order_by(model.bucket)
+        ).all()
+
+        if not rows:
+            empty = np.array([], dtype=np.float64)
+            return {'timestamp': empty, 'count': empty, 'sum': empty, 'min': empty, 'max': empty}
+
+        buckets, counts, sums, lows, highs = zip(*rows)
+        return {
+            'timestamp': np.array([to_utc(bucket).timestamp() for bucket in buckets], dtype=np.float64),
+            'count': np.array(counts, dtype=np.float64),
+            'sum': np.array(sums, dtype=np.float64),
+            'min': np.array(lows, dtype=np.float64),
+            'max': np.array(highs, dtype=np.float64),
+        }
+
+    @staticmethod
+    def pick_granularity(resolution: timedelta) -> Optional[str]:
+        """Самая крупная гранулярность агрегатов, не превышающая resolution"""
+        for granularity in (ROLLUP_DAILY, ROLLUP_HOURLY):
+            if resolution >= ROLLUP_STEPS[granularity]:
+                return granularity
+        return None
+
+    def get_hour_of_day_profile(
+        self,
+        vms: List[str],
+        metric: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Среднее значение метрики по часам суток (UTC) для набора VM из часовых агрегатов
+
+        Args:
+            vms: Список виртуальных машин
+            metric: Тип метрики
+            start_date: Начальная дата
+            end_date: Конечная дата (включительно)
+
+        Returns:
+            DataFrame с колонками vm, hour, avg, count
+        """
+        model = ROLLUP_MODELS[ROLLUP_HOURLY]
+        hour = ROLLUP_STEPS[ROLLUP_HOURLY]
+        stmt = select(model.vm, model.bucket, model.count, model.sum).where(
+            model.vm.in_(vms), model.metric == metric
+        )
+        if start_date is not None:
+            stmt = stmt.where(model.bucket >= self._bind_time(floor_to(start_date, hour)))
+        if end_date is not None:
+            stmt = stmt.where(model.bucket <= self._bind_time(end_date))
+
+        rows = self.db.execute(stmt).all()
+        if not rows:
+            return pd.DataFrame(columns=['vm', 'hour', 'avg', 'count'])
+
+        frame = pd.DataFrame(rows, columns=['vm', 'bucket', 'count', 'sum'])
+        frame['hour'] = pd.to_datetime(frame['bucket'], utc=True).dt.hour
+        profile = frame.groupby(['vm', 'hour'], as_index=False)[['count', 'sum']].sum()
+        profile['avg'] = profile['sum'] / profile['count']
+        return profile[['vm', 'hour', 'avg', 'count']]
+
+    def _bind_time(self, value: datetime) -> datetime:
+        """Метка для запроса: UTC с поясом на PostgreSQL, наивный UTC на остальных СУБД"""
+        value = to_utc(value)
+        return value if self._is_postgres() else value.replace(tzinfo=None)
+
+    def _is_postgres(self) -> bool:
+        return self.db.get_bind().dialect.name == 'postgresql'
@@ -0,0 +1,132 @@
+"""
+Маршрутизация чтения на реплики PostgreSQL.
+
+Сессии SessionLocal / AsyncSessionLocal создаются классом RoutingSession. Методы CRUD,
+помеченные @replica_read, на время вызова переключают сессию на реплики: запросы идут
+на очередную здоровую реплику (round-robin), а flush и все неотмеченные методы -
+на основной сервер. Если реплики не заданы (DB_REPLICA_URLS) или все недоступны,
+чтение тоже идёт на основной сервер.
+
+Доступность реплик проверяет фоновое задание (replica_health_loop в main.py):
+реплика, не ответившая на SELECT 1, исключается из ротации до следующей успешной проверки.
+"""
+import functools
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from base_logger import logger
+
+# Ключи Session.info: вызов выполняется в методе @replica_read; реплика, выбранная для него
+# (все запросы одного вызова идут через одно соединение)
+USE_REPLICA = 'use_replica'
+REPLICA_ENGINE = 'replica_engine'
+
+
+class ReplicaSet:
+    """Набор реплик с round-robin выбором среди здоровых"""
+
+    def __init__(self, engines: List[Engine]):
+        self.engines = list(engines)
+        self._healthy = {id(engine): True for engine in self.engines}
+        self._cycle = itertools.cycle(self.engines)
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def next_engine(self) -> Optional[Engine]:
+        """Очередная здоровая реплика (None - здоровых нет)"""
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = next(self._cycle)
+                if self._healthy[id(engine)]:
+                    return engine
+        return None
+
+    def mark(self, engine: Engine, healthy: bool) -> None:
+        with self._lock:
+            changed = self._healthy[id(engine)] != healthy
+            self._healthy[id(engine)] = healthy
+        if changed:
+            state = "back in rotation" if healthy else "excluded from rotation"
+            logger.warning(f"Replica {engine.url.render_as_string(hide_password=True)} {state}")
+
+    def check(self) -> Dict[str, bool]:
+        """
+        Проверка реплик (SELECT 1) и обновление ротации
+
+        Returns:
+            Словарь: URL реплики (без пароля) -> доступна ли
+        """
+        result = {}
+        for engine in self.engines:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                healthy = True
+            except Exception as e:
+                logger.error(f"Replica health check failed: {e}")
+                healthy = False
+            self.mark(engine, healthy)
+            result[engine.url.render_as_string(hide_password=True)] = healthy
+        return result
+
+
+class AsyncReplicaSet(ReplicaSet):
+    """Реплики для AsyncSession: ротация по sync_engine, проверка через асинхронные engine"""
+
+    def __init__(self, async_engines: List[AsyncEngine]):
+        super().__init__([engine.sync_engine for engine in async_engines])
+        self.async_engines = list(async_engines)
+
+    async def check(self) -> Dict[str, bool]:
+        result = {}
+        for async_engine in self.async_engines:
+            try:
+                async with async_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                healthy = True
+            except Exception as e:
+                logger.error(f"Replica health check failed: {e}")
+                healthy = False
+            self.mark(async_engine.sync_engine, healthy)
+            result[async_engine.url.render_as_string(hide_password=True)] = healthy
+        return result
+
+
+class RoutingSession(Session):
+    """Session, отправляющая чтение методов @replica_read на реплики"""
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replicas and self.info.get(USE_REPLICA) and not self._flushing:
+            engine = self.info.get(REPLICA_ENGINE) or self.replicas.next_engine()
+            if engine is not None:
+                self.info[REPLICA_ENGINE] = engine
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def replica_read(method: Callable) -> Callable:
+    """Метод CRUD только читает и может выполняться на реплике"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        info = self.db.info
+        if info.get(USE_REPLICA):
+            # Вложенный вызов: реплика уже выбрана внешним
+            return method(self, *args, **kwargs)
+        info[USE_REPLICA] = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            info[USE_REPLICA] = False
+            info.pop(REPLICA_ENGINE, None)
+    return wrapper
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from enum import Enum
 
 
@@ -119,6 +119,8 @@ class BatchCreateResponse(BaseModel):
     created: int
     failed: int
     total: int
+    inserted: Optional[int] = None
+    updated: Optional[int] = None
 
 
 class DatabaseStatsResponse(BaseModel):
@@ -132,6 +134,26 @@ class DatabaseStatsResponse(BaseModel):
     oldest_record: Optional[datetime] = None
     newest_record: Optional[datetime] = None
     collection_period_days: int
+    estimated: bool = False
+
+
+class RetentionJobResponse(BaseModel):
+    """Status of a background retention job"""
+    job_id: str
+    status: str
+    days_to_keep: int
+    policies: Dict[str, int]
+    rollup_before_delete: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    current: Optional[str] = None
+    rollup_series_days: int
+    partitions_dropped: List[str]
+    fact_records_deleted: int
+    prediction_records_deleted: int
+    batches: int
+    error: Optional[str] = None
 
 
 class DataCompletenessResponse(BaseModel):
@@ -144,6 +166,17 @@ class DataCompletenessResponse(BaseModel):
     missing_intervals_count: int
 
 
+class CompletenessReportRow(BaseModel):
+    """Row of the fleet-wide data completeness report"""
+    vm: str
+    metric: str
+    expected_points: int
+    actual_points: int
+    completeness_percentage: float
+    missing_points: int
+    gap_count: int
+
+
 class TimeRangeResponse(BaseModel):
     """Response for time range queries"""
     first_timestamp: datetime
@@ -152,6 +185,18 @@ class TimeRangeResponse(BaseModel):
     total_records: int
 
 
+class SeriesKey(BaseModel):
+    """Series identifier for batch requests"""
+    vm: str
+    metric: str
+
+
+class SeriesTimeRangeResponse(TimeRangeResponse):
+    """Response item for batch time range queries"""
+    vm: str
+    metric: str
+
+
 class ActualVsPredictedResponse(BaseModel):
     """Response for actual vs predicted comparison"""
     timestamp: datetime
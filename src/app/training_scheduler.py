@@ -0,0 +1,257 @@
+"""
+Параллельное обучение моделей Prophet для парка рядов.
+
+Пары (vm, metric) обучаются в пуле процессов (ProcessPoolExecutor, spawn): у каждого
+процесса своё подключение к БД и свой ProphetForecaster. Число процессов ограничено
+TRAINING_MAX_CPUS, а внутри процесса обучение однопоточное (кросс-валидация без
+собственного пула процессов), поэтому обучение занимает не больше TRAINING_MAX_CPUS ядер.
+
+Порядок обучения (время обучения моделей - из реестра моделей): сначала пары без модели,
+затем с самой старой моделью; при равенстве - пары с большим количеством точек. Пары,
+по которым с момента обучения модели не пришло новых фактов, и пары с недостаточным
+количеством точек пропускаются (force=True обучает заново все пары с данными).
+Неудачное обучение повторяется до TRAINING_MAX_RETRIES раз с экспоненциальной паузой.
+Результат по каждой паре (время, попытки, статус) дописывается в журнал запусков (JSON Lines).
+"""
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, tuple_
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+import models as db_models
+from base_logger import logger
+from model_registry import ModelRegistryCRUD
+
+# Максимум ядер (процессов обучения) на запуск
+TRAINING_MAX_CPUS = int(os.getenv('TRAINING_MAX_CPUS', str(os.cpu_count() or 1)))
+
+# Повторы неудачного обучения и пауза перед первым повтором (далее удваивается)
+TRAINING_MAX_RETRIES = int(os.getenv('TRAINING_MAX_RETRIES', '2'))
+TRAINING_RETRY_BACKOFF_SECONDS = float(os.getenv('TRAINING_RETRY_BACKOFF_SECONDS', '5'))
+
+# Журнал запусков (по умолчанию - training_runs.jsonl в каталоге моделей)
+TRAINING_RUN_LOG = os.getenv('TRAINING_RUN_LOG')
+
+# Минимум точек для обучения (как в ProphetForecaster.train_model)
+MIN_TRAINING_POINTS = 48
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+
+# Библиотеки линейной алгебры в процессе обучения работают в один поток
+_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# Состояние процесса пула: фабрика сессий и прогнозировщик
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(database_url: str, model_storage_path: str, enable_optimization: bool) -> None:
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = '1'
+    from prophet_forecaster import ProphetForecaster
+
+    engine = create_engine(database_url, poolclass=NullPool)
+    _worker['session_factory'] = sessionmaker(bind=engine, autoflush=False)
+    forecaster = ProphetForecaster(model_storage_path, enable_optimization)
+    forecaster.cv_parallel = None
+    _worker['forecaster'] = forecaster
+
+
+def _train_pair(vm: str, metric: str, optimize: Optional[bool], max_retries: int,
+                backoff_seconds: float) -> Dict[str, Any]:
+    """Обучение одной пары в процессе пула с повторами"""
+    from dbcrud import DBCRUD
+
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    attempts = 0
+    error = None
+    while True:
+        attempts += 1
+        db = _worker['session_factory']()
+        try:
+            model = _worker['forecaster'].train_or_load_model(
+                db, DBCRUD(db), vm, metric, retrain=True, optimize=optimize
+            )
+            if model is not None:
+                error = None
+                break
+            error = 'Failed to train model'
+        except Exception as e:
+            error = str(e)
+        finally:
+            db.close()
+        if attempts > max_retries:
+            break
+        time.sleep(backoff_seconds * 2 ** (attempts - 1))
+
+    return {
+        'vm': vm,
+        'metric': metric,
+        'status': STATUS_FAILED if error else STATUS_SUCCESS,
+        'attempts': attempts,
+        'started_at': started_at.isoformat(),
+        'duration_seconds': round(time.perf_counter() - start, 3),
+        'message': error or 'Model trained successfully',
+    }
+
+
+class FleetTrainingScheduler:
+    """Планирование и параллельное обучение моделей для набора рядов"""
+
+    def __init__(
+            self,
+            forecaster,
+            database_url: Optional[str] = None,
+            max_cpus: int = TRAINING_MAX_CPUS,
+            max_retries: int = TRAINING_MAX_RETRIES,
+            backoff_seconds: float = TRAINING_RETRY_BACKOFF_SECONDS,
+            run_log_path: Optional[str] = TRAINING_RUN_LOG
+    ):
+        if database_url is None:
+            from connection import DATABASE_URL
+            database_url = DATABASE_URL
+        self.forecaster = forecaster
+        self.database_url = database_url
+        self.max_cpus = max(1, max_cpus)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.run_log_path = run_log_path or os.path.join(forecaster.model_storage_path, 'training_runs.jsonl')
+
+    def plan(self, db: Session, pairs: Optional[List[Tuple[str, str]]] = None,
+             force: bool = False) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Порядок обучения по справочнику рядов и времени обучения моделей
+
+        Args:
+            db: Сессия БД
+            pairs: Пары (vm, metric) (None - все ряды справочника)
+            force: Обучать и пары, по которым нет новых фактов
+
+        Returns:
+            (пары к обучению в порядке обучения, пропущенные пары с причиной)
+        """
+        catalog = db_models.ServerMetricsSeries
+        query = db.query(catalog.vm, catalog.metric, catalog.point_count, catalog.last_ts)
+        if pairs is not None:
+            pairs = list(dict.fromkeys(pairs))
+            if not pairs:
+                return [], []
+            query = query.filter(tuple_(catalog.vm, catalog.metric).in_(pairs))
+        series = {(row.vm, row.metric): row for row in query}
+        trained = ModelRegistryCRUD(db).get_latest_trained_at(pairs)
+
+        planned, skipped = [], []
+        for vm, metric in (pairs if pairs is not None else sorted(series)):
+            row = series.get((vm, metric))
+            trained_at = trained.get((vm, metric))
+            item = {
+                'vm': vm,
+                'metric': metric,
+                'point_count': row.point_count if row else 0,
+                'trained_at': trained_at,
+            }
+            last_ts = row.last_ts if row else None
+            if last_ts is not None and last_ts.tzinfo is None:
+                last_ts = last_ts.replace(tzinfo=timezone.utc)
+
+            if item['point_count'] < MIN_TRAINING_POINTS:
+                skipped.append({**item, 'message': 'Insufficient data'})
+            elif not force and trained_at and last_ts and last_ts <= trained_at:
+                skipped.append({**item, 'message': 'No new data since last training'})
+            else:
+                planned.append(item)
+
+        # Сначала без модели, затем самые старые модели; при равенстве - больше данных
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        planned.sort(key=lambda item: (item['trained_at'] or oldest, -item['point_count']))
+        return planned, skipped
+
+    def run(self, db: Session, pairs: Optional[List[Tuple[str, str]]] = None,
+            optimize: Optional[bool] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Обучение моделей в пуле процессов
+
+        Args:
+            db: Сессия БД (только для планирования)
+            pairs: Пары (vm, metric) (None - все ряды справочника)
+            optimize: Подбор гиперпараметров (None - настройка прогнозировщика)
+            force: Обучать и пары, по которым нет новых фактов
+
+        Returns:
+            Словарь: run_id, total, successful, failed, skipped, duration_seconds, details
+        """
+        run_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        planned, skipped = self.plan(db, pairs, force)
+        results = {
+            'run_id': run_id,
+            'total': len(planned) + len(skipped),
+            'successful': 0,
+            'failed': 0,
+            'skipped': len(skipped),
+            'details': [],
+        }
+        for item in skipped:
+            self._record(results, run_id, {
+                'vm': item['vm'], 'metric': item['metric'], 'status': STATUS_SKIPPED,
+                'attempts': 0, 'duration_seconds': 0.0, 'message': item['message'],
+            })
+
+        if planned:
+            workers = min(self.max_cpus, len(planned))
+            logger.info(f"Training run {run_id}: {len(planned)} series on {workers} processes, "
+                        f"{len(skipped)} skipped")
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.database_url, self.forecaster.model_storage_path,
+                              self.forecaster.enable_optimization)
+            ) as executor:
+                futures = {
+                    executor.submit(_train_pair, item['vm'], item['metric'], optimize,
+                                    self.max_retries, self.backoff_seconds): item
+                    for item in planned
+                }
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        detail = future.result()
+                    except Exception as e:
+                        # Процесс пула завершился аварийно
+                        detail = {
+                            'vm': item['vm'], 'metric': item['metric'], 'status': STATUS_FAILED,
+                            'attempts': 1, 'duration_seconds': 0.0, 'message': str(e),
+                        }
+                    self._record(results, run_id, detail)
+
+        results['duration_seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(f"Training run {run_id} completed: {results['successful']} successful, "
+                    f"{results['failed']} failed, {results['skipped']} skipped "
+                    f"in {results['duration_seconds']}s")
+        return results
+
+    def _record(self, results: Dict[str, Any], run_id: str, detail: Dict[str, Any]) -> None:
+        if detail['status'] == STATUS_SUCCESS:
+            results['successful'] += 1
+        elif detail['status'] == STATUS_FAILED:
+            results['failed'] += 1
+            logger.error(f"Error training model for {detail['vm']} - {detail['metric']}: {detail['message']}")
+        results['details'].append(detail)
+
+        entry = {'run_id': run_id, 'logged_at': datetime.now(timezone.utc).isoformat(), **detail}
+        try:
+            with open(self.run_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+        except OSError as e:
+            logger.warning(f"Failed to write training run log: {e}")
@@ -16,7 +16,8 @@ sys.path.append(parent_dir)
 
 # Импортируем модули для загрузки данных из базы
 try:
-    from utils.data_loader import load_data_from_database, generate_server_data
+    from utils.data_loader import (load_data_from_database, generate_server_data, downsample_series,
+                                   load_hour_of_day_profile)
 except ImportError:
     # Fallback для прямого импорта
     import importlib.util
@@ -28,6 +29,8 @@ except ImportError:
         spec.loader.exec_module(data_loader)
         load_data_from_database = data_loader.load_data_from_database
         generate_server_data = data_loader.generate_server_data
+        downsample_series = data_loader.downsample_series
+        load_hour_of_day_profile = data_loader.load_hour_of_day_profile
     else:
         data_generator_path = os.path.join(parent_dir, 'utils', 'data_generator.py')
         spec = importlib.util.spec_from_file_location("data_generator", data_generator_path)
@@ -35,6 +38,8 @@ except ImportError:
         spec.loader.exec_module(data_generator)
         generate_server_data = data_generator.generate_server_data
         load_data_from_database = None
+        downsample_series = None
+        load_hour_of_day_profile = None
 
 
 @st.cache_data(ttl=300)
@@ -244,6 +249,7 @@ def show():
                 0, 100, (0, 100),
                 key="load_range"
             )
+            load_filter_active = (min_load, max_load) != (0, 100)
 
             # Кнопка обновления
             refresh_btn = st.button(
@@ -320,12 +326,19 @@ def show():
                 analysis_df['hour'] = pd.to_datetime(analysis_df['timestamp']).dt.hour
                 analysis_df['date'] = pd.to_datetime(analysis_df['timestamp']).dt.date
 
-                heatmap_data = analysis_df.pivot_table(
-                    values='load_percentage',
-                    index='server',
-                    columns='hour',
-                    aggfunc='mean'
-                )
+                # Без фильтра по нагрузке профиль по часам берётся из часовых агрегатов
+                heatmap_data = pd.DataFrame()
+                if load_hour_of_day_profile is not None and not load_filter_active:
+                    heatmap_data = load_hour_of_day_profile(
+                        sorted(analysis_df['server'].unique()), start_date=start_date, end_date=end_date
+                    )
+                if heatmap_data.empty:
+                    heatmap_data = analysis_df.pivot_table(
+                        values='load_percentage',
+                        index='server',
+                        columns='hour',
+                        aggfunc='mean'
+                    )
 
                 if not heatmap_data.empty:
                     fig_heatmap = go.Figure(data=go.Heatmap(
@@ -431,9 +444,12 @@ def show():
 
                 for server in plot_df['server'].unique():
                     server_data = plot_df[plot_df['server'] == server].sort_values('timestamp')
+                    x, y = pd.to_datetime(server_data['timestamp']), server_data[selected_metric]
+                    if downsample_series is not None:
+                        x, y = downsample_series(x, y)
                     fig_lines.add_trace(go.Scatter(
-                        x=pd.to_datetime(server_data['timestamp']),
-                        y=server_data[selected_metric],
+                        x=x,
+                        y=y,
                         mode='lines',
                         name=server,
                         line=dict(width=2),
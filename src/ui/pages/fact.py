@@ -12,7 +12,7 @@ sys.path.append(parent_dir)
 
 # Импортируем модули для загрузки данных из базы
 try:
-    from utils.data_loader import load_data_from_database, generate_server_data
+    from utils.data_loader import load_data_from_database, generate_server_data, downsample_series
     from utils.alert_rules import alert_system, ServerStatus, AlertSeverity
 except ImportError:
     # Fallback для прямого импорта
@@ -26,6 +26,7 @@ except ImportError:
         spec.loader.exec_module(data_loader)
         load_data_from_database = data_loader.load_data_from_database
         generate_server_data = data_loader.generate_server_data
+        downsample_series = data_loader.downsample_series
     else:
         # Fallback на data_generator если data_loader не найден
         data_generator_path = os.path.join(parent_dir, 'utils', 'data_generator.py')
@@ -34,6 +35,7 @@ except ImportError:
         spec.loader.exec_module(data_generator)
         generate_server_data = data_generator.generate_server_data
         load_data_from_database = None
+        downsample_series = None
 
     # Импортируем alert_rules
     alert_rules_path = os.path.join(parent_dir, 'utils', 'alert_rules.py')
@@ -45,6 +47,23 @@ except ImportError:
     AlertSeverity = alert_rules.AlertSeverity
 
 
+def plot_xy(df: pd.DataFrame, column: str) -> dict:
+    """
+    Точки линии графика, прореженные методом LTTB
+
+    Args:
+        df: DataFrame с колонкой timestamp
+        column: Колонка со значениями
+
+    Returns:
+        Словарь x/y для go.Scatter
+    """
+    if downsample_series is None:
+        return dict(x=df['timestamp'], y=df[column])
+    x, y = downsample_series(df['timestamp'], df[column])
+    return dict(x=x, y=y)
+
+
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_data_from_db(start_date: datetime = None, end_date: datetime = None, vm: str = None):
     """
@@ -522,8 +541,7 @@ def show():
                 # Нагрузка
                 if 'load_percentage' in filtered_df.columns:
                     fig1.add_trace(go.Scatter(
-                        x=filtered_df['timestamp'],
-                        y=filtered_df['load_percentage'],
+                        **plot_xy(filtered_df, 'load_percentage'),
                         mode='lines',
                         name='Нагрузка',
                         line=dict(color='#1E88E5', width=3)
@@ -533,8 +551,7 @@ def show():
                 cpu_col = 'cpu.usage.average' if 'cpu.usage.average' in filtered_df.columns else None
                 if cpu_col and cpu_col in filtered_df.columns:
                     fig1.add_trace(go.Scatter(
-                        x=filtered_df['timestamp'],
-                        y=filtered_df[cpu_col],
+                        **plot_xy(filtered_df, cpu_col),
                         mode='lines',
                         name='CPU',
                         line=dict(color='#FF5722', width=3)
@@ -556,8 +573,7 @@ def show():
                 mem_col = 'mem.usage.average' if 'mem.usage.average' in filtered_df.columns else 'memory.usage.average'
                 if mem_col in filtered_df.columns:
                     fig2.add_trace(go.Scatter(
-                        x=filtered_df['timestamp'],
-                        y=filtered_df[mem_col],
+                        **plot_xy(filtered_df, mem_col),
                         mode='lines',
                         name='Память',
                         line=dict(color='#4CAF50', width=3)
@@ -567,8 +583,7 @@ def show():
                 disk_col = 'disk.usage.average' if 'disk.usage.average' in filtered_df.columns else None
                 if disk_col and disk_col in filtered_df.columns:
                     fig2.add_trace(go.Scatter(
-                        x=filtered_df['timestamp'],
-                        y=filtered_df[disk_col],
+                        **plot_xy(filtered_df, disk_col),
                         mode='lines',
                         name='Диск',
                         line=dict(color='#9C27B0', width=3)
@@ -591,8 +606,7 @@ def show():
                     net_col = 'net.usage.average' if 'net.usage.average' in filtered_df.columns else None
                     if net_col and net_col in filtered_df.columns:
                         fig3.add_trace(go.Scatter(
-                            x=filtered_df['timestamp'],
-                            y=filtered_df[net_col],
+                            **plot_xy(filtered_df, net_col),
                             mode='lines',
                             name='Сеть',
                             line=dict(color='#00BCD4', width=3)
@@ -618,8 +632,7 @@ def show():
 
                     if latency_col:
                         fig4.add_trace(go.Scatter(
-                            x=filtered_df['timestamp'],
-                            y=filtered_df[latency_col],
+                            **plot_xy(filtered_df, latency_col),
                             mode='lines',
                             name='Задержка',
                             line=dict(color='#FF9800', width=3)
@@ -629,8 +642,7 @@ def show():
                         ready_col = 'cpu.ready.summation' if 'cpu.ready.summation' in filtered_df.columns else None
                         if ready_col:
                             fig4.add_trace(go.Scatter(
-                                x=filtered_df['timestamp'],
-                                y=filtered_df[ready_col],
+                                **plot_xy(filtered_df, ready_col),
                                 mode='lines',
                                 name='CPU Ready',
                                 line=dict(color='#FF9800', width=3)
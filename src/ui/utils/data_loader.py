@@ -17,11 +17,17 @@ try:
     from connection import SessionLocal
     from facts_crud import FactsCRUD
     from dbcrud import DBCRUD
+    from downsampling import lttb_indices
+    from rollup_crud import RollupCRUD
     import models as db_models
 except ImportError as e:
     print(f"Warning: Could not import database modules: {e}")
     print("Falling back to mock data generation")
     SessionLocal = None
+    lttb_indices = None
+
+# Maximum number of points per chart line
+MAX_PLOT_POINTS = 1000
 
 
 def get_db_session():
@@ -76,45 +82,12 @@ def load_server_data_from_db(
         # Calculate start date
         start_date = datetime.now() - timedelta(hours=hours)
         
-        # Collect all data
-        all_data = []
-        
-        for vm in vms:
-            for metric in metrics:
-                try:
-                    # Get metrics for this VM and metric
-                    records = crud_facts.get_metrics_fact(
-                        vm=vm,
-                        metric=metric,
-                        start_date=start_date,
-                        limit=10000  # Limit to prevent memory issues
-                    )
-                    
-                    for record in records:
-                        all_data.append({
-                            'vm': vm,
-                            'timestamp': record.timestamp,
-                            'metric': metric,
-                            'value': float(record.value) if record.value else 0.0
-                        })
-                except Exception as e:
-                    print(f"Error loading data for {vm}/{metric}: {e}")
-                    continue
-        
-        if not all_data:
+        # One query for all (vm, metric) pairs, returned already in wide format
+        df_pivot = crud_facts.get_metrics_frame(vms, metrics, start_date=start_date)
+
+        if df_pivot.empty:
             return pd.DataFrame()
         
-        # Convert to DataFrame
-        df = pd.DataFrame(all_data)
-        
-        # Pivot to wide format (one column per metric)
-        df_pivot = df.pivot_table(
-            index=['vm', 'timestamp'],
-            columns='metric',
-            values='value',
-            aggfunc='mean'  # In case of duplicates
-        ).reset_index()
-        
         # Rename vm to server for compatibility
         df_pivot = df_pivot.rename(columns={'vm': 'server'})
         
@@ -189,6 +162,64 @@ def load_server_data_from_db(
             db.close()
 
 
+def downsample_series(timestamps: pd.Series, values: pd.Series, points: int = MAX_PLOT_POINTS):
+    """
+    Downsample a series for plotting with Largest-Triangle-Three-Buckets
+
+    Args:
+        timestamps: Point timestamps
+        values: Point values
+        points: Maximum number of points to keep
+
+    Returns:
+        Tuple (timestamps, values) with at most `points` points
+    """
+    valid = values.notna() & timestamps.notna()
+    timestamps, values = timestamps[valid], values[valid]
+    if lttb_indices is None or len(values) <= points:
+        return timestamps, values
+
+    order = pd.to_datetime(timestamps).argsort(kind='stable')
+    timestamps, values = timestamps.iloc[order], values.iloc[order]
+    x = pd.to_datetime(timestamps).astype('int64').to_numpy() / 1e9
+    indices = lttb_indices(x, values.to_numpy(dtype=float), points)
+    return timestamps.iloc[indices], values.iloc[indices]
+
+
+def load_hour_of_day_profile(
+    servers: List[str],
+    metric: str = 'cpu.usage.average',
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Load average metric value by server and hour of day from hourly rollups
+
+    Args:
+        servers: Server (VM) names
+        metric: Metric name
+        start_date: Optional start date
+        end_date: Optional end date
+
+    Returns:
+        DataFrame indexed by server with one column per hour of day (empty if unavailable)
+    """
+    db = get_db_session()
+    if db is None or not servers:
+        return pd.DataFrame()
+
+    try:
+        profile = RollupCRUD(db).get_hour_of_day_profile(servers, metric, start_date, end_date)
+        if profile.empty:
+            return pd.DataFrame()
+        return profile.pivot(index='vm', columns='hour', values='avg').rename_axis(index='server')
+    except Exception as e:
+        print(f"Error loading hour-of-day profile from database: {e}")
+        return pd.DataFrame()
+    finally:
+        db.close()
+
+
 def generate_server_data() -> pd.DataFrame:
     """
     Main function to load server data from database.
@@ -303,42 +334,12 @@ def load_data_from_database(
             crud_db = DBCRUD(db)
             metrics = crud_db.get_metrics_for_vm(vms[0]) if vms else ['cpu.usage.average']
         
-        all_data = []
-        
-        for vm in vms:
-            for metric in metrics:
-                try:
-                    records = crud_facts.get_metrics_fact(
-                        vm=vm,
-                        metric=metric,
-                        start_date=start_date,
-                        end_date=end_date,
-                        limit=10000
-                    )
-                    
-                    for record in records:
-                        all_data.append({
-                            'vm': vm,
-                            'timestamp': record.timestamp,
-                            'metric': metric,
-                            'value': float(record.value) if record.value else 0.0
-                        })
-                except Exception as e:
-                    print(f"Error loading {vm}/{metric}: {e}")
-                    continue
-        
-        if not all_data:
+        # One query for all (vm, metric) pairs, returned already in wide format
+        df_pivot = crud_facts.get_metrics_frame(vms, metrics, start_date=start_date, end_date=end_date)
+
+        if df_pivot.empty:
             return pd.DataFrame()
         
-        # Convert to DataFrame and pivot
-        df = pd.DataFrame(all_data)
-        df_pivot = df.pivot_table(
-            index=['vm', 'timestamp'],
-            columns='metric',
-            values='value',
-            aggfunc='mean'
-        ).reset_index()
-        
         df_pivot = df_pivot.rename(columns={'vm': 'server'})
         
         # Add load_percentage
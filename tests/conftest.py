@@ -3,9 +3,11 @@ Pytest configuration and fixtures
 """
 import pytest
 import os
+import tempfile
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 from datetime import datetime, timedelta
 import sys
 from pathlib import Path
@@ -16,19 +18,24 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "app"))
 from connection import Base, get_db
 import models as db_models
 import schemas as pydantic_models
+from rollup_crud import RollupCRUD
 
 
-# Test database URL (SQLite in-memory for testing)
-TEST_DATABASE_URL = "sqlite:///:memory:"
+# Test database (SQLite file, shared by the sync session and the async API session)
+TEST_DATABASE_PATH = os.path.join(tempfile.gettempdir(), f"server_metrics_test_{os.getpid()}.db")
+TEST_DATABASE_URL = f"sqlite:///{TEST_DATABASE_PATH}"
+TEST_ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{TEST_DATABASE_PATH}"
 
-# Create test engine
+# Create test engines
 test_engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=NullPool,
 )
+test_async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
 
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+TestAsyncSessionLocal = async_sessionmaker(test_async_engine, autoflush=False, expire_on_commit=False)
 
 
 @pytest.fixture(scope="function")
@@ -64,6 +71,23 @@ def override_get_db(db_session):
     return _get_db
 
 
+@pytest.fixture
+def async_session_local():
+    """Async session factory bound to the test database"""
+    return TestAsyncSessionLocal
+
+
+@pytest.fixture
+def override_get_async_db(db_session):
+    """
+    Override the get_async_db dependency to use test database
+    """
+    async def _get_async_db():
+        async with TestAsyncSessionLocal() as session:
+            yield session
+    return _get_async_db
+
+
 @pytest.fixture
 def sample_vm():
     """Sample VM name for testing"""
@@ -140,6 +164,9 @@ def sample_metrics_data(db_session, sample_vm, sample_metric):
         metrics.append(metric)
     
     db_session.commit()
+
+    # Rows added directly bypass the ingest path, so rollups are rebuilt by the refresh job
+    RollupCRUD(db_session).refresh_range(base_time, base_time + timedelta(hours=5))
     
     # Refresh all metrics
     for metric in metrics:
@@ -1,18 +1,24 @@
 """
 Integration tests for API endpoints
 """
+import json
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
 from main import app
 from connection import get_db
+from async_connection import get_async_db
+from dbcrud import clear_completeness_cache
+import retention
 import models as db_models
 
 
 @pytest.fixture
-def client(db_session, override_get_db):
-    """Create test client with overridden database dependency"""
+def client(db_session, override_get_db, override_get_async_db):
+    """Create test client with overridden database dependencies"""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
@@ -52,11 +58,32 @@ class TestDatabaseEndpoints:
         assert "last_timestamp" in data
         assert "total_records" in data
     
+    def test_get_data_time_ranges(self, client, sample_metrics_data):
+        """Test getting time ranges for many series"""
+        response = client.post("/api/v1/time-ranges", json=[
+            {"vm": "test-vm-01", "metric": "cpu.usage.average"},
+            {"vm": "non-existent", "metric": "metric"}
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["vm"] == "test-vm-01"
+        assert data[0]["total_records"] == 10
+    
     def test_get_data_time_range_not_found(self, client):
         """Test getting time range for non-existent data"""
         response = client.get("/api/v1/vms/non-existent/metrics/metric/time-range")
         assert response.status_code == 404
     
+    def test_get_pool_metrics(self, client):
+        """Test connection pool metrics"""
+        response = client.get("/api/v1/metrics/pool")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"async", "sync", "replicas"}
+        assert "checked_out" in data["sync"]
+        assert "wait_seconds_total" in data["async"]
+    
     def test_get_database_stats(self, client, sample_metrics_data, sample_predictions_data):
         """Test getting database statistics"""
         response = client.get("/api/v1/stats")
@@ -67,8 +94,10 @@ class TestDatabaseEndpoints:
         assert data["fact_records"] == 10
         assert data["prediction_records"] == 5
     
-    def test_cleanup_old_data(self, client, db_session, sample_metrics_data):
+    def test_cleanup_old_data(self, client, db_session, sample_metrics_data, monkeypatch):
         """Test cleaning up old data"""
+        # The background job opens its own session
+        monkeypatch.setattr(retention, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
         # Add old data
         old_metric = db_models.ServerMetricsFact(
             vm="test-vm-01",
@@ -79,10 +108,18 @@ class TestDatabaseEndpoints:
         db_session.add(old_metric)
         db_session.commit()
         
+        retention.clear_jobs()
         response = client.post("/api/v1/cleanup", json={"days_to_keep": 90})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        
+        response = client.get(f"/api/v1/cleanup/jobs/{job_id}")
         assert response.status_code == 200
         data = response.json()
-        assert "fact_records_deleted" in data
+        assert data["status"] == "completed"
+        assert data["fact_records_deleted"] == 1
+        assert client.get("/api/v1/cleanup/jobs/unknown").status_code == 404
+        retention.clear_jobs()
     
     def test_get_data_completeness(self, client, sample_metrics_data):
         """Test getting data completeness"""
@@ -102,6 +139,28 @@ class TestDatabaseEndpoints:
         assert "completeness_percentage" in data
         assert 0 <= data["completeness_percentage"] <= 100
     
+    def test_get_completeness_report(self, client, sample_metrics_data):
+        """Test getting fleet-wide completeness report as JSON and CSV"""
+        clear_completeness_cache()
+        params = {
+            "start_date": datetime(2025, 1, 27, 0, 0, 0).isoformat(),
+            "end_date": datetime(2025, 1, 27, 4, 30, 0).isoformat(),
+            "expected_interval_minutes": 30
+        }
+        response = client.get("/api/v1/completeness/report", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["vm"] == "test-vm-01"
+        assert data[0]["completeness_percentage"] == 100
+        
+        response = client.get("/api/v1/completeness/report", params={**params, "format": "csv"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.splitlines()
+        assert lines[0].startswith("vm,metric,expected_points")
+        assert lines[1].startswith("test-vm-01,cpu.usage.average,10,10,")
+    
     def test_get_missing_data(self, client, sample_metrics_data):
         """Test getting missing data"""
         start_date = datetime(2025, 1, 27, 0, 0, 0)
@@ -118,6 +177,19 @@ class TestDatabaseEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert isinstance(data, list)
+    
+    def test_get_missing_data_all(self, client, sample_metrics_data):
+        """Test getting missing data for all series"""
+        response = client.get(
+            "/api/v1/missing-data",
+            params={
+                "start_date": datetime(2025, 1, 27, 0, 0, 0).isoformat(),
+                "end_date": datetime(2025, 1, 27, 6, 0, 0).isoformat(),
+                "expected_interval_minutes": 30
+            }
+        )
+        assert response.status_code == 200
+        assert response.json() == []
 
 
 class TestFactsEndpoints:
@@ -180,6 +252,41 @@ class TestFactsEndpoints:
         assert len(data) == 10
         assert all(m["vm"] == "test-vm-01" for m in data)
     
+    def test_get_metrics_fact_cursor_pages(self, client, sample_metrics_data):
+        """Test following X-Next-Cursor until the last page"""
+        params = {"vm": "test-vm-01", "metric": "cpu.usage.average", "limit": 4}
+        records = []
+        while True:
+            response = client.get("/api/v1/facts", params=params)
+            assert response.status_code == 200
+            records += response.json()
+            if "x-next-cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["x-next-cursor"]
+        
+        assert len(records) == 10
+        assert len({m["id"] for m in records}) == 10
+    
+    def test_get_metrics_fact_invalid_cursor(self, client, sample_metrics_data):
+        """Test that a damaged cursor is rejected"""
+        response = client.get(
+            "/api/v1/facts",
+            params={"vm": "test-vm-01", "metric": "cpu.usage.average", "cursor": "not-a-cursor"}
+        )
+        assert response.status_code == 400
+    
+    def test_get_metrics_fact_ndjson(self, client, sample_metrics_data):
+        """Test streaming all records as NDJSON"""
+        response = client.get(
+            "/api/v1/facts",
+            params={"vm": "test-vm-01", "metric": "cpu.usage.average", "limit": 1, "format": "ndjson"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 10
+        assert [m["value"] for m in records] == [40.0 + i * 2.0 for i in range(10)]
+    
     def test_get_metrics_fact_with_dates(self, client, sample_metrics_data):
         """Test getting metrics with date filters"""
         start_date = datetime(2025, 1, 27, 0, 0, 0)
@@ -279,6 +386,23 @@ class TestPredictionsEndpoints:
         data = response.json()
         assert len(data) == 5
     
+    def test_get_predictions_pages_and_ndjson(self, client, sample_predictions_data):
+        """Test predictions limit with X-Next-Cursor and NDJSON streaming"""
+        params = {"vm": "test-vm-01", "metric": "cpu.usage.average"}
+        response = client.get("/api/v1/predictions", params={**params, "limit": 3})
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+        
+        response = client.get(
+            "/api/v1/predictions", params={**params, "cursor": response.headers["x-next-cursor"]}
+        )
+        assert [p["value_predicted"] for p in response.json()] == [53.0, 54.0]
+        assert "x-next-cursor" not in response.headers
+        
+        response = client.get("/api/v1/predictions", params={**params, "format": "ndjson"})
+        assert response.status_code == 200
+        assert len(response.text.splitlines()) == 5
+    
     def test_get_future_predictions(self, client, sample_predictions_data):
         """Test getting future predictions"""
         response = client.get(
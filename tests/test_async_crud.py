@@ -0,0 +1,52 @@
+"""
+Unit tests for async CRUD wrappers
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from async_crud import AsyncDBCRUD, AsyncFactsCRUD, AsyncPredsCRUD
+from dbcrud import DBCRUD
+
+
+@pytest.fixture
+def run_async(db_session, async_session_local):
+    """Run a coroutine factory against a fresh async session"""
+    def _run(call):
+        async def _with_session():
+            async with async_session_local() as session:
+                return await call(session)
+        return asyncio.run(_with_session())
+    return _run
+
+
+class TestAsyncCRUD:
+    """Test suite for AsyncDBCRUD, AsyncFactsCRUD and AsyncPredsCRUD"""
+
+    def test_get_all_vms(self, run_async, sample_metrics_data, sample_vm):
+        """Test reading VMs through the async session"""
+        assert run_async(lambda session: AsyncDBCRUD(session).get_all_vms()) == [sample_vm]
+
+    def test_get_metrics_fact(self, run_async, sample_metrics_data, sample_vm, sample_metric):
+        """Test reading a series through the async session"""
+        records = run_async(lambda session: AsyncFactsCRUD(session).get_metrics_fact(sample_vm, sample_metric))
+
+        assert len(records) == 10
+        assert float(records[0].value) == 40.0
+
+    def test_upsert_is_visible_to_sync_session(self, run_async, db_session, sample_vm, sample_metric):
+        """Test that rows written through the async session are committed"""
+        timestamp = datetime(2025, 1, 27, 12, 0, 0)
+        rows = [{'vm': sample_vm, 'timestamp': timestamp, 'metric': sample_metric, 'value': 10.0}]
+
+        result = run_async(lambda session: AsyncFactsCRUD(session).upsert_metrics_fact_batch(rows))
+
+        assert result['inserted'] == 1
+        assert len(DBCRUD(db_session).get_historical_metrics(sample_vm, sample_metric)) == 1
+
+    def test_get_predictions(self, run_async, sample_predictions_data, sample_vm, sample_metric):
+        """Test reading predictions through the async session"""
+        predictions = run_async(lambda session: AsyncPredsCRUD(session).get_predictions(
+            sample_vm, sample_metric, end_date=datetime(2025, 1, 28) + timedelta(hours=1)
+        ))
+
+        assert len(predictions) == 3
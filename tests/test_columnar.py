@@ -0,0 +1,62 @@
+"""
+Unit tests for columnar response helpers
+"""
+import json
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+import columnar
+from columnar import (
+    ARROW_STREAM_MEDIA_TYPE, FORMAT_ARROW, FORMAT_COLUMNAR, FORMAT_ROWS,
+    columnar_response, negotiate_format
+)
+
+
+class TestColumnar:
+    """Test suite for columnar response format"""
+
+    def test_negotiate_format(self):
+        """Test format selection from query parameter and Accept header"""
+        assert negotiate_format(None) == FORMAT_ROWS
+        assert negotiate_format("application/json") == FORMAT_ROWS
+        assert negotiate_format(ARROW_STREAM_MEDIA_TYPE) == FORMAT_ARROW
+        assert negotiate_format("application/json", "columnar") == FORMAT_COLUMNAR
+        assert negotiate_format(ARROW_STREAM_MEDIA_TYPE, "columnar") == FORMAT_ARROW
+        assert negotiate_format(ARROW_STREAM_MEDIA_TYPE, "json") == FORMAT_ROWS
+        assert negotiate_format(None, "xml") is None
+
+    def test_columnar_json_response(self):
+        """Test JSON response with parallel arrays"""
+        columns = {
+            'timestamp': [datetime(2025, 1, 27, 0, 0), datetime(2025, 1, 27, 0, 30)],
+            'value': [40.0, None],
+        }
+
+        response = columnar_response(columns, FORMAT_COLUMNAR, "test-vm-01", "cpu.usage.average")
+        body = json.loads(response.body)
+
+        assert body['count'] == 2
+        assert body['timestamp'] == ['2025-01-27T00:00:00', '2025-01-27T00:30:00']
+        assert body['value'] == [40.0, None]
+
+    def test_arrow_response(self):
+        """Test Arrow IPC stream response"""
+        pa = pytest.importorskip("pyarrow")
+        columns = {'timestamp': [datetime(2025, 1, 27, 0, 0)], 'value': [40.0]}
+
+        response = columnar_response(columns, FORMAT_ARROW, "test-vm-01", "cpu.usage.average")
+        table = pa.ipc.open_stream(response.body).read_all()
+
+        assert response.media_type == ARROW_STREAM_MEDIA_TYPE
+        assert table.column_names == ['timestamp', 'value']
+        assert table.column('value').to_pylist() == [40.0]
+        assert table.schema.metadata[b'vm'] == b'test-vm-01'
+
+    def test_arrow_response_without_pyarrow(self, monkeypatch):
+        """Test 406 when pyarrow is not installed"""
+        monkeypatch.setattr(columnar, 'pa', None)
+
+        with pytest.raises(HTTPException) as exc_info:
+            columnar_response({'timestamp': [], 'value': []}, FORMAT_ARROW, "vm", "metric")
+
+        assert exc_info.value.status_code == 406
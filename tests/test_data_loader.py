@@ -0,0 +1,63 @@
+"""
+Unit tests for the bulk data loader (utils/data_loader.py)
+"""
+import sys
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from dbcrud import DBCRUD
+import models as db_models
+from rollup_crud import ROLLUP_DAILY, ROLLUP_HOURLY, ROLLUP_MODELS
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "utils"))
+
+import data_loader
+
+
+def loader_frame():
+    return data_loader.prepare_data(pd.DataFrame({
+        'vm': ['vm-1', 'vm-1', 'vm-1', 'vm-2'],
+        'timestamp': ['2025-01-27 00:00:00', '2025-01-27 00:30:00', '2025-01-27 00:00:00', '2025-01-27 00:00:00'],
+        'metric': ['cpu', 'cpu', 'mem', 'cpu'],
+        'value': [10.0, 20.0, 30.0, 40.0],
+    }))
+
+
+class TestDataLoader:
+    """Test suite for writing prepared chunks to the facts table"""
+
+    def test_insert_data_updates_series_catalog(self, db_session):
+        """Test that series loaded through insert_data appear in the catalog lookups"""
+        assert data_loader.insert_data(loader_frame(), db_session) == 4
+
+        crud = DBCRUD(db_session)
+        assert crud.get_all_vms() == ['vm-1', 'vm-2']
+        assert crud.get_metrics_for_vm('vm-1') == ['cpu', 'mem']
+
+        series = db_session.query(db_models.ServerMetricsSeries).filter_by(vm='vm-1', metric='cpu').one()
+        assert series.point_count == 2
+        assert series.last_ts.replace(tzinfo=None) == datetime(2025, 1, 27, 0, 30)
+
+    def test_insert_data_refreshes_rollups(self, db_session):
+        """Test that loaded days are aggregated into hourly and daily rollups"""
+        data_loader.insert_data(loader_frame(), db_session)
+
+        hourly = db_session.query(ROLLUP_MODELS[ROLLUP_HOURLY]).filter_by(vm='vm-1', metric='cpu').one()
+        assert hourly.count == 2
+        assert float(hourly.max) == 20.0
+        daily = ROLLUP_MODELS[ROLLUP_DAILY]
+        rows = db_session.query(daily.vm, daily.metric, daily.count).order_by(daily.vm, daily.metric).all()
+        assert [tuple(row) for row in rows] == [('vm-1', 'cpu', 2), ('vm-1', 'mem', 1), ('vm-2', 'cpu', 1)]
+
+    def test_insert_data_upserts_existing_keys(self, db_session):
+        """Test that loading the same keys again updates values instead of duplicating rows"""
+        data_loader.insert_data(loader_frame(), db_session)
+        frame = loader_frame()
+        frame['value'] = frame['value'] + 1
+        data_loader.insert_data(frame, db_session)
+
+        facts = db_session.query(db_models.ServerMetricsFact).order_by(
+            db_models.ServerMetricsFact.vm, db_models.ServerMetricsFact.metric, db_models.ServerMetricsFact.timestamp
+        ).all()
+        assert [float(fact.value) for fact in facts] == [11.0, 21.0, 31.0, 41.0]
+        assert db_session.query(db_models.ServerMetricsSeries).filter_by(vm='vm-1', metric='cpu').one().point_count == 2
@@ -3,7 +3,8 @@ Unit tests for DBCRUD class
 """
 import pytest
 from datetime import datetime, timedelta
-from dbcrud import DBCRUD
+import dbcrud
+from dbcrud import DBCRUD, clear_completeness_cache
 import models as db_models
 
 
@@ -48,6 +49,23 @@ class TestDBCRUD:
         assert "total_records" in time_range
         assert time_range["total_records"] == 10
     
+    def test_get_data_time_ranges(self, db_session, sample_metrics_data, sample_vm, sample_metric):
+        """Test batch time ranges from the catalog and from facts missing in it"""
+        db_session.add(db_models.ServerMetricsFact(
+            vm="direct-vm", timestamp=datetime(2025, 1, 27, 0, 0, 0), metric=sample_metric, value=1.0
+        ))
+        db_session.commit()
+        crud = DBCRUD(db_session)
+
+        time_ranges = crud.get_data_time_ranges([
+            (sample_vm, sample_metric), ("direct-vm", sample_metric), ("non-existent", "metric")
+        ])
+
+        assert set(time_ranges) == {(sample_vm, sample_metric), ("direct-vm", sample_metric)}
+        assert time_ranges[(sample_vm, sample_metric)]["total_records"] == 10
+        assert time_ranges[("direct-vm", sample_metric)]["total_records"] == 1
+        assert time_ranges[("direct-vm", sample_metric)]["total_hours"] == 0
+    
     def test_get_data_time_range_not_found(self, db_session):
         """Test getting time range for non-existent data"""
         crud = DBCRUD(db_session)
@@ -122,6 +140,24 @@ class TestDBCRUD:
         assert stats["fact_records"] == 10
         assert stats["prediction_records"] == 5
         assert stats["unique_vms"] == 1
+        assert stats["estimated"] is False
+    
+    def test_series_catalog(self, db_session, sample_metrics_data, sample_vm, sample_metric):
+        """Test that ingest keeps the series catalog range and point count"""
+        series = db_session.query(db_models.ServerMetricsSeries).all()
+
+        assert [(row.vm, row.metric) for row in series] == [(sample_vm, sample_metric)]
+        assert series[0].first_ts == datetime(2025, 1, 27, 0, 0, 0)
+        assert series[0].last_ts == datetime(2025, 1, 27, 4, 30, 0)
+        assert series[0].point_count == 10
+    
+    def test_series_catalog_after_cleanup(self, db_session, sample_metrics_data):
+        """Test that cleanup drops series without remaining facts from the catalog"""
+        crud = DBCRUD(db_session)
+        crud.cleanup_old_data(days_to_keep=1)
+
+        assert crud.get_all_vms() == []
+        assert db_session.query(db_models.ServerMetricsSeries).count() == 0
     
     def test_cleanup_old_data(self, db_session, sample_metrics_data):
         """Test cleaning up old data"""
@@ -166,6 +202,49 @@ class TestDBCRUD:
         # Should detect some missing intervals if data is sparse
         assert isinstance(missing, list)
     
+    def test_detect_missing_data_beyond_5000_points(self, db_session, sample_vm, sample_metric):
+        """Test that gaps after the first 5000 points are found"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        timestamps = [base_time + timedelta(minutes=i) for i in range(6000)]
+        timestamps.append(timestamps[-1] + timedelta(minutes=10))
+        db_session.bulk_insert_mappings(db_models.ServerMetricsFact, [
+            {"vm": sample_vm, "timestamp": ts, "metric": sample_metric, "value": 1.0} for ts in timestamps
+        ])
+        db_session.commit()
+        crud = DBCRUD(db_session)
+        
+        missing = crud.detect_missing_data(
+            sample_vm, sample_metric, timestamps[0], timestamps[-1], expected_interval_minutes=1
+        )
+        
+        assert len(missing) == 1
+        assert missing[0]["gap_start"] == timestamps[-2]
+        assert missing[0]["gap_end"] == timestamps[-1]
+        assert missing[0]["missing_points"] == 9
+    
+    def test_detect_missing_data_all(self, db_session, sample_metrics_data, sample_metric):
+        """Test detecting missing data for all series in one pass"""
+        db_session.add_all([
+            db_models.ServerMetricsFact(
+                vm="test-vm-02", timestamp=datetime(2025, 1, 27, 0, 0, 0), metric=sample_metric, value=1.0
+            ),
+            db_models.ServerMetricsFact(
+                vm="test-vm-02", timestamp=datetime(2025, 1, 27, 3, 0, 0), metric=sample_metric, value=1.0
+            ),
+        ])
+        db_session.commit()
+        crud = DBCRUD(db_session)
+        
+        missing = crud.detect_missing_data_all(
+            datetime(2025, 1, 27, 0, 0, 0), datetime(2025, 1, 27, 6, 0, 0), expected_interval_minutes=30
+        )
+        
+        assert len(missing) == 1
+        assert missing[0]["vm"] == "test-vm-02"
+        assert missing[0]["metric"] == sample_metric
+        assert missing[0]["gap_duration_minutes"] == 180
+        assert missing[0]["missing_points"] == 5
+    
     def test_calculate_data_completeness(self, db_session, sample_metrics_data):
         """Test calculating data completeness"""
         crud = DBCRUD(db_session)
@@ -186,4 +265,65 @@ class TestDBCRUD:
         assert "completeness_percentage" in completeness
         assert 0 <= completeness["completeness_percentage"] <= 100
         assert completeness["actual_points"] == 10
+    
+    def test_get_completeness_report(self, db_session, sample_metrics_data, sample_metric):
+        """Test fleet-wide completeness report with points and gaps per series"""
+        clear_completeness_cache()
+        db_session.add_all([
+            db_models.ServerMetricsFact(
+                vm="test-vm-02", timestamp=datetime(2025, 1, 27, 0, 0, 0), metric=sample_metric, value=1.0
+            ),
+            db_models.ServerMetricsFact(
+                vm="test-vm-02", timestamp=datetime(2025, 1, 27, 3, 0, 0), metric=sample_metric, value=1.0
+            ),
+        ])
+        db_session.commit()
+        crud = DBCRUD(db_session)
+        
+        report = crud.get_completeness_report(
+            datetime(2025, 1, 27, 0, 0, 0), datetime(2025, 1, 27, 4, 30, 0), expected_interval_minutes=30
+        )
+        
+        assert [(row["vm"], row["metric"]) for row in report] == [
+            ("test-vm-01", sample_metric), ("test-vm-02", sample_metric)
+        ]
+        assert report[0]["expected_points"] == 10
+        assert report[0]["actual_points"] == 10
+        assert report[0]["completeness_percentage"] == 100
+        assert report[0]["gap_count"] == 0
+        assert report[1]["actual_points"] == 2
+        assert report[1]["missing_points"] == 8
+        assert report[1]["gap_count"] == 1
+    
+    def test_get_completeness_report_cached(self, db_session, sample_metrics_data):
+        """Test that the report is cached per window"""
+        clear_completeness_cache()
+        crud = DBCRUD(db_session)
+        start_date = datetime(2025, 1, 27, 0, 0, 0)
+        end_date = datetime(2025, 1, 27, 4, 30, 0)
+        
+        first = crud.get_completeness_report(start_date, end_date)
+        db_session.query(db_models.ServerMetricsFact).delete()
+        db_session.commit()
+        
+        assert crud.get_completeness_report(start_date, end_date) == first
+        assert crud.get_completeness_report(start_date, end_date + timedelta(minutes=30))[0]["actual_points"] == 0
+        clear_completeness_cache()
+    
+    def test_completeness_cache_is_bounded(self, db_session, sample_metrics_data, monkeypatch):
+        """Test that expired reports are evicted and the cache keeps at most the configured number of windows"""
+        clear_completeness_cache()
+        monkeypatch.setattr(dbcrud, "COMPLETENESS_CACHE_MAX_ENTRIES", 3)
+        crud = DBCRUD(db_session)
+        start_date = datetime(2025, 1, 27, 0, 0, 0)
+        
+        for minutes in range(5):
+            crud.get_completeness_report(start_date, start_date + timedelta(hours=4, minutes=minutes))
+        assert len(dbcrud._completeness_cache) == 3
+        
+        later = dbcrud.time.monotonic() + dbcrud.COMPLETENESS_CACHE_TTL_SECONDS + 1
+        monkeypatch.setattr(dbcrud.time, "monotonic", lambda: later)
+        crud.get_completeness_report(start_date, start_date + timedelta(hours=5))
+        assert len(dbcrud._completeness_cache) == 1
+        clear_completeness_cache()
 
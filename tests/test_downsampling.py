@@ -0,0 +1,77 @@
+"""
+Unit tests for series downsampling
+"""
+import numpy as np
+import pytest
+from datetime import datetime, timedelta, timezone
+from downsampling import lttb_indices, minmax_buckets, METHOD_MINMAX
+from facts_crud import FactsCRUD
+
+
+class TestDownsampling:
+    """Test suite for LTTB and min/max/avg bucketing"""
+
+    def test_lttb_keeps_endpoints_and_size(self):
+        """Test LTTB output size and first/last points"""
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50.0)
+
+        indices = lttb_indices(x, y, 100)
+
+        assert len(indices) == 100
+        assert indices[0] == 0
+        assert indices[-1] == 999
+        assert np.all(np.diff(indices) > 0)
+
+    def test_lttb_keeps_spike(self):
+        """Test that LTTB keeps an isolated peak"""
+        x = np.arange(500, dtype=float)
+        y = np.zeros(500)
+        y[250] = 100.0
+
+        indices = lttb_indices(x, y, 20)
+
+        assert 250 in indices
+
+    def test_lttb_short_series(self):
+        """Test that series shorter than the target are returned as is"""
+        x = np.arange(5, dtype=float)
+        assert lttb_indices(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+
+    def test_minmax_buckets(self):
+        """Test min/max/avg aggregation by time buckets"""
+        x = np.array([0.0, 10.0, 20.0, 30.0, 70.0])
+        y = np.array([1.0, 5.0, 3.0, 7.0, 2.0])
+
+        buckets = minmax_buckets(x, y, origin=0.0, width=25.0)
+
+        assert buckets['timestamp'].tolist() == [0.0, 25.0, 50.0]
+        assert buckets['value'].tolist() == [3.0, 7.0, 2.0]
+        assert buckets['min'].tolist() == [1.0, 7.0, 2.0]
+        assert buckets['max'].tolist() == [5.0, 7.0, 2.0]
+        assert buckets['count'].tolist() == [3, 1, 1]
+
+    def test_get_metrics_fact_downsampled(self, db_session, sample_vm, sample_metric):
+        """Test downsampled series from the database"""
+        crud = FactsCRUD(db_session)
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        crud.upsert_metrics_fact_batch([
+            {'vm': sample_vm, 'timestamp': base_time + timedelta(minutes=i * 30),
+             'metric': sample_metric, 'value': float(i % 48)}
+            for i in range(48 * 30)
+        ])
+
+        lttb = crud.get_metrics_fact_downsampled(sample_vm, sample_metric, points=100)
+        assert len(lttb['timestamp']) == 100
+        assert lttb['timestamp'][0] == base_time.replace(tzinfo=timezone.utc)
+
+        buckets = crud.get_metrics_fact_downsampled(sample_vm, sample_metric, points=30, method=METHOD_MINMAX)
+        assert len(buckets['timestamp']) <= 30
+        assert min(buckets['min']) == 0.0
+        assert max(buckets['max']) == 47.0
+
+    def test_get_metrics_fact_downsampled_unknown_method(self, db_session):
+        """Test unknown downsampling method"""
+        crud = FactsCRUD(db_session)
+        with pytest.raises(ValueError):
+            crud.get_metrics_fact_downsampled("vm", "metric", method="median")
@@ -0,0 +1,101 @@
+"""
+Unit tests for streaming fact ingestion
+"""
+import asyncio
+import pytest
+from datetime import datetime
+from fact_stream import FactStreamParser, detect_stream_format, FORMAT_CSV, FORMAT_NDJSON
+from facts_crud import FactsCRUD
+import models as db_models
+
+
+async def _byte_stream(payload: bytes, size: int):
+    for start in range(0, len(payload), size):
+        yield payload[start:start + size]
+
+
+def _collect(parser, payload: bytes, size: int = 7):
+    async def _run():
+        return [rows async for rows in parser.chunks(_byte_stream(payload, size))]
+    return asyncio.run(_run())
+
+
+class TestFactStream:
+    """Test suite for streaming fact ingestion"""
+
+    def test_detect_stream_format(self):
+        """Test format detection from Content-Type and explicit parameter"""
+        assert detect_stream_format("text/csv; charset=utf-8") == FORMAT_CSV
+        assert detect_stream_format("application/x-ndjson") == FORMAT_NDJSON
+        assert detect_stream_format("application/json", "csv") == FORMAT_CSV
+        assert detect_stream_format("application/json") is None
+        assert detect_stream_format("text/csv", "xml") is None
+
+    def test_parse_csv_stream(self):
+        """Test CSV parsing with header aliases, split chunks and invalid rows"""
+        payload = (
+            "vm_name,metric,timestamp,value\r\n"
+            "vm-01,cpu.usage.average,2025-01-27T00:00:00,10.5\r\n"
+            "vm-01,cpu.usage.average,27.01.25 00:30:00,11\r\n"
+            "vm-01,cpu.usage.average,not-a-date,12\r\n"
+            "vm-01,cpu.usage.average,2025-01-27T01:00:00,150\r\n"
+            ",cpu.usage.average,2025-01-27T01:30:00,13\r\n"
+            "vm-01,cpu.usage.average,2025-01-27T02:00:00,14\n"
+        ).encode()
+        parser = FactStreamParser(FORMAT_CSV, chunk_size=2)
+
+        chunks = _collect(parser, payload)
+        rows = [row for chunk in chunks for row in chunk]
+
+        assert parser.total == 6
+        assert parser.rejected == 3
+        assert rows[0] == ('vm-01', datetime(2025, 1, 27, 0, 0), 'cpu.usage.average', 10.5)
+        assert rows[1][1] == datetime(2025, 1, 27, 0, 30)
+        assert len(rows) == 3
+
+    def test_parse_csv_missing_columns(self):
+        """Test CSV header without required columns"""
+        parser = FactStreamParser(FORMAT_CSV)
+        with pytest.raises(ValueError):
+            _collect(parser, b"vm,metric,value\nvm-01,cpu,1\n")
+
+    def test_parse_ndjson_stream(self):
+        """Test NDJSON parsing with a multibyte character split between chunks"""
+        payload = (
+            '{"vm": "вм-01", "timestamp": "2025-01-27T00:00:00", "metric": "cpu", "value": 1.5}\n'
+            'not json\n'
+            '[1, 2]\n'
+            '{"vm": "вм-01", "timestamp": "2025-01-27T00:30:00", "metric": "cpu", "value": 2}'
+        ).encode()
+        parser = FactStreamParser(FORMAT_NDJSON)
+
+        rows = [row for chunk in _collect(parser, payload, size=3) for row in chunk]
+
+        assert parser.total == 4
+        assert parser.rejected == 2
+        assert [row[0] for row in rows] == ['вм-01', 'вм-01']
+
+    def test_staging_load(self, db_session, sample_vm, sample_metric):
+        """Test staging load and merge with duplicates across chunks"""
+        crud = FactsCRUD(db_session)
+        base_time = datetime(2025, 1, 27, 0, 0, 0)
+
+        crud.begin_facts_staging()
+        crud.copy_facts_to_staging([(sample_vm, base_time, sample_metric, 1.0)])
+        crud.copy_facts_to_staging([
+            (sample_vm, base_time, sample_metric, 2.0),
+            (sample_vm, datetime(2025, 1, 27, 0, 30, 0), sample_metric, 3.0),
+        ])
+        result = crud.merge_facts_staging()
+
+        assert result['staged'] == 3
+        assert result['inserted'] == 2
+        assert result['updated'] == 1
+        stored = db_session.query(db_models.ServerMetricsFact).filter_by(timestamp=base_time).one()
+        assert float(stored.value) == 2.0
+
+    def test_staging_requires_begin(self, db_session):
+        """Test that staging methods require begin_facts_staging()"""
+        crud = FactsCRUD(db_session)
+        with pytest.raises(RuntimeError):
+            crud.copy_facts_to_staging([])
@@ -69,6 +69,93 @@ class TestFactsCRUD:
         all_metrics = db_session.query(db_models.ServerMetricsFact).all()
         assert len(all_metrics) == 5
     
+    def test_upsert_metrics_fact_batch_counts(self, db_session, sample_vm, sample_metric):
+        """Test batch upsert reports inserted, updated and rejected rows"""
+        crud = FactsCRUD(db_session)
+        base_time = datetime(2025, 1, 27, 0, 0, 0)
+
+        first = crud.upsert_metrics_fact_batch([
+            {'vm': sample_vm, 'timestamp': base_time + timedelta(minutes=i * 30),
+             'metric': sample_metric, 'value': 40.0 + i}
+            for i in range(3)
+        ])
+        assert first == {'inserted': 3, 'updated': 0, 'rejected': 0, 'total': 3}
+
+        second = crud.upsert_metrics_fact_batch([
+            {'vm': sample_vm, 'timestamp': base_time, 'metric': sample_metric, 'value': 99.0},
+            {'vm': sample_vm, 'timestamp': base_time + timedelta(hours=5), 'metric': sample_metric, 'value': 10.0},
+            {'vm': '', 'timestamp': base_time, 'metric': sample_metric, 'value': 10.0},
+            {'vm': sample_vm, 'timestamp': datetime.now() + timedelta(days=1), 'metric': sample_metric, 'value': 10.0},
+        ])
+        assert second == {'inserted': 1, 'updated': 1, 'rejected': 2, 'total': 4}
+
+        records = db_session.query(db_models.ServerMetricsFact).all()
+        assert len(records) == 4
+        updated = [r for r in records if r.timestamp == base_time][0]
+        assert float(updated.value) == 99.0
+
+    def test_upsert_metrics_fact_batch_chunks(self, db_session, sample_vm, sample_metric):
+        """Test batch upsert across several chunks with duplicates inside the batch"""
+        crud = FactsCRUD(db_session)
+        base_time = datetime(2025, 1, 27, 0, 0, 0)
+        rows = [
+            {'vm': sample_vm, 'timestamp': base_time + timedelta(minutes=i * 30),
+             'metric': sample_metric, 'value': float(i)}
+            for i in range(25)
+        ]
+        rows.append({'vm': sample_vm, 'timestamp': base_time, 'metric': sample_metric, 'value': 77.0})
+
+        result = crud.upsert_metrics_fact_batch(rows, chunk_size=10)
+
+        assert result['inserted'] == 25
+        assert result['updated'] == 1
+        assert db_session.query(db_models.ServerMetricsFact).count() == 25
+
+    def test_get_metrics_fact_columns(self, db_session, sample_metrics_data):
+        """Test getting metrics fact as parallel arrays"""
+        crud = FactsCRUD(db_session)
+
+        columns = crud.get_metrics_fact_columns(
+            "test-vm-01",
+            "cpu.usage.average",
+            end_date=datetime(2025, 1, 27, 1, 0, 0),
+            limit=2
+        )
+
+        assert columns['value'] == [40.0, 42.0]
+        assert columns['timestamp'] == [datetime(2025, 1, 27, 0, 0), datetime(2025, 1, 27, 0, 30)]
+
+    def test_get_metrics_frame(self, db_session, sample_vm, sample_metric):
+        """Test loading several VMs and metrics in one wide frame"""
+        crud = FactsCRUD(db_session)
+        base_time = datetime(2025, 1, 27, 0, 0, 0)
+        rows = [
+            {'vm': vm, 'timestamp': base_time + timedelta(minutes=i * 30), 'metric': metric, 'value': float(i)}
+            for vm in (sample_vm, "test-vm-02", "test-vm-03")
+            for metric in (sample_metric, "mem.usage.average")
+            for i in range(4)
+        ]
+        crud.upsert_metrics_fact_batch(rows)
+
+        frame = crud.get_metrics_frame(
+            [sample_vm, "test-vm-02"],
+            [sample_metric, "mem.usage.average"],
+            start_date=base_time + timedelta(minutes=30)
+        )
+
+        assert list(frame.columns) == ['vm', 'timestamp', sample_metric, 'mem.usage.average']
+        assert len(frame) == 6
+        assert set(frame['vm']) == {sample_vm, "test-vm-02"}
+        assert frame[sample_metric].tolist() == [1.0, 2.0, 3.0, 1.0, 2.0, 3.0]
+
+    def test_get_metrics_frame_empty(self, db_session):
+        """Test wide frame for VMs without data"""
+        crud = FactsCRUD(db_session)
+        frame = crud.get_metrics_frame(["nonexistent-vm"], ["cpu.usage.average"])
+
+        assert frame.empty
+        assert list(frame.columns) == ['vm', 'timestamp']
+
     def test_get_metrics_fact(self, db_session, sample_metrics_data):
         """Test getting metrics fact"""
         crud = FactsCRUD(db_session)
@@ -97,6 +184,22 @@ class TestFactsCRUD:
         
         assert len(metrics) == 3
     
+    def test_get_metrics_fact_keyset_pages(self, db_session, sample_metrics_data):
+        """Test walking all records page by page after the (timestamp, id) key"""
+        crud = FactsCRUD(db_session)
+        pages = []
+        after = None
+        while True:
+            page = crud.get_metrics_fact("test-vm-01", "cpu.usage.average", limit=4, after=after)
+            if not page:
+                break
+            pages.append(page)
+            after = (page[-1].timestamp, page[-1].id)
+        
+        assert [len(page) for page in pages] == [4, 4, 2]
+        timestamps = [m.timestamp for page in pages for m in page]
+        assert timestamps == sorted(set(timestamps))
+    
     def test_get_latest_metrics(self, db_session, sample_metrics_data):
         """Test getting latest metrics"""
         crud = FactsCRUD(db_session)
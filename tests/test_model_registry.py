@@ -0,0 +1,96 @@
+"""
+Unit tests for the Prophet model registry
+"""
+import os
+import pickle
+from datetime import datetime, timedelta, timezone
+from model_registry import ModelRegistryCRUD, model_file_path
+
+
+def add_version(registry, storage, vm, metric, trained_at, metrics=None):
+    version = registry.next_version(vm, metric)
+    path = model_file_path(str(storage), vm, metric, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b"model")
+    return registry.register(vm, metric, version, path, trained_at, metrics=metrics, data_points=100)
+
+
+class TestModelRegistry:
+    """Test suite for model versions, pinning and retention"""
+
+    def test_model_file_path_separates_series(self, tmp_path):
+        """Test that series differing only by '_' placement get different files"""
+        assert model_file_path(str(tmp_path), "a", "b_c", 1) != model_file_path(str(tmp_path), "a_b", "c", 1)
+        assert model_file_path(str(tmp_path), "vm/1", "cpu", 2).endswith(os.path.join("vm%2F1", "cpu", "prophet_v2.pkl"))
+
+    def test_register_and_get_latest(self, db_session, tmp_path):
+        """Test that versions increase per series and the latest one is returned"""
+        registry = ModelRegistryCRUD(db_session)
+        now = datetime.now(timezone.utc)
+        add_version(registry, tmp_path, "vm-1", "cpu", now - timedelta(days=2), metrics={"mape": 5.0})
+        add_version(registry, tmp_path, "vm-1", "cpu", now - timedelta(days=1))
+        add_version(registry, tmp_path, "vm-2", "cpu", now)
+
+        latest = registry.get_model("vm-1", "cpu")
+        assert latest.version == 2
+        assert registry.get_model("vm-1", "cpu", version=1).metrics == {"mape": 5.0}
+        assert registry.get_model("vm-1", "mem") is None
+        assert [entry.version for entry in registry.list_versions("vm-1", "cpu")] == [2, 1]
+
+        trained = registry.get_latest_trained_at()
+        assert set(trained) == {("vm-1", "cpu"), ("vm-2", "cpu")}
+        assert abs(trained[("vm-1", "cpu")] - (now - timedelta(days=1))) < timedelta(seconds=1)
+        assert set(registry.get_latest_trained_at([("vm-2", "cpu")])) == {("vm-2", "cpu")}
+
+    def test_pin_version(self, db_session, tmp_path):
+        """Test that a pinned version is returned instead of the latest one"""
+        registry = ModelRegistryCRUD(db_session)
+        now = datetime.now(timezone.utc)
+        for days_ago in (3, 2, 1):
+            add_version(registry, tmp_path, "vm-1", "cpu", now - timedelta(days=days_ago))
+
+        assert registry.pin("vm-1", "cpu", 2) is True
+        assert registry.get_model("vm-1", "cpu").version == 2
+        assert registry.pin("vm-1", "cpu", 99) is False
+
+        registry.unpin("vm-1", "cpu")
+        assert registry.get_model("vm-1", "cpu").version == 3
+
+    def test_apply_retention(self, db_session, tmp_path):
+        """Test that old versions beyond the kept count are deleted with their files, pinned ones are kept"""
+        registry = ModelRegistryCRUD(db_session)
+        now = datetime.now(timezone.utc)
+        entries = [
+            add_version(registry, tmp_path, "vm-1", "cpu", now - timedelta(days=days_ago))
+            for days_ago in (60, 50, 40, 5)
+        ]
+        paths = [entry.path for entry in entries]
+        registry.pin("vm-1", "cpu", 1)
+
+        result = registry.apply_retention(keep_versions=2, days_to_keep=30, now=now)
+
+        assert result == {'deleted': 1, 'kept': 3}
+        assert [entry.version for entry in registry.list_versions("vm-1", "cpu")] == [4, 3, 1]
+        assert not os.path.exists(paths[1])
+        assert os.path.exists(paths[0])
+
+    def test_register_legacy_models(self, db_session, tmp_path):
+        """Test that legacy files are registered by the series stored inside, in training order"""
+        for vm, metric, trained_at in (
+                ("a", "b_c", datetime(2025, 1, 2, tzinfo=timezone.utc)),
+                ("a_b", "c", datetime(2025, 1, 1, tzinfo=timezone.utc)),
+                ("a_b", "c", datetime(2025, 1, 3, tzinfo=timezone.utc)),
+        ):
+            path = tmp_path / f"{vm}_{metric}_prophet_{trained_at.strftime('%Y%m%d_%H%M%S')}.pkl"
+            with open(path, 'wb') as f:
+                pickle.dump({'model': None, 'vm': vm, 'metric': metric, 'trained_at': trained_at,
+                             'metrics': {'mape': 1.0}, 'data_points': 10}, f)
+        registry = ModelRegistryCRUD(db_session)
+
+        assert registry.register_legacy_models(str(tmp_path)) == 3
+        assert registry.register_legacy_models(str(tmp_path)) == 0
+        assert registry.get_model("a", "b_c").version == 1
+        latest = registry.get_model("a_b", "c")
+        assert latest.version == 2
+        assert latest.path.endswith("a_b_c_prophet_20250103_000000.pkl")
@@ -0,0 +1,25 @@
+"""
+Unit tests for pagination cursors
+"""
+import uuid
+import pytest
+from datetime import datetime, timezone
+from pagination import decode_cursor, encode_cursor
+
+
+class TestPagination:
+    """Test suite for keyset pagination cursors"""
+
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the key it was built from"""
+        row_id = uuid.uuid4()
+        for timestamp in (datetime(2025, 1, 27, 0, 30), datetime(2025, 1, 27, 0, 30, tzinfo=timezone.utc)):
+            cursor = encode_cursor(timestamp, row_id)
+            assert "=" not in cursor
+            assert decode_cursor(cursor) == (timestamp, row_id)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", "eyJ0cyI6IngiLCJpZCI6InkifQ"])
+    def test_invalid_cursor(self, cursor):
+        """Test that damaged cursors are rejected with ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
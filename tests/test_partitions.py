@@ -0,0 +1,31 @@
+"""
+Unit tests for monthly partition helpers
+"""
+from datetime import datetime, timezone, timedelta
+from partitions import month_start, add_months, partition_name, default_partition_name
+
+
+class TestPartitions:
+    """Test suite for partition naming and month arithmetic"""
+
+    def test_month_start(self):
+        """Test month boundary for naive and aware timestamps"""
+        assert month_start(datetime(2025, 11, 30, 23, 59)) == datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+        # 1 декабря 01:00 по UTC+3 - ещё ноябрь по UTC
+        aware = datetime(2025, 12, 1, 1, 0, tzinfo=timezone(timedelta(hours=3)))
+        assert month_start(aware) == datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+    def test_add_months(self):
+        """Test month arithmetic across year boundaries"""
+        month = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+        assert add_months(month, 2) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+        assert add_months(month, -11) == datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+    def test_partition_names(self):
+        """Test partition naming"""
+        month = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+        assert partition_name('server_metrics_fact', month) == 'server_metrics_fact_p202503'
+        assert default_partition_name('server_metrics_fact') == 'server_metrics_fact_default'
@@ -0,0 +1,53 @@
+"""
+Unit tests for connection pool metrics
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from pool_metrics import MeteredQueuePool, pool_status
+
+
+@pytest.fixture
+def metered_engine():
+    engine = create_engine("sqlite://", poolclass=MeteredQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+class TestPoolMetrics:
+    """Test suite for MeteredQueuePool and pool_status"""
+
+    def test_checked_out_connections(self, metered_engine):
+        """Test checked-out counts and checkout statistics"""
+        with metered_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            status = pool_status(metered_engine.pool)
+
+            assert status['pool_class'] == 'MeteredQueuePool'
+            assert status['size'] == 1
+            assert status['checked_out'] == 1
+            assert status['overflow'] == 0
+
+        status = pool_status(metered_engine.pool)
+        assert status['checked_out'] == 0
+        assert status['checked_in'] == 1
+        assert status['checkouts'] == 1
+        assert status['timeouts'] == 0
+
+    def test_pool_timeout_is_counted(self, metered_engine):
+        """Test that exhausted pool checkouts are recorded as timeouts with wait time"""
+        with metered_engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                metered_engine.connect()
+
+        status = pool_status(metered_engine.pool)
+        assert status['timeouts'] == 1
+        assert status['wait_seconds_max'] >= 0.05
+
+    def test_stats_survive_dispose(self, metered_engine):
+        """Test that statistics are kept when the pool is recreated"""
+        with metered_engine.connect():
+            pass
+        metered_engine.dispose()
+
+        assert pool_status(metered_engine.pool)['checkouts'] == 1
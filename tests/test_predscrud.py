@@ -105,6 +105,43 @@ class TestPredsCRUD:
         timestamps = [p.timestamp for p in predictions]
         assert timestamps == sorted(timestamps)
     
+    def test_get_predictions_keyset_page(self, db_session, sample_predictions_data):
+        """Test limit and the (timestamp, id) key of the previous page"""
+        crud = PredsCRUD(db_session)
+        first = crud.get_predictions("test-vm-01", "cpu.usage.average", limit=2)
+        rest = crud.get_predictions(
+            "test-vm-01", "cpu.usage.average", after=(first[-1].timestamp, first[-1].id)
+        )
+        
+        assert [float(p.value_predicted) for p in first] == [50.0, 51.0]
+        assert [float(p.value_predicted) for p in rest] == [52.0, 53.0, 54.0]
+    
+    def test_get_predictions_columns(self, db_session, sample_predictions_data):
+        """Test getting predictions as parallel arrays"""
+        crud = PredsCRUD(db_session)
+
+        columns = crud.get_predictions_columns(
+            "test-vm-01",
+            "cpu.usage.average",
+            start_date=datetime(2025, 1, 28, 0, 30, 0)
+        )
+
+        assert set(columns) == {'timestamp', 'value_predicted', 'lower_bound', 'upper_bound'}
+        assert columns['value_predicted'] == [51.0, 52.0, 53.0, 54.0]
+        assert columns['lower_bound'] == [46.0, 47.0, 48.0, 49.0]
+        assert columns['timestamp'] == sorted(columns['timestamp'])
+
+    def test_get_predictions_columns_match_rows(self, db_session, sample_predictions_data):
+        """Test that the columnar and row queries select the same points for the same filters"""
+        crud = PredsCRUD(db_session)
+        filters = dict(start_date=datetime(2025, 1, 28, 0, 30, 0), end_date=datetime(2025, 1, 28, 1, 30, 0))
+
+        columns = crud.get_predictions_columns("test-vm-01", "cpu.usage.average", **filters)
+        rows = crud.get_predictions("test-vm-01", "cpu.usage.average", **filters)
+
+        assert columns['timestamp'] == [p.timestamp for p in rows]
+        assert columns['value_predicted'] == [float(p.value_predicted) for p in rows]
+
     def test_get_predictions_no_dates(self, db_session, sample_predictions_data):
         """Test getting predictions without date filters"""
         crud = PredsCRUD(db_session)
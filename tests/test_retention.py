@@ -0,0 +1,85 @@
+"""
+Unit tests for the background retention job
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+import retention
+from retention import RetentionJob, parse_policies, retention_cutoff
+import models as db_models
+
+
+def add_fact(db_session, days_ago, metric="cpu.usage.average", vm="test-vm-01"):
+    db_session.add(db_models.ServerMetricsFact(
+        vm=vm,
+        timestamp=datetime.now() - timedelta(days=days_ago),
+        metric=metric,
+        value=50.0
+    ))
+
+
+@pytest.fixture(autouse=True)
+def clean_jobs():
+    retention.clear_jobs()
+    yield
+    retention.clear_jobs()
+
+
+class TestRetention:
+    """Test suite for retention policies and batched deletion"""
+
+    def test_parse_policies(self):
+        """Test parsing per-metric retention policies"""
+        assert parse_policies("") == {}
+        assert parse_policies("cpu.usage.average=30, mem.usage.average=180") == {
+            "cpu.usage.average": 30, "mem.usage.average": 180
+        }
+        with pytest.raises(ValueError):
+            parse_policies("cpu.usage.average")
+        with pytest.raises(ValueError):
+            parse_policies("cpu.usage.average=0")
+
+    def test_retention_cutoff_aligned_to_day(self):
+        """Test that the cutoff is the start of a UTC day"""
+        now = datetime(2025, 3, 10, 15, 45, tzinfo=timezone.utc)
+        assert retention_cutoff(30, now) == datetime(2025, 2, 8, tzinfo=timezone.utc)
+
+    def test_run_job_in_batches_with_policies(self, db_session):
+        """Test batched deletion with a shorter policy for one metric"""
+        for days_ago in (100, 101, 102, 50, 10):
+            add_fact(db_session, days_ago)
+            add_fact(db_session, days_ago, metric="mem.usage.average")
+        db_session.commit()
+
+        job = retention.submit_job(RetentionJob(
+            90, {"mem.usage.average": 30}, rollup_before_delete=False, batch_size=2, batch_pause_seconds=0
+        ))
+        retention.run_job(job, db_session)
+
+        assert job.status == retention.JOB_COMPLETED
+        assert job.fact_records_deleted == 7
+        assert job.batches == 4
+        remaining = db_session.query(db_models.ServerMetricsFact.metric).all()
+        assert sorted(row[0] for row in remaining) == [
+            "cpu.usage.average", "cpu.usage.average", "mem.usage.average"
+        ]
+
+    def test_rollups_kept_after_delete(self, db_session):
+        """Test that expiring raw data is rolled up before deletion"""
+        add_fact(db_session, 100)
+        db_session.commit()
+
+        job = RetentionJob(90, batch_pause_seconds=0)
+        retention.run_job(job, db_session)
+
+        assert job.status == retention.JOB_COMPLETED
+        assert job.rollup_series_days == 1
+        assert db_session.query(db_models.ServerMetricsFact).count() == 0
+        daily = db_session.query(db_models.ServerMetricsFactDaily).one()
+        assert daily.count == 1
+        assert db_session.query(db_models.ServerMetricsSeries).count() == 0
+
+    def test_submit_job_conflict(self):
+        """Test that only one retention job runs at a time"""
+        retention.submit_job(RetentionJob(90))
+        with pytest.raises(RuntimeError):
+            retention.submit_job(RetentionJob(90))
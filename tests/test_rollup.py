@@ -0,0 +1,140 @@
+"""
+Unit tests for hourly/daily rollups and quantile sketches
+"""
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from facts_crud import FactsCRUD
+from rollup_crud import RollupCRUD, ROLLUP_DAILY, ROLLUP_HOURLY
+from quantile_sketch import build_sketch, merge_sketches, sketch_quantile, RELATIVE_ACCURACY
+import models as db_models
+
+
+class TestQuantileSketch:
+    """Test suite for the mergeable quantile sketch"""
+
+    def test_quantile_relative_accuracy(self):
+        """Test p95 estimate within the configured relative accuracy"""
+        values = np.random.default_rng(0).lognormal(3.0, 1.0, 20000)
+
+        estimate = sketch_quantile(build_sketch(values), 0.95)
+
+        exact = np.quantile(values, 0.95)
+        assert abs(estimate - exact) / exact <= RELATIVE_ACCURACY * 2
+
+    def test_merge_matches_whole(self):
+        """Test that merged sketches equal the sketch of all values"""
+        values = np.concatenate([np.linspace(-5.0, 5.0, 101), np.zeros(3), [0.001, -0.001]])
+
+        merged = merge_sketches([build_sketch(values[:50]), build_sketch(values[50:])])
+
+        assert merged == build_sketch(values)
+        assert sketch_quantile(merged, 0.0) == pytest.approx(-5.0, rel=RELATIVE_ACCURACY)
+
+    def test_empty_sketch(self):
+        """Test quantile of an empty sketch"""
+        assert sketch_quantile({}, 0.95) is None
+
+
+class TestRollupCRUD:
+    """Test suite for rollup maintenance and rollup-based statistics"""
+
+    @staticmethod
+    def _load(db_session, sample_vm, sample_metric, base_time, count):
+        FactsCRUD(db_session).upsert_metrics_fact_batch([
+            {'vm': sample_vm, 'timestamp': base_time + timedelta(minutes=i * 30),
+             'metric': sample_metric, 'value': float(i % 48)}
+            for i in range(count)
+        ])
+
+    def test_ingest_maintains_rollups(self, db_session, sample_vm, sample_metric):
+        """Test that batch upsert fills hourly and daily rollups"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        self._load(db_session, sample_vm, sample_metric, base_time, 96)
+
+        hourly = db_session.query(db_models.ServerMetricsFactHourly).order_by(
+            db_models.ServerMetricsFactHourly.bucket).all()
+        daily = db_session.query(db_models.ServerMetricsFactDaily).all()
+
+        assert len(hourly) == 48
+        assert hourly[0].count == 2
+        assert hourly[0].sum == 1.0
+        assert len(daily) == 2
+        assert sum(row.count for row in daily) == 96
+        assert daily[0].max == 47.0
+
+        # Обновление значения пересчитывает только затронутые агрегаты
+        FactsCRUD(db_session).upsert_metrics_fact_batch([
+            {'vm': sample_vm, 'timestamp': base_time, 'metric': sample_metric, 'value': 100.0}
+        ])
+        db_session.expire_all()
+        first_day = db_session.query(db_models.ServerMetricsFactDaily).order_by(
+            db_models.ServerMetricsFactDaily.bucket).first()
+        assert first_day.max == 100.0
+        assert first_day.count == 48
+
+    def test_statistics_match_raw(self, db_session, sample_vm, sample_metric):
+        """Test rollup statistics over a range with partial hours and days at both ends"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        self._load(db_session, sample_vm, sample_metric, base_time, 48 * 5)
+        start_date = datetime(2025, 1, 1, 13, 30, 0)
+        end_date = datetime(2025, 1, 4, 7, 0, 0)
+
+        stats = RollupCRUD(db_session).get_statistics(sample_vm, sample_metric, start_date, end_date)
+
+        raw = np.array([
+            float(i % 48) for i in range(48 * 5)
+            if start_date <= base_time + timedelta(minutes=i * 30) <= end_date
+        ])
+        assert stats['count'] == len(raw)
+        assert stats['min'] == raw.min()
+        assert stats['max'] == raw.max()
+        assert stats['avg'] == pytest.approx(raw.mean())
+        assert stats['stddev'] == pytest.approx(raw.std(ddof=1))
+        assert stats['quantile'] == pytest.approx(np.quantile(raw, 0.95), rel=0.05)
+
+    def test_statistics_reads_rollups(self, db_session, sample_vm, sample_metric):
+        """Test that whole days are answered from the daily rollup"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        self._load(db_session, sample_vm, sample_metric, base_time, 48 * 3)
+        db_session.query(db_models.ServerMetricsFact).delete()
+        db_session.commit()
+
+        stats = RollupCRUD(db_session).get_statistics(
+            sample_vm, sample_metric, base_time, base_time + timedelta(days=3)
+        )
+
+        assert stats['count'] == 48 * 3
+
+    def test_refresh_range(self, db_session, sample_vm, sample_metric):
+        """Test refresh job for rows written outside the ingest path"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        for i in range(4):
+            db_session.add(db_models.ServerMetricsFact(
+                vm=sample_vm, timestamp=base_time + timedelta(minutes=i * 30), metric=sample_metric, value=i
+            ))
+        db_session.commit()
+        assert db_session.query(db_models.ServerMetricsFactHourly).count() == 0
+
+        result = RollupCRUD(db_session).refresh_range(base_time, base_time + timedelta(hours=2))
+
+        assert result['series'] == 1
+        assert db_session.query(db_models.ServerMetricsFactHourly).count() == 2
+        assert db_session.query(db_models.ServerMetricsFactDaily).one().count == 4
+
+    def test_pick_granularity(self):
+        """Test that the coarsest rollup not exceeding the resolution is chosen"""
+        assert RollupCRUD.pick_granularity(timedelta(minutes=30)) is None
+        assert RollupCRUD.pick_granularity(timedelta(hours=6)) == ROLLUP_HOURLY
+        assert RollupCRUD.pick_granularity(timedelta(days=2)) == ROLLUP_DAILY
+
+    def test_hour_of_day_profile(self, db_session, sample_vm, sample_metric):
+        """Test hour-of-day profile from the hourly rollup"""
+        base_time = datetime(2025, 1, 1, 0, 0, 0)
+        self._load(db_session, sample_vm, sample_metric, base_time, 48 * 2)
+
+        profile = RollupCRUD(db_session).get_hour_of_day_profile([sample_vm], sample_metric)
+
+        assert len(profile) == 24
+        assert profile.loc[profile['hour'] == 1, 'avg'].item() == 2.5
+        assert profile['count'].sum() == 96
@@ -0,0 +1,79 @@
+"""
+Unit tests for read-replica routing
+"""
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+from connection import Base
+from dbcrud import DBCRUD
+from facts_crud import FactsCRUD
+from routing import ReplicaSet, RoutingSession
+import models as db_models
+import schemas as pydantic_models
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """Primary and replica SQLite databases with the same schema, replica pre-filled"""
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    with Session(replica) as replica_session:
+        replica_session.add(db_models.ServerMetricsFact(
+            vm='replica-vm', timestamp=datetime(2025, 1, 27), metric='cpu', value=1.0
+        ))
+        replica_session.commit()
+
+    replicas = ReplicaSet([replica])
+    session = sessionmaker(bind=primary, class_=RoutingSession, replicas=replicas)()
+    yield session, primary, replica, replicas
+    session.close()
+    primary.dispose()
+    replica.dispose()
+
+
+class TestRouting:
+    """Test suite for RoutingSession and @replica_read"""
+
+    def test_replica_read_goes_to_replica(self, routed):
+        """Test that @replica_read methods read from the replica"""
+        session, _, _, _ = routed
+
+        records = FactsCRUD(session).get_metrics_fact('replica-vm', 'cpu')
+
+        assert [record.vm for record in records] == ['replica-vm']
+        # Неотмеченные методы читают основной сервер
+        assert DBCRUD(session).get_all_vms() == []
+
+    def test_writes_stay_on_primary(self, routed):
+        """Test that writes go to the primary"""
+        session, primary, replica, _ = routed
+
+        FactsCRUD(session).create_metric_fact(pydantic_models.MetricFact(
+            vm='primary-vm', timestamp=datetime(2025, 1, 27, 1, 0), metric='cpu', value=2.0
+        ))
+
+        with primary.connect() as conn:
+            assert conn.execute(text("SELECT vm FROM server_metrics_fact")).scalars().all() == ['primary-vm']
+        with replica.connect() as conn:
+            assert conn.execute(text("SELECT vm FROM server_metrics_fact")).scalars().all() == ['replica-vm']
+
+    def test_unhealthy_replica_falls_back_to_primary(self, routed):
+        """Test that reads go to the primary when no replica is healthy"""
+        session, _, replica, replicas = routed
+
+        replicas.mark(replica, healthy=False)
+
+        assert FactsCRUD(session).get_metrics_fact('replica-vm', 'cpu') == []
+
+    def test_round_robin(self):
+        """Test round-robin over healthy replicas"""
+        engines = [create_engine("sqlite://") for _ in range(3)]
+        replicas = ReplicaSet(engines)
+        replicas.mark(engines[1], healthy=False)
+
+        assert [replicas.next_engine() for _ in range(4)] == [engines[0], engines[2], engines[0], engines[2]]
+        assert replicas.check() == {'sqlite://': True}
+        assert [replicas.next_engine() for _ in range(3)] == engines
@@ -0,0 +1,120 @@
+"""
+Unit tests for the fleet training scheduler
+"""
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+import training_scheduler
+from training_scheduler import FleetTrainingScheduler
+from model_registry import ModelRegistryCRUD
+import models as db_models
+
+
+class FakeForecaster:
+    """Forecaster stub: records calls and fails a configured number of times"""
+
+    def __init__(self, model_storage_path, failures=0):
+        self.model_storage_path = str(model_storage_path)
+        self.enable_optimization = False
+        self.failures = failures
+        self.calls = 0
+
+    def train_or_load_model(self, db, crud, vm, metric, retrain=False, optimize=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("training failed")
+        return object()
+
+
+def add_series(db_session, vm, metric, point_count, last_ts):
+    db_session.add(db_models.ServerMetricsSeries(
+        vm=vm,
+        metric=metric,
+        first_ts=last_ts - timedelta(days=7),
+        last_ts=last_ts,
+        point_count=point_count
+    ))
+
+
+def register_model(db_session, vm, metric, trained_at):
+    registry = ModelRegistryCRUD(db_session)
+    version = registry.next_version(vm, metric)
+    registry.register(vm, metric, version, f"/models/{vm}/{metric}/prophet_v{version}.pkl", trained_at)
+
+
+@pytest.fixture
+def worker_state():
+    yield training_scheduler._worker
+    training_scheduler._worker.clear()
+
+
+class TestTrainingScheduler:
+    """Test suite for training order, retries and the run log"""
+
+    def test_plan_orders_by_staleness_and_size(self, db_session, tmp_path):
+        """Test that untrained series go first, then stalest models, then larger series"""
+        now = datetime.now(timezone.utc)
+        add_series(db_session, "vm-new-small", "cpu", 100, now)
+        add_series(db_session, "vm-new-large", "cpu", 500, now)
+        add_series(db_session, "vm-stale", "cpu", 100, now)
+        add_series(db_session, "vm-fresh", "cpu", 100, now)
+        add_series(db_session, "vm-tiny", "cpu", 10, now)
+        db_session.commit()
+        register_model(db_session, "vm-stale", "cpu", now - timedelta(days=3))
+        register_model(db_session, "vm-fresh", "cpu", now - timedelta(days=1))
+
+        scheduler = FleetTrainingScheduler(FakeForecaster(tmp_path), database_url="sqlite://")
+        planned, skipped = scheduler.plan(db_session)
+
+        assert [item['vm'] for item in planned] == ["vm-new-large", "vm-new-small", "vm-stale", "vm-fresh"]
+        assert [(item['vm'], item['message']) for item in skipped] == [("vm-tiny", "Insufficient data")]
+
+    def test_plan_skips_series_without_new_data(self, db_session, tmp_path):
+        """Test that a model newer than the last fact is skipped unless forced"""
+        add_series(db_session, "vm-1", "cpu", 100, datetime.now(timezone.utc) - timedelta(days=2))
+        db_session.commit()
+        register_model(db_session, "vm-1", "cpu", datetime.now(timezone.utc) - timedelta(days=1))
+        scheduler = FleetTrainingScheduler(FakeForecaster(tmp_path), database_url="sqlite://")
+
+        planned, skipped = scheduler.plan(db_session, [("vm-1", "cpu"), ("vm-missing", "cpu")])
+        assert planned == []
+        assert [item['message'] for item in skipped] == ["No new data since last training", "Insufficient data"]
+
+        planned, _ = scheduler.plan(db_session, [("vm-1", "cpu")], force=True)
+        assert [item['vm'] for item in planned] == ["vm-1"]
+
+    def test_train_pair_retries_with_backoff(self, worker_state, monkeypatch, tmp_path):
+        """Test that a failing pair is retried with doubling pauses"""
+        sleeps = []
+        monkeypatch.setattr(training_scheduler.time, "sleep", sleeps.append)
+        worker_state['forecaster'] = FakeForecaster(tmp_path, failures=2)
+        worker_state['session_factory'] = lambda: type("Session", (), {"close": lambda self: None})()
+
+        detail = training_scheduler._train_pair("vm-1", "cpu", None, max_retries=2, backoff_seconds=1.5)
+
+        assert detail['status'] == training_scheduler.STATUS_SUCCESS
+        assert detail['attempts'] == 3
+        assert sleeps == [1.5, 3.0]
+
+        worker_state['forecaster'] = FakeForecaster(tmp_path, failures=5)
+        detail = training_scheduler._train_pair("vm-1", "cpu", None, max_retries=1, backoff_seconds=0)
+        assert detail['status'] == training_scheduler.STATUS_FAILED
+        assert detail['attempts'] == 2
+        assert detail['message'] == "training failed"
+
+    def test_run_writes_run_log(self, db_session, tmp_path):
+        """Test that skipped series are counted and written to the run log"""
+        add_series(db_session, "vm-tiny", "cpu", 10, datetime.now(timezone.utc))
+        db_session.commit()
+        scheduler = FleetTrainingScheduler(FakeForecaster(tmp_path), database_url="sqlite://")
+
+        results = scheduler.run(db_session)
+
+        assert results['total'] == 1
+        assert results['skipped'] == 1
+        assert results['successful'] == 0
+        entries = [json.loads(line) for line in (tmp_path / "training_runs.jsonl").read_text().splitlines()]
+        assert len(entries) == 1
+        assert entries[0]['run_id'] == results['run_id']
+        assert entries[0]['status'] == training_scheduler.STATUS_SKIPPED
+        assert entries[0]['vm'] == "vm-tiny"
@@ -1,36 +1,141 @@
-import psycopg2
+"""
+Загрузка фактических метрик из Excel/CSV/Parquet файлов (результат utils/prepare_data.py) в server_metrics_fact.
+
+Файл читается потоково, пачками по --chunk-size строк; каждая пачка пишется одним
+INSERT ... ON CONFLICT через psycopg2.extras.execute_values в отдельной транзакции.
+В той же транзакции для загруженных (vm, metric) пересчитываются часовые и суточные
+агрегаты затронутых суток (server_metrics_fact_1h, server_metrics_fact_1d) и строки
+справочника рядов (server_metrics_series) - как при записи через API.
+
+Пример:
+    python data_loader.py ../data/processed/temp.xlsx --chunk-size 50000
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, Optional
+
 import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-import logging
-from datetime import datetime
-import uuid
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine, delete, insert, tuple_
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session
 from tqdm import tqdm
+
+# Модули приложения: агрегаты и справочник рядов обновляются тем же кодом, что и при записи через API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'app'))
+
+import models as db_models
 from base_logger import logger
+from rollup_crud import RollupCRUD, rollup_keys
 
 
-# Конфигурация базы данных
+# Конфигурация базы данных (переменные окружения те же, что в src/app/connection.py)
 DB_CONFIG = {
-    'host': 'localhost',  # или IP-адрес Docker контейнера
-    'port': '5432',
-    'database': 'server_metrics',  # имя вашей базы данных
-    'user': 'postgres',
-    'password': 'postgres'  # замените на ваш пароль
+    'host': os.getenv('DB_HOST', 'localhost'),  # или IP-адрес Docker контейнера
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'server_metrics'),  # имя вашей базы данных
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')  # замените на ваш пароль
 }
 
+REQUIRED_COLUMNS = ['vm', 'timestamp', 'metric', 'value']
 
-def read_excel_file(file_path):
-    """Чтение данных из Excel файла"""
+DEFAULT_CHUNK_SIZE = 50000
+
+# id генерируется на сервере, конфликты по (vm, timestamp, metric) обновляют значение
+INSERT_FACTS_SQL = """
+    INSERT INTO server_metrics_fact (id, vm, timestamp, metric, value)
+    VALUES %s
+    ON CONFLICT ON CONSTRAINT uq_vm_timestamp_metric DO UPDATE SET value = EXCLUDED.value
+"""
+INSERT_FACTS_TEMPLATE = "(gen_random_uuid(), %s, %s, %s, %s)"
+
+
+def count_chunks(file_path: str, chunk_size: int) -> Optional[int]:
+    """Оценка количества пачек для прогресса (для CSV неизвестно)"""
+    if file_path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return -(-pq.ParquetFile(file_path).metadata.num_rows // chunk_size)
+    if not file_path.lower().endswith(('.xlsx', '.xlsm')):
+        return None
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True)
     try:
-        # Читаем Excel файл
-        df = pd.read_excel(file_path)
+        rows = max((workbook.active.max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
+    return -(-rows // chunk_size)
+
+
+def iter_excel_chunks(file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Потоковое чтение Excel файла пачками (openpyxl в режиме read_only)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else '' for name in header]
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_parquet_chunks(file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Потоковое чтение Parquet файла пачками (результат process_temp(parallel=True))"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def iter_file_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Потоковое чтение файла с данными пачками
+
+    Args:
+        file_path: Путь к .xlsx, .csv или .parquet файлу
+        chunk_size: Количество строк в пачке
 
-        # Проверяем наличие необходимых колонок
-        required_columns = ['vm', 'timestamp', 'metric', 'value']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+    Yields:
+        DataFrame с колонками файла
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        chunks = iter_excel_chunks(file_path, chunk_size)
+    elif extension == '.csv':
+        chunks = pd.read_csv(file_path, chunksize=chunk_size)
+    elif extension == '.parquet':
+        chunks = iter_parquet_chunks(file_path, chunk_size)
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {file_path}. Допустимые: .xlsx, .csv, .parquet")
 
+    for chunk in chunks:
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
         if missing_columns:
             raise ValueError(f"Отсутствуют необходимые колонки: {missing_columns}")
+        yield chunk
+
+
+def read_excel_file(file_path):
+    """Чтение данных из Excel файла целиком"""
+    try:
+        df = pd.concat(iter_file_chunks(file_path), ignore_index=True)
 
         logger.info(f"Успешно прочитан файл: {file_path}")
         logger.info(f"Количество строк: {len(df)}")
@@ -43,93 +148,174 @@ def read_excel_file(file_path):
         raise
 
 
-def prepare_data(df):
-    """Подготовка данных для вставки"""
-    try:
-        # Создаем копию данных
-        data = df.copy()
-
-        # Преобразуем дату в формат datetime
-        data['timestamp'] = pd.to_datetime(data['timestamp'], format='%y-%m-%d %H:%M:%S', errors='coerce')
+def prepare_data(df: pd.DataFrame, timestamp_format: Optional[str] = None) -> pd.DataFrame:
+    """
+    Подготовка пачки данных для вставки
 
-        # Проверяем корректность преобразования дат
-        invalid_dates = data['timestamp'].isna().sum()
-        if invalid_dates > 0:
-            logger.warning(f"Найдено {invalid_dates} некорректных дат")
+    Args:
+        df: DataFrame с колонками vm, timestamp, metric, value
+        timestamp_format: Формат временной метки для текстовых колонок (по умолчанию определяется автоматически)
 
-        # Преобразуем числовые колонки
-        data['value'] = pd.to_numeric(data['value'], errors='coerce')
+    Returns:
+        DataFrame с колонками vm, timestamp, metric, value без дублей и некорректных строк
+    """
+    data = df[REQUIRED_COLUMNS].copy()
 
-        # Генерируем UUID для каждой строки
-        data['id'] = [str(uuid.uuid4()) for _ in range(len(data))]
+    # Excel отдаёт datetime, CSV - строки
+    if not pd.api.types.is_datetime64_any_dtype(data['timestamp']):
+        data['timestamp'] = pd.to_datetime(data['timestamp'], format=timestamp_format, errors='coerce')
+    data['value'] = pd.to_numeric(data['value'], errors='coerce')
+    data['vm'] = data['vm'].astype('string').str.strip()
+    data['metric'] = data['metric'].astype('string').str.strip()
 
-        # Добавляем created_at
-        data['created_at'] = datetime.now()
+    # Строки без ключевых полей и с временем из будущего (chk_timestamp_not_future) отклонили бы всю пачку
+    valid = (
+        data['vm'].notna() & (data['vm'] != '')
+        & data['metric'].notna() & (data['metric'] != '')
+        & data['timestamp'].notna()
+        & (data['timestamp'] <= pd.Timestamp.now())
+    )
+    removed_count = int((~valid).sum())
+    if removed_count > 0:
+        logger.warning(f"Удалено {removed_count} строк с некорректными или отсутствующими ключевыми значениями")
+    data = data[valid]
 
-        # Выбираем только необходимые колонки в правильном порядке
-        final_columns = ['id', 'vm', 'timestamp', 'metric', 'value', 'created_at']
-        data = data[final_columns]
+    # ON CONFLICT DO UPDATE не может изменить одну строку дважды в одном запросе
+    original_count = len(data)
+    data = data.drop_duplicates(subset=['vm', 'timestamp', 'metric'], keep='last')
+    removed_count = original_count - len(data)
+    if removed_count > 0:
+        logger.warning(f"Удалено {removed_count} строк с дублирующимися значениями по полям [vm, timestamp, metric]")
 
-        # Удаляем дубли по constraint ['vm', 'timestamp', 'metric']
-        original_count = len(data)
-        data = data.drop_duplicates(subset=['vm', 'timestamp', 'metric'])
-        removed_count = original_count - len(data)
-        if removed_count > 0:
-            logger.warning(f"Удалено {removed_count} строк с дублирующимися значениями по полям [vm, timestamp, metric]")
+    return data
 
-        # Удаляем строки с NaN значениями в ключевых полях
-        original_count = len(data)
-        data = data.dropna(subset=['vm', 'timestamp', 'metric'])
-        removed_count = original_count - len(data)
 
-        if removed_count > 0:
-            logger.warning(f"Удалено {removed_count} строк с отсутствующими ключевыми значениями")
+def insert_data(df: pd.DataFrame, session: Optional[Session] = None, page_size: int = 10000) -> int:
+    """
+    Запись подготовленной пачки одной транзакцией вместе с агрегатами и справочником рядов
 
-        logger.info(f"Подготовлено {len(data)} строк для вставки")
+    Args:
+        df: Результат prepare_data
+        session: Открытая сессия (если не передана, открывается новая)
+        page_size: Количество строк в одном INSERT
 
-        return data
+    Returns:
+        Количество записанных строк
+    """
+    own_session = session is None
+    if own_session:
+        session = connect()
 
-    except Exception as e:
-        logger.error(f"Ошибка подготовки данных: {e}")
+    rows = list(zip(
+        df['vm'].tolist(),
+        df['timestamp'].astype(object).tolist(),
+        df['metric'].tolist(),
+        df['value'].astype(object).where(df['value'].notna(), None).tolist()
+    ))
+    try:
+        if session.get_bind().dialect.name == 'postgresql':
+            # execute_values идёт через то же DBAPI-соединение, что и транзакция сессии
+            dbapi_connection = session.connection().connection.dbapi_connection
+            with dbapi_connection.cursor() as cur:
+                execute_values(cur, INSERT_FACTS_SQL, rows, template=INSERT_FACTS_TEMPLATE, page_size=page_size)
+        else:
+            _insert_rows_portable(session, rows, page_size)
+        RollupCRUD(session).refresh_keys(rollup_keys((vm, timestamp, metric) for vm, timestamp, metric, _ in rows))
+        session.commit()
+    except Exception:
+        session.rollback()
         raise
+    finally:
+        if own_session:
+            session.close()
+    return len(rows)
+
+
+def _insert_rows_portable(session: Session, rows: list, page_size: int) -> None:
+    # Переносимый путь (SQLite в тестах): совпадающие ключи удаляются, пачка вставляется заново
+    fact = db_models.ServerMetricsFact
+    for start in range(0, len(rows), page_size):
+        page = rows[start:start + page_size]
+        keys = [(vm, timestamp, metric) for vm, timestamp, metric, _ in page]
+        session.execute(delete(fact).where(tuple_(fact.vm, fact.timestamp, fact.metric).in_(keys)))
+        session.execute(insert(fact), [
+            {'vm': vm, 'timestamp': timestamp, 'metric': metric, 'value': value}
+            for vm, timestamp, metric, value in page
+        ])
 
 
-def insert_data(df: pd.DataFrame):
-    connection = psycopg2.connect(
-        dbname=DB_CONFIG['database'],
-        user=DB_CONFIG['user'],
+def connect() -> Session:
+    engine = create_engine(URL.create(
+        'postgresql+psycopg2',
+        username=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
         host=DB_CONFIG['host'],
-        port=DB_CONFIG['port'],
-        password=DB_CONFIG['password']
+        port=int(DB_CONFIG['port']),
+        database=DB_CONFIG['database']
+    ))
+    return Session(engine)
+
+
+def load_file(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              timestamp_format: Optional[str] = None) -> dict:
+    """
+    Загрузка файла в server_metrics_fact пачками
+
+    Ошибка в пачке откатывает только её, загрузка продолжается со следующей.
+
+    Returns:
+        Статистика: chunks, failed_chunks, rows_read, rows_written
+    """
+    stats = {'chunks': 0, 'failed_chunks': 0, 'rows_read': 0, 'rows_written': 0}
+    started = time.monotonic()
+
+    session = connect()
+    try:
+        progress = tqdm(iter_file_chunks(file_path, chunk_size),
+                        total=count_chunks(file_path, chunk_size), unit='chunk')
+        for chunk in progress:
+            stats['chunks'] += 1
+            stats['rows_read'] += len(chunk)
+            try:
+                stats['rows_written'] += insert_data(prepare_data(chunk, timestamp_format), session)
+            except Exception as e:
+                stats['failed_chunks'] += 1
+                logger.error(f"Ошибка записи пачки {stats['chunks']}: {e}")
+            progress.set_postfix(rows=str(stats['rows_written']))
+    finally:
+        session.close()
+        session.get_bind().dispose()
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Загрузка {file_path} завершена за {elapsed:.1f} с: пачек {stats['chunks']} "
+        f"(с ошибкой {stats['failed_chunks']}), прочитано {stats['rows_read']}, записано {stats['rows_written']}"
     )
-    cur = connection.cursor()
-    for i in tqdm(range(len(df))):
-        row = list(df.iloc[i])
-        # date and created_date Timestamp object to string
-        row[2] = row[2].strftime('%Y-%m-%d %H:%M:%S')
-        row[-1] = row[-1].strftime('%Y-%m-%d %H:%M:%S')
-        row = tuple(row)
-        query = f"INSERT INTO server_metrics_fact (id, vm, timestamp, metric, value, created_at) \n" \
-                f"VALUES {row}"
-        try:
-            cur.execute(query)
-            connection.commit()
-        except Exception as e:
-            connection.rollback()
-            logger.info(f"Ошибка в ставке данных: {row}, {e}")
-
-    #connection.commit()
-    cur.close()
-    connection.close()
-    return
-
-
-def main():
-    filepath = '../data/temp_fact.xlsx'
-    df = read_excel_file(filepath)
-    prepared_data = prepare_data(df)
-    insert_data(prepared_data)
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Загрузка фактических метрик из Excel/CSV/Parquet в server_metrics_fact")
+    parser.add_argument('file', nargs='?', default='../data/processed/temp.xlsx',
+                        help="Файл .xlsx, .csv или .parquet с колонками vm, timestamp, metric, value")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Строк в пачке/транзакции (по умолчанию {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--timestamp-format', default=None,
+                        help="Формат timestamp для текстовых значений, например '%%d.%%m.%%y %%H:%%M:%%S'")
+    parser.add_argument('--host', default=DB_CONFIG['host'])
+    parser.add_argument('--port', default=DB_CONFIG['port'])
+    parser.add_argument('--database', default=DB_CONFIG['database'])
+    parser.add_argument('--user', default=DB_CONFIG['user'])
+    parser.add_argument('--password', default=DB_CONFIG['password'])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    DB_CONFIG.update(host=args.host, port=args.port, database=args.database,
+                     user=args.user, password=args.password)
+    load_file(args.file, chunk_size=args.chunk_size, timestamp_format=args.timestamp_format)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
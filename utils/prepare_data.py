@@ -1,10 +1,29 @@
 import glob
 import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 import pandas as pd
 
+# Колонки выгрузки temp/ и их названия в базе с фактами
+TEMP_COLUMNS = {'VM': 'vm', 'Timestamp': 'timestamp', 'Metric': 'metric', 'Value': 'value'}
+
+
+def read_temp_partitions(file_path: str) -> dict:
+    """
+    Читает один CSV файл из папки temp/ и разбивает его по партициям (vm, metric).
+    Выполняется в процессе-воркере в параллельном режиме process_temp.
+    """
+    df = pd.read_csv(file_path, usecols=list(TEMP_COLUMNS))
+    df.rename(columns=TEMP_COLUMNS, inplace=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%d.%m.%y %H:%M:%S', errors='coerce')
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    df = df.dropna(subset=['vm', 'metric', 'timestamp'])
+    df['vm'] = df['vm'].astype(str)
+    df['metric'] = df['metric'].astype(str)
+    return {key: part for key, part in df.groupby(['vm', 'metric'], sort=False)}
+
 
 class DATA:
     def __init__(self):
@@ -72,14 +91,19 @@ class DATA:
 
     @staticmethod
     def process_temp(folder_path='../data/source/temp',
-                     out_file='../data/processed/temp.xlsx') -> pd.DataFrame:
+                     out_file='../data/processed/temp.xlsx',
+                     parallel=False,
+                     workers=None) -> pd.DataFrame:
         """
         Подготавливает данные CSV файлов из папки temp/ по серверам за период: с 25-11-2025 по 01-12-2025 (включительно)
+
+        parallel=True - файлы разбираются в пуле процессов, дубли удаляются внутри партиций (vm, metric),
+        результат пишется в Parquet (out_file с расширением .parquet) вместо Excel
         """
         if not os.path.isdir(folder_path):
             raise ValueError(f"Folder '{folder_path}' does not exist or is not a directory")
 
-        files = glob.glob(os.path.join(folder_path, '*.csv'))
+        files = sorted(glob.glob(os.path.join(folder_path, '*.csv')))
 
         if not files:
             warnings.warn(f"No CSV files found in folder: {folder_path}")
@@ -87,6 +111,9 @@ class DATA:
 
         print(f"Found {len(files)} CSV files in folder: {folder_path}")
 
+        if parallel:
+            return DATA._process_temp_parallel(files, out_file, workers)
+
         list_of_dfs = []
         for f in files:
             df = pd.read_csv(f)
@@ -145,6 +172,60 @@ class DATA:
 
         return df
 
+    @staticmethod
+    def _process_temp_parallel(files, out_file, workers=None) -> pd.DataFrame:
+        """
+        Параллельный режим process_temp: разбор файлов в пуле процессов и запись партиций (vm, metric)
+        в Parquet по одной группе строк, без общего concat и сортировки всего датафрейма
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        partitions = {}
+        raw_len = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map сохраняет порядок файлов, поэтому keep='last' ведёт себя как в последовательном режиме
+            for file_partitions in executor.map(read_temp_partitions, files):
+                for key, part in file_partitions.items():
+                    raw_len += len(part)
+                    partitions.setdefault(key, []).append(part)
+        print(f"Length of raw dataframe: {raw_len}")
+
+        out_file = os.path.splitext(out_file)[0] + '.parquet'
+        os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+        schema = pa.schema([
+            ('vm', pa.string()),
+            ('timestamp', pa.timestamp('ns')),
+            ('metric', pa.string()),
+            ('value', pa.float64()),
+        ])
+
+        processed = []
+        duplicates = 0
+        with pq.ParquetWriter(out_file, schema) as writer:
+            for key in sorted(partitions):
+                parts = partitions[key]
+                part = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+                part = part.sort_values('timestamp', kind='stable')
+                deduped = part.drop_duplicates(subset=['timestamp'], keep='last')
+                duplicates += len(part) - len(deduped)
+                deduped = deduped[['vm', 'timestamp', 'metric', 'value']]
+                writer.write_table(pa.Table.from_pandas(deduped, schema=schema, preserve_index=False))
+                processed.append(deduped)
+        print(f"Removed {duplicates} duplicate rows")
+        print(f"Data successfully saved to {out_file}")
+
+        if not processed:
+            return pd.DataFrame(columns=['vm', 'timestamp', 'metric', 'value'])
+        df = pd.concat(processed, ignore_index=True)
+
+        print(f"Length of dataframe after processing: {len(df)}")
+        print(f"Unique VMs: {df['vm'].nunique()}")
+        print(f"Unique metrics: {df['metric'].nunique()}")
+        print(f"Time range: {df['timestamp'].min()} to {df['timestamp'].max()}")
+
+        return df
+
     @staticmethod
     def process_data(in_file='../data/source/data.csv',
                      out_file='../data/processed/data.xlsx') -> pd.DataFrame:
@@ -406,12 +487,13 @@ def run_preprocessing():
     data = DATA()
 
     # 1. Готовим данные значений метрик выгруженные по 20 серверам за период: с 25-11-2025 по 01-12-2025 (включительно)
-    # Папка с данными data/source/temp/ собранный датафрейм сохраняется в файл data/processed/temp.xlsx
+    # Папка с данными data/source/temp/ собранный датафрейм сохраняется в файл data/processed/temp.parquet
     print("=" * 60)
     print("Processing temp data...")
     print("=" * 60)
     df1 = data.process_temp(folder_path='../data/source/temp',
-                            out_file='../data/processed/temp.xlsx')
+                            out_file='../data/processed/temp.parquet',
+                            parallel=True)
 
     if not df1.empty:
         print("\nAnalysis of temp data:")